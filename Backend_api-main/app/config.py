@@ -1,9 +1,72 @@
 import os
 
+# Folder Backend_api-main, supaya path default tidak bergantung pada direktori kerja saat start
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "secretjwtkey123")  # Ganti dengan environment variable di production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1  # Token akan expired setelah 1 jam tanpa aktivitas
 
 # Database Configuration (jika diperlukan di masa depan)
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./elearn.db")
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./elearn.db")
+
+# Face Recognition Configuration
+# "exact" = brute-force scan seluruh gallery, "ivf" = approximate search (IVF coarse quantizer)
+FACE_SEARCH_MODE = os.getenv("FACE_SEARCH_MODE", "exact")
+FACE_IVF_NLIST = int(os.getenv("FACE_IVF_NLIST", "0"))  # 0 = otomatis (~sqrt(jumlah wajah))
+FACE_IVF_NPROBE = int(os.getenv("FACE_IVF_NPROBE", "8"))  # Jumlah cluster yang diperiksa per pencarian
+FACE_IVF_MIN_SIZE = int(os.getenv("FACE_IVF_MIN_SIZE", "2000"))  # Di bawah ini tetap exact scan
+FACE_INDEX_QUANTIZATION = os.getenv("FACE_INDEX_QUANTIZATION", "none")  # "none" = float32, "int8" = gallery 4x lebih kecil + re-ranking exact dari database
+FACE_RERANK_CANDIDATES = int(os.getenv("FACE_RERANK_CANDIDATES", "32"))  # Kandidat hasil scan int8 yang dihitung ulang dengan embedding float
+FACE_ROSTER_CACHE_TTL = int(os.getenv("FACE_ROSTER_CACHE_TTL", "300"))  # Detik, cache daftar mahasiswa per kelas
+FACE_PRESENSI_CACHE_SIZE = int(os.getenv("FACE_PRESENSI_CACHE_SIZE", "10000"))  # Maksimal id_presensi -> id_kelas_mk yang disimpan (LRU)
+FACE_INFERENCE_WORKERS = int(os.getenv("FACE_INFERENCE_WORKERS", "1"))  # Jumlah thread untuk MTCNN/FaceNet inference
+FACE_BATCH_MAX_SIZE = int(os.getenv("FACE_BATCH_MAX_SIZE", "16"))  # Maksimal crop wajah per batch FaceNet
+FACE_BATCH_WINDOW_MS = float(os.getenv("FACE_BATCH_WINDOW_MS", "15"))  # Jendela pengumpulan batch (ms)
+FACE_STORE_DTYPE = os.getenv("FACE_STORE_DTYPE", "float32")  # "float32" atau "float16" (setengah ukuran file gallery), untuk migrate_embeddings.py
+FACE_GALLERY_SYNC_SECONDS = float(os.getenv("FACE_GALLERY_SYNC_SECONDS", "2"))  # Interval cek perubahan face_registrations (registrasi dari worker/node lain)
+FACE_THRESHOLD_REPORT = os.path.join(BASE_DIR, os.getenv("FACE_THRESHOLD_REPORT", os.path.join("models", "face_threshold.json")))  # Path relatif dihitung dari BASE_DIR. Report evaluate_threshold.py (face-recognition-test); tidak ada = THRESHOLD 0.4
+
+# Model ML (FaceNet/MTCNN/MediaPipe)
+ENABLE_ML_ROUTERS = os.getenv("ENABLE_ML_ROUTERS", "1") == "1"  # 0 = proses ini hanya melayani CRUD (tanpa /face dan /gaze)
+ML_WARMUP_ON_STARTUP = os.getenv("ML_WARMUP_ON_STARTUP", "1") == "1"  # 1 = load model di background setelah startup, 0 = saat request pertama
+
+# Face detector: "mtcnn", "mediapipe", "haar" atau "dnn"
+FACE_DETECTOR_BACKEND = os.getenv("FACE_DETECTOR_BACKEND", "mtcnn")
+FACE_DNN_MODEL_DIR = os.path.join(BASE_DIR, os.getenv("FACE_DNN_MODEL_DIR", os.path.join("models", "face_detector")))  # Path relatif dihitung dari BASE_DIR. Folder deploy.prototxt + res10_300x300_ssd_iter_140000.caffemodel
+
+# Engine FaceNet: "keras" (TensorFlow penuh), "onnx" (ONNX Runtime) atau "tflite"
+FACE_EMBEDDING_ENGINE = os.getenv("FACE_EMBEDDING_ENGINE", "keras")
+FACE_EMBEDDING_MODEL_PATH = os.path.join(BASE_DIR, os.getenv("FACE_EMBEDDING_MODEL_PATH", os.path.join("models", "facenet.onnx")))  # Path relatif dihitung dari BASE_DIR. Hasil export_facenet.py, untuk onnx/tflite
+FACE_EMBEDDING_THREADS = int(os.getenv("FACE_EMBEDDING_THREADS", "0"))  # 0 = default runtime
+FACE_DETECT_MAX_SIDE = int(os.getenv("FACE_DETECT_MAX_SIDE", "640"))  # Foto lebih besar dideteksi pada resolusi ~ini (0 = selalu resolusi penuh)
+FACE_CROP_MIN_SIZE = int(os.getenv("FACE_CROP_MIN_SIZE", "96"))  # /recognize-crop, /verify-crop: sisi crop wajah dari client minimal (pixel)
+FACE_CROP_MAX_SIZE = int(os.getenv("FACE_CROP_MAX_SIZE", "320"))  # ... dan maksimal, agar frame kamera penuh tidak lewat jalur ini
+FACE_CLASSROOM_MARGIN = float(os.getenv("FACE_CLASSROOM_MARGIN", "0.05"))  # Foto kelas: selisih distance minimal kandidat 1 vs 2, di bawahnya dianggap ambigu
+FACE_CLASSROOM_MAX_PHOTOS = int(os.getenv("FACE_CLASSROOM_MAX_PHOTOS", "5"))  # Maksimal foto per request presensi foto kelas
+
+# Registrasi wajah multi-frame
+FACE_REGISTER_MAX_FRAMES = int(os.getenv("FACE_REGISTER_MAX_FRAMES", "10"))  # Maksimal frame per request /face/register
+FACE_REGISTER_MIN_FACE_SIZE = int(os.getenv("FACE_REGISTER_MIN_FACE_SIZE", "80"))  # Sisi terpendek wajah (pixel) minimal
+FACE_REGISTER_MIN_CONFIDENCE = float(os.getenv("FACE_REGISTER_MIN_CONFIDENCE", "0.8"))  # Confidence detector minimal
+FACE_REGISTER_MIN_SHARPNESS = float(os.getenv("FACE_REGISTER_MIN_SHARPNESS", "30"))  # Variance Laplacian minimal (di bawah ini = blur)
+
+# Passive liveness (deteksi foto wajah dari layar HP/laptop) di /face/recognize
+FACE_LIVENESS_ENABLED = os.getenv("FACE_LIVENESS_ENABLED", "0") == "1"  # Default jika request tidak mengirim field liveness
+FACE_LIVENESS_ANALYSIS_SIZE = int(os.getenv("FACE_LIVENESS_ANALYSIS_SIZE", "128"))  # Crop wajah di-resize ke ukuran ini sebelum FFT
+FACE_LIVENESS_MOIRE_THRESHOLD = float(os.getenv("FACE_LIVENESS_MOIRE_THRESHOLD", "0.4"))  # Rasio energi frekuensi tinggi di bawah ini = layar
+FACE_LIVENESS_S_VAR_THRESHOLD = float(os.getenv("FACE_LIVENESS_S_VAR_THRESHOLD", "400"))  # Variance saturation di bawah ini (dan V) = backlight layar
+FACE_LIVENESS_V_VAR_THRESHOLD = float(os.getenv("FACE_LIVENESS_V_VAR_THRESHOLD", "500"))  # Variance value
+
+# Liveness challenge (WebSocket /face/liveness) dan token liveness untuk presensi
+FACE_LIVENESS_CHALLENGE_TIMEOUT = float(os.getenv("FACE_LIVENESS_CHALLENGE_TIMEOUT", "15"))  # Detik untuk menyelesaikan challenge
+FACE_LIVENESS_MAX_SESSIONS = int(os.getenv("FACE_LIVENESS_MAX_SESSIONS", "50"))  # Maksimal sesi WebSocket bersamaan per worker
+LIVENESS_TOKEN_EXPIRE_SECONDS = int(os.getenv("LIVENESS_TOKEN_EXPIRE_SECONDS", "120"))  # Masa berlaku token liveness
+PRESENSI_REQUIRE_LIVENESS = os.getenv("PRESENSI_REQUIRE_LIVENESS", "0") == "1"  # 1 = presensi wajah wajib menyertakan liveness_token
+
+# Gaze detection (/gaze/predict dan WebSocket /gaze/stream)
+GAZE_STREAM_MAX_SESSIONS = int(os.getenv("GAZE_STREAM_MAX_SESSIONS", "50"))  # Maksimal stream bersamaan per worker (masing-masing punya FaceMesh sendiri)
+GAZE_STREAM_MAX_FRAME_BYTES = int(os.getenv("GAZE_STREAM_MAX_FRAME_BYTES", str(1024 * 1024)))  # Frame lebih besar dari ini ditolak
+GAZE_FACEMESH_POOL_SIZE = int(os.getenv("GAZE_FACEMESH_POOL_SIZE", "0"))  # Jumlah FaceMesh untuk /gaze/predict yang berjalan paralel, 0 = jumlah CPU
+GAZE_LANDMARK_MAX_SAMPLES = int(os.getenv("GAZE_LANDMARK_MAX_SAMPLES", "10000"))  # Maksimal sampel landmark per request /gaze/landmarks
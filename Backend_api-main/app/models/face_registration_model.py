@@ -1,5 +1,5 @@
 # app/models/face_registration_model.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, LargeBinary
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -8,6 +8,11 @@ class FaceRegistration(Base):
     
     id_registration = Column(Integer, primary_key=True, autoincrement=True)
     nim = Column(String(20), ForeignKey("mahasiswa.nim", ondelete="CASCADE"), unique=True, nullable=False)
-    embedding_filename = Column(String(255), nullable=False, comment="Filename of .pkl file in embeddings folder")
+    embedding = Column(LargeBinary, nullable=True, comment="L2-normalized float32 face embedding (little-endian)")
+    embedding_filename = Column(String(255), nullable=True, comment="Legacy .pkl filename, NULL once the embedding is stored in the row")
     registration_date = Column(DateTime, server_default=func.current_timestamp())
-    updated_at = Column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+    last_verified = Column(DateTime, nullable=True, comment="Last successful face verification")
+    verification_count = Column(Integer, default=0, comment="Total number of successful verifications")
+    failed_attempts = Column(Integer, default=0, comment="Number of failed verification attempts")
+    is_active = Column(Boolean, default=True, comment="Can be set to false to disable face login")
+    updated_at = Column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp(), index=True)
@@ -0,0 +1,13 @@
+# app/models/liveness_token_use_model.py
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class LivenessTokenUse(Base):
+    __tablename__ = "liveness_token_uses"
+
+    jti = Column(String(32), primary_key=True, comment="ID token liveness yang sudah dipakai")
+    nim = Column(String(20), nullable=False)
+    id_presensi = Column(Integer, nullable=False)
+    used_at = Column(DateTime, server_default=func.current_timestamp())
+    expires_at = Column(DateTime, nullable=False, index=True, comment="Baris boleh dihapus setelah waktu ini")
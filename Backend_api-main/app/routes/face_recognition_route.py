@@ -1,129 +1,1005 @@
-from fastapi import APIRouter, UploadFile, File, Form
-import numpy as np
-import cv2
-from keras_facenet import FaceNet
-from mtcnn import MTCNN
+from fastapi import APIRouter, UploadFile, File, Form, Depends, WebSocket, WebSocketDisconnect
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, datetime
 import os
-import pickle
-from scipy.spatial.distance import cosine
+import time
+import asyncio
+import functools
+import logging
+import cv2
+import numpy as np
+from app.core.database import get_db, SessionLocal
+from app.services.face_index_service import face_index, load_threshold, l2_normalize
+from app.services.face_gallery_service import face_gallery
+from app.services.class_roster_service import class_roster_cache
+from app.services.face_registration_service import record_verification, record_verification_by_nim
+from app.services.inference_executor import run_inference
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.model_registry import model_registry
+from app.services.face_detectors import create_face_detector
+from app.services.embedding_engines import create_embedding_engine
+from app.services.image_preprocessing import locate_faces, locate_largest_face, sharpness
+from app.services.liveness_service import passive_liveness
+from app.services.liveness_challenge_service import CHALLENGES, ChallengeSession
+from app.config import (
+    FACE_BATCH_MAX_SIZE, FACE_BATCH_WINDOW_MS, FACE_DETECTOR_BACKEND,
+    FACE_EMBEDDING_ENGINE, FACE_EMBEDDING_MODEL_PATH, FACE_EMBEDDING_THREADS, FACE_DETECT_MAX_SIDE,
+    FACE_CLASSROOM_MARGIN, FACE_CLASSROOM_MAX_PHOTOS, FACE_LIVENESS_ENABLED,
+    FACE_LIVENESS_MAX_SESSIONS, PRESENSI_REQUIRE_LIVENESS, FACE_THRESHOLD_REPORT,
+    FACE_REGISTER_MAX_FRAMES, FACE_REGISTER_MIN_FACE_SIZE, FACE_REGISTER_MIN_CONFIDENCE, FACE_REGISTER_MIN_SHARPNESS,
+    FACE_CROP_MIN_SIZE, FACE_CROP_MAX_SIZE
+)
+from app.models.face_registration_model import FaceRegistration
+from app.models.mahasiswa_model import Mahasiswa
+from app.utils.token_utils import get_current_user, require_admin_or_super_admin, create_liveness_token, consume_liveness_token, verify_access_token
+from app.services.image_preprocessing import decode_image, probe_image_size
 
 router = APIRouter(prefix="/face", tags=["Face Recognition"])
+logger = logging.getLogger(__name__)
+
+
+def load_facenet():
+    return create_embedding_engine(FACE_EMBEDDING_ENGINE, FACE_EMBEDDING_MODEL_PATH, FACE_EMBEDDING_THREADS)
+
+
+def load_face_detector():
+    return create_face_detector(FACE_DETECTOR_BACKEND)
+
+
+# FaceNet dan face detector baru di-load saat warm-up atau request pertama,
+# bukan saat import, supaya startup API tetap cepat
+facenet_model = model_registry.register(f"facenet:{FACE_EMBEDDING_ENGINE}", load_facenet)
+detector_model = model_registry.register(f"face_detector:{FACE_DETECTOR_BACKEND}", load_face_detector)
+
+
+def embed_faces(face_crops):
+    return facenet_model.get().embeddings(face_crops)
+
 
-# Inisialisasi FaceNet dan MTCNN
-embedder = FaceNet()   
-detector = MTCNN()
+# Gabungkan crop wajah dari request yang bersamaan menjadi satu batch FaceNet
+embedding_batcher = EmbeddingBatcher(
+    embed_faces,
+    max_batch_size=FACE_BATCH_MAX_SIZE,
+    max_wait_ms=FACE_BATCH_WINDOW_MS
+)
 
-# Folder untuk menyimpan embedding (relatif ke Backend_api)
+# Threshold cosine distance: dari report evaluate_threshold.py (FACE_THRESHOLD_REPORT) jika ada,
+# selain itu 0.4 (dipilih manual)
+THRESHOLD = load_threshold(FACE_THRESHOLD_REPORT, default=0.4, engine=FACE_EMBEDDING_ENGINE)
+
+# Jumlah kandidat terdekat yang dikembalikan oleh /recognize
+TOP_K = 5
+
+# Embedding disimpan di tabel face_registrations; face_gallery menyimpan cache in-memory per worker
+# dan mengecek perubahan (updated_at) sebelum dipakai. Folder embeddings/ lama hanya untuk migrasi.
 EMBEDDINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "embeddings")
-os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
+if os.path.isdir(EMBEDDINGS_DIR) and any(name.endswith((".pkl", ".npy")) for name in os.listdir(EMBEDDINGS_DIR)):
+    logger.warning("Embedding lama ditemukan di folder embeddings/. Jika belum dipindahkan, "
+                   "jalankan: python migrate_embeddings.py --to-db")
+
+
+def detect_face_crop(image_bytes: bytes):
+    """
+    Decode gambar lalu crop wajah terbesar yang terdeteksi
+    (backend detector dipilih lewat FACE_DETECTOR_BACKEND).
+    Foto besar dari kamera HP dideteksi pada versi kecil (FACE_DETECT_MAX_SIDE),
+    crop tetap diambil dari gambar resolusi penuh.
+    Return (face_crop, None) atau (None, pesan_error) jika wajah tidak ditemukan.
+    """
+    img, box = locate_largest_face(image_bytes, detector_model.get(), FACE_DETECT_MAX_SIDE)
+    if img is None:
+        return None, "Gambar tidak valid"
+    if box is None:
+        return None, "Wajah tidak terdeteksi"
+
+    x, y, w, h = box
+    return img[y:y+h, x:x+w], None
+
+
+async def extract_face_embedding(image_bytes: bytes):
+    """
+    Deteksi wajah di inference pool (bukan event loop), lalu embedding FaceNet
+    lewat batcher sehingga request yang datang bersamaan di-embed dalam satu batch.
+    Return (embedding, None) atau (None, pesan_error).
+    """
+    face_crop, error = await run_inference(detect_face_crop, image_bytes)
+    if error:
+        return None, error
+    return await embedding_batcher.embed(face_crop), None
+
+
+def detect_all_face_crops(image_bytes: bytes):
+    """
+    Decode foto kelas lalu crop semua wajah yang terdeteksi.
+    Return (list_crop, list_box) atau (None, None) jika gambar tidak valid.
+    """
+    img, faces = locate_faces(image_bytes, detector_model.get(), FACE_DETECT_MAX_SIDE)
+    if img is None:
+        return None, None
+    boxes = [face["box"] for face in faces]
+    return [img[y:y+h, x:x+w] for x, y, w, h in boxes], boxes
+
+
+# Crop dengan standar deviasi pixel di bawah ini dianggap kosong (hitam/putih polos)
+CLIENT_CROP_MIN_STD = 8.0
+
+
+def load_client_crop(data: bytes, pixel_format: Optional[str] = None, width: int = 160, height: int = 160):
+    """
+    Crop wajah yang sudah dipotong dan di-align di client (MediaPipe on-device),
+    tanpa deteksi wajah di server.
+    pixel_format None = JPEG/PNG, "rgb24" = pixel mentah RGB (width x height x 3 byte).
+    Return (face_crop_bgr, None) atau (None, pesan_error).
+    """
+    if pixel_format is None:
+        # Cek ukuran dari header dulu: frame kamera penuh tidak perlu di-decode
+        size = probe_image_size(data)
+        if size and max(size) > FACE_CROP_MAX_SIZE:
+            return None, f"Crop wajah terlalu besar ({size[0]}x{size[1]}), maksimal {FACE_CROP_MAX_SIZE} pixel"
+        crop = decode_image(data)
+        if crop is None:
+            return None, "Gambar tidak valid"
+    elif pixel_format == "rgb24":
+        if len(data) != width * height * 3:
+            return None, f"Data pixel rgb24 {width}x{height} harus {width * height * 3} byte, diterima {len(data)}"
+        crop = cv2.cvtColor(np.frombuffer(data, np.uint8).reshape(height, width, 3), cv2.COLOR_RGB2BGR)
+    else:
+        return None, f"pixel_format '{pixel_format}' tidak dikenal, gunakan rgb24 atau kosongkan untuk JPEG/PNG"
+
+    h, w = crop.shape[:2]
+    if min(h, w) < FACE_CROP_MIN_SIZE or max(h, w) > FACE_CROP_MAX_SIZE:
+        return None, f"Ukuran crop wajah {w}x{h} harus antara {FACE_CROP_MIN_SIZE} dan {FACE_CROP_MAX_SIZE} pixel"
+    if max(h, w) > 1.25 * min(h, w):
+        return None, f"Crop wajah harus (hampir) persegi, diterima {w}x{h}"
+    if float(crop.std()) < CLIENT_CROP_MIN_STD:
+        return None, "Crop wajah kosong"
+    return crop, None
+
+
+def assess_registration_frames(frames):
+    """
+    Deteksi wajah terbesar di setiap frame registrasi dan tolak frame yang
+    kualitasnya buruk (wajah kecil, confidence detector rendah, blur).
+    Return (list_crop_yang_lolos, laporan_per_frame).
+    """
+    detector = detector_model.get()
+    crops, report = [], []
+    for index, image_bytes in enumerate(frames):
+        img, faces = locate_faces(image_bytes, detector, FACE_DETECT_MAX_SIDE)
+        if img is None or not faces:
+            report.append({"frame": index, "used": False,
+                           "reason": "Gambar tidak valid" if img is None else "Wajah tidak terdeteksi"})
+            continue
+
+        x, y, w, h = faces[0]["box"]
+        crop = img[y:y+h, x:x+w]
+        quality = {
+            "face_size": int(min(w, h)),
+            "confidence": round(float(faces[0]["confidence"]), 3),
+            "sharpness": round(sharpness(crop), 1),
+        }
+        reason = None
+        if quality["face_size"] < FACE_REGISTER_MIN_FACE_SIZE:
+            reason = "Wajah terlalu kecil"
+        elif quality["confidence"] < FACE_REGISTER_MIN_CONFIDENCE:
+            reason = "Confidence deteksi rendah"
+        elif quality["sharpness"] < FACE_REGISTER_MIN_SHARPNESS:
+            reason = "Gambar blur"
+        if reason is None:
+            crops.append(crop)
+        report.append({"frame": index, "used": reason is None, "reason": reason, **quality})
+    return crops, report
+
+
+def registration_template(embeddings):
+    """
+    Centroid ter-normalisasi dari embedding frame registrasi. Frame yang
+    jauh dari centroid (distance >= THRESHOLD, misalnya orang lain ikut
+    terfoto) dibuang lalu centroid dihitung ulang.
+    Return (template, mask_frame_dipakai, distance_tiap_frame).
+    """
+    embeddings = l2_normalize(embeddings)
+    keep = np.ones(len(embeddings), dtype=bool)
+    centroid = l2_normalize(embeddings.mean(axis=0))
+    distances = 1.0 - embeddings @ centroid
+    if len(embeddings) > 2:
+        keep = distances < THRESHOLD
+        if keep.sum() >= 2:
+            centroid = l2_normalize(embeddings[keep].mean(axis=0))
+            distances = 1.0 - embeddings @ centroid
+        else:
+            keep[:] = True
+    return centroid, keep, distances
+
+
+async def sync_gallery(db: Session):
+    """
+    face_gallery.sync di thread terpisah: reload penuh (semua BLOB embedding)
+    tidak boleh memblokir event loop. Di antara interval sync request tidak
+    pindah thread sama sekali.
+    """
+    if face_gallery.needs_sync():
+        await asyncio.to_thread(face_gallery.sync, db)
+
+
+async def search_gallery(db: Session, embeddings, k: int, threshold: Optional[float] = None, candidates=None):
+    """
+    face_index.search_batch untuk semua wajah satu frame/request. Gallery int8
+    mengambil embedding float untuk re-ranking dengan satu query (session request)
+    di thread terpisah, sehingga event loop tidak menunggu database.
+    """
+    if face_index.quantization == "none":
+        return face_index.search_batch(embeddings, k, threshold, candidates=candidates)
+    source = functools.partial(face_gallery.fetch_embeddings, db=db)
+    return await asyncio.to_thread(face_index.search_batch, embeddings, k, threshold, False, candidates, source)
+
+
+async def gallery_distance(db: Optional[Session], nim: str, embedding):
+    """face_index.distance (1:1); untuk gallery int8 embedding float dibaca di thread terpisah."""
+    if face_index.quantization == "none":
+        return face_index.distance(nim, embedding)
+    source = functools.partial(face_gallery.fetch_embeddings, db=db)
+    return await asyncio.to_thread(face_index.distance, nim, embedding, source)
+
+
+def match_classroom_faces(faces, searches):
+    """
+    Cocokkan setiap wajah foto kelas dengan roster kelas. `searches` adalah hasil
+    search_gallery (k=2, dibatasi roster) untuk setiap wajah.
+
+    Wajah dianggap ambigu jika kandidat terdekat kedua hampir sama dekatnya
+    (selisih < FACE_CLASSROOM_MARGIN), atau jika NIM yang sama juga cocok
+    dengan wajah lain yang lebih dekat. Return (matched, ambiguous, unmatched).
+    """
+    matched, ambiguous, unmatched = {}, [], []
+    for face, candidates in zip(faces, searches):
+        if not candidates or candidates[0][1] >= THRESHOLD:
+            unmatched.append(face)
+            continue
+
+        nim, distance = candidates[0]
+        face = {**face, "nim": nim, "distance": distance, "confidence": 1 - distance}
+        if len(candidates) > 1 and candidates[1][1] - distance < FACE_CLASSROOM_MARGIN:
+            ambiguous.append({**face, "reason": "Mirip dengan " + candidates[1][0]})
+            continue
+
+        previous = matched.get(nim)
+        if previous is None or distance < previous["distance"]:
+            if previous is not None:
+                ambiguous.append({**previous, "reason": "NIM terdeteksi di lebih dari satu wajah"})
+            matched[nim] = face
+        else:
+            ambiguous.append({**face, "reason": "NIM terdeteksi di lebih dari satu wajah"})
+    return list(matched.values()), ambiguous, unmatched
 
-# Threshold cosine similarity
-THRESHOLD = 0.4
 
 # ========================
 # Endpoint registrasi wajah
 # ========================
 
 @router.post("/register")
-async def register_face(file: UploadFile = File(...), username: str = Form(...)):
+async def register_face(
+    username: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    files: List[UploadFile] = File(None),
+    db: Session = Depends(get_db)
+):
     """
-    Registrasi wajah baru untuk face recognition
+    Registrasi wajah baru untuk face recognition.
+    Kirim beberapa frame (3-10, field `files`) dari kamera: semua frame dideteksi
+    dan di-embed dalam satu batch, frame buruk (wajah kecil, confidence rendah,
+    blur) ditolak, dan yang disimpan adalah centroid embedding frame yang lolos.
+    Field `file` (satu foto) tetap diterima untuk client lama.
+    Username adalah NIM; embedding disimpan di tabel face_registrations.
     """
     try:
-        # Baca file gambar
-        image_bytes = await file.read()
-        np_arr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        # Query database di thread terpisah, bukan di event loop
+        if not await asyncio.to_thread(db.query(Mahasiswa).filter(Mahasiswa.nim == username).first):
+            return {"status": "error", "message": f"Mahasiswa dengan NIM {username} tidak ditemukan"}
 
-        # Deteksi wajah
-        faces = detector.detect_faces(img)
-        if len(faces) == 0:
-            return {"status": "error", "message": "Wajah tidak terdeteksi"}
+        uploads = (files or []) + ([file] if file is not None else [])
+        if not uploads:
+            return {"status": "error", "message": "Tidak ada foto yang dikirim"}
+        if len(uploads) > FACE_REGISTER_MAX_FRAMES:
+            return {"status": "error", "message": f"Maksimal {FACE_REGISTER_MAX_FRAMES} frame per registrasi"}
 
-        # Ambil wajah pertama
-        x, y, w, h = faces[0]['box']
-        face_crop = img[y:y+h, x:x+w]
+        # Deteksi + cek kualitas semua frame dalam satu job inference
+        frames = [await upload.read() for upload in uploads]
+        crops, report = await run_inference(assess_registration_frames, frames)
+        if not crops:
+            return {"status": "error", "message": "Tidak ada frame yang memenuhi kualitas", "frames": report}
 
-        # Buat embedding
-        embedding = embedder.embeddings([face_crop])[0]
+        # Semua frame yang lolos lewat batcher (di-batch bersama request lain, maksimal FACE_BATCH_MAX_SIZE)
+        embeddings = await embedding_batcher.embed_many(crops)
+        template, keep, distances = registration_template(embeddings)
+        used = [entry for entry in report if entry["used"]]
+        for entry, kept, distance in zip(used, keep, distances):
+            entry["distance_to_template"] = round(float(distance), 4)
+            if not kept:
+                entry["used"], entry["reason"] = False, "Tidak konsisten dengan frame lain"
 
-        # Simpan embedding ke file
-        embedding_path = os.path.join(EMBEDDINGS_DIR, f"{username}.pkl")
-        with open(embedding_path, "wb") as f:
-            pickle.dump(embedding, f)
+        # Simpan template ke face_registrations (baris lama di-replace, face login aktif lagi).
+        # Worker/server lain melihat perubahan lewat updated_at.
+        await asyncio.to_thread(face_gallery.register, db, username, template)
 
-        return {"status": "success", "message": f"Wajah {username} terdaftar"}
+        return {
+            "status": "success",
+            "message": f"Wajah {username} terdaftar",
+            "frames_used": int(keep.sum()),
+            "frames": report
+        }
     
     except Exception as e:
+        db.rollback()
         return {"status": "error", "message": str(e)}
 
 # ========================
 # Endpoint face recognition
 # ========================
 
+def resolve_candidates(db: Session, id_kelas_mk: Optional[int], id_presensi: Optional[int]):
+    """
+    Roster kelas (NIM -> id_mahasiswa) untuk membatasi pencarian, None jika
+    tidak dibatasi. Return (candidates, None) atau (None, pesan_error).
+    """
+    if id_kelas_mk is None and id_presensi is not None:
+        id_kelas_mk = class_roster_cache.get_kelas_mk_for_presensi(db, id_presensi)
+        if id_kelas_mk is None:
+            return None, f"Presensi {id_presensi} tidak ditemukan"
+    if id_kelas_mk is None:
+        return None, None
+    candidates = class_roster_cache.get_roster(db, id_kelas_mk)
+    if candidates is None:
+        return None, f"Kelas mata kuliah {id_kelas_mk} tidak ditemukan"
+    return candidates, None
+
+
+async def recognize_crop(db: Session, face_crop, candidates, liveness: Optional[bool], timings: dict, start: float):
+    """Liveness (opsional), embedding dan pencarian gallery untuk satu crop wajah."""
+    # Passive liveness (FFT 128x128, < 1 ms) sebelum embedding
+    liveness_result = None
+    if FACE_LIVENESS_ENABLED if liveness is None else liveness:
+        stage = time.perf_counter()
+        liveness_result = passive_liveness.check(face_crop)
+        timings["liveness"] = (time.perf_counter() - stage) * 1000
+        if not liveness_result["is_live"]:
+            return {
+                "status": "error",
+                "message": "Wajah terdeteksi sebagai foto dari layar",
+                "liveness": liveness_result,
+                "timings_ms": timings
+            }
+
+    stage = time.perf_counter()
+    embedding_new = await embedding_batcher.embed(face_crop)
+    timings["embed"] = (time.perf_counter() - stage) * 1000
+
+    # Bandingkan dengan gallery in-memory (sudah urut dari distance terkecil)
+    stage = time.perf_counter()
+    await sync_gallery(db)
+    matches = (await search_gallery(db, [embedding_new], TOP_K, THRESHOLD, candidates))[0]
+    timings["search"] = (time.perf_counter() - stage) * 1000
+    timings["total"] = (time.perf_counter() - start) * 1000
+    results = [
+        {
+            "username": username,
+            "distance": distance,
+            "confidence": 1 - distance
+        }
+        for username, distance in matches
+    ]
+
+    response = {"status": "success", "recognized": results or None, "liveness": liveness_result, "timings_ms": timings}
+    if not results:
+        response["message"] = "Wajah tidak dikenali"
+    return response
+
+
 @router.post("/recognize")
-async def recognize_face(file: UploadFile = File(...)):
+async def recognize_face(
+    file: UploadFile = File(...),
+    id_kelas_mk: Optional[int] = Form(None),
+    id_presensi: Optional[int] = Form(None),
+    liveness: Optional[bool] = Form(None),
+    db: Session = Depends(get_db)
+):
     """
-    Mengenali wajah dari gambar yang diupload
+    Mengenali wajah dari gambar yang diupload.
+    Jika id_kelas_mk atau id_presensi dikirim, pencocokan hanya dilakukan
+    terhadap mahasiswa di kelas tersebut (1:40, bukan 1:N seluruh kampus).
+    Jika liveness aktif (field liveness atau FACE_LIVENESS_ENABLED), crop wajah
+    dicek dulu apakah foto dari layar; wajah yang gagal tidak di-embed.
+    Waktu tiap tahap dikembalikan di timings_ms.
     """
     try:
-        # Baca file gambar
+        # Tentukan kandidat (roster kelas) sebelum inference yang mahal
+        candidates, error = await asyncio.to_thread(resolve_candidates, db, id_kelas_mk, id_presensi)
+        if error:
+            return {"status": "error", "message": error}
+
+        timings = {}
+        start = time.perf_counter()
+
+        # Baca file gambar lalu deteksi wajah (di inference pool)
         image_bytes = await file.read()
-        np_arr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        face_crop, error = await run_inference(detect_face_crop, image_bytes)
+        timings["detect"] = (time.perf_counter() - start) * 1000
+        if error:
+            return {"status": "error", "message": error, "timings_ms": timings}
+
+        return await recognize_crop(db, face_crop, candidates, liveness, timings, start)
+    
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@router.post("/recognize-crop")
+async def recognize_face_crop(
+    file: UploadFile = File(...),
+    pixel_format: Optional[str] = Form(None),
+    width: int = Form(160),
+    height: int = Form(160),
+    id_kelas_mk: Optional[int] = Form(None),
+    id_presensi: Optional[int] = Form(None),
+    liveness: Optional[bool] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Sama dengan /recognize, tetapi client mengirim crop wajah yang sudah
+    dipotong dan di-align (mis. 160x160 dari MediaPipe di aplikasi Android),
+    sebagai JPEG/PNG atau pixel mentah (pixel_format=rgb24, width x height).
+    Deteksi wajah di server dilewati, crop langsung di-embed.
+    """
+    try:
+        candidates, error = await asyncio.to_thread(resolve_candidates, db, id_kelas_mk, id_presensi)
+        if error:
+            return {"status": "error", "message": error}
+
+        timings = {}
+        start = time.perf_counter()
+
+        face_crop, error = load_client_crop(await file.read(), pixel_format, width, height)
+        timings["decode"] = (time.perf_counter() - start) * 1000
+        if error:
+            return {"status": "error", "message": error, "timings_ms": timings}
+
+        return await recognize_crop(db, face_crop, candidates, liveness, timings, start)
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+# ========================
+# Endpoint presensi dari foto kelas (multi-face)
+# ========================
+
+def mark_classroom_present(db: Session, id_kelas_mk: int, tanggal: date, pertemuan_ke: int, id_mahasiswa: List[int]):
+    """
+    Satu UPDATE untuk semua mahasiswa yang cocok (yang sudah Hadir tidak disentuh).
+    Return jumlah baris yang berubah.
+    """
+    result = db.execute(
+        text("""
+            UPDATE presensi
+            SET status = 'Hadir', waktu_input = NOW()
+            WHERE id_kelas_mk = :id_kelas_mk
+            AND tanggal = :tanggal
+            AND pertemuan_ke = :pertemuan_ke
+            AND id_mahasiswa IN :id_mahasiswa
+            AND status <> 'Hadir'
+        """).bindparams(bindparam("id_mahasiswa", expanding=True)),
+        {
+            "id_kelas_mk": id_kelas_mk,
+            "tanggal": tanggal,
+            "pertemuan_ke": pertemuan_ke,
+            "id_mahasiswa": id_mahasiswa
+        }
+    )
+    db.commit()
+    return result.rowcount
+
+
+@router.post("/classroom-attendance")
+async def classroom_attendance(
+    files: List[UploadFile] = File(...),
+    id_kelas_mk: int = Form(...),
+    pertemuan_ke: int = Form(...),
+    tanggal: Optional[date] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_admin_or_super_admin)
+):
+    """
+    Presensi satu kelas dari satu atau beberapa foto kelas (upload oleh dosen).
+    Semua wajah dideteksi, di-embed dalam satu batch FaceNet, dicocokkan dengan
+    roster kelas, lalu mahasiswa yang cocok ditandai Hadir dengan satu UPDATE.
+    """
+    try:
+        if len(files) > FACE_CLASSROOM_MAX_PHOTOS:
+            return {"status": "error", "message": f"Maksimal {FACE_CLASSROOM_MAX_PHOTOS} foto per request"}
 
-        # Deteksi wajah
-        faces = detector.detect_faces(img)
-        if len(faces) == 0:
+        roster = await asyncio.to_thread(class_roster_cache.get_roster, db, id_kelas_mk)
+        if roster is None:
+            return {"status": "error", "message": f"Kelas mata kuliah {id_kelas_mk} tidak ditemukan"}
+        tanggal = tanggal or date.today()
+        await sync_gallery(db)
+
+        # Deteksi semua wajah di setiap foto (di inference pool)
+        faces, crops = [], []
+        for photo, file in enumerate(files):
+            image_bytes = await file.read()
+            photo_crops, boxes = await run_inference(detect_all_face_crops, image_bytes)
+            if photo_crops is None:
+                return {"status": "error", "message": f"Gambar {file.filename} tidak valid"}
+            crops.extend(photo_crops)
+            faces.extend({"photo": photo, "box": [int(v) for v in box]} for box in boxes)
+        if not crops:
             return {"status": "error", "message": "Wajah tidak terdeteksi"}
 
-        x, y, w, h = faces[0]['box']
-        face_crop = img[y:y+h, x:x+w]
-        embedding_new = embedder.embeddings([face_crop])[0]
-
-        # Bandingkan dengan semua embedding yang tersimpan
-        results = []
-        if os.path.exists(EMBEDDINGS_DIR):
-            for file_name in os.listdir(EMBEDDINGS_DIR):
-                if file_name.endswith('.pkl'):
-                    with open(os.path.join(EMBEDDINGS_DIR, file_name), "rb") as f:
-                        embedding_registered = pickle.load(f)
-                    distance = cosine(embedding_registered, embedding_new)
-                    if distance < THRESHOLD:
-                        results.append({
-                            "username": file_name.replace(".pkl", ""), 
-                            "distance": float(distance),
-                            "confidence": float(1 - distance)
-                        })
-
-        # Sort by distance (lowest = best match)
-        results.sort(key=lambda x: x['distance'])
-
-        if results:
-            return {"status": "success", "recognized": results}
-        else:
-            return {"status": "success", "recognized": None, "message": "Wajah tidak dikenali"}
-    
+        # Semua crop lewat batcher: dipecah per FACE_BATCH_MAX_SIZE dan digabung dengan request lain
+        embeddings = await embedding_batcher.embed_many(crops)
+        searches = await search_gallery(db, embeddings, k=2, candidates=roster)
+        matched, ambiguous, unmatched = match_classroom_faces(faces, searches)
+
+        updated = 0
+        if matched:
+            updated = await asyncio.to_thread(
+                mark_classroom_present, db, id_kelas_mk, tanggal, pertemuan_ke,
+                [roster[face["nim"]] for face in matched]
+            )
+
+        return {
+            "status": "success",
+            "faces_detected": len(faces),
+            "updated": updated,
+            "matched": matched,
+            "ambiguous": ambiguous,
+            "unmatched": unmatched
+        }
+
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+
+# ========================
+# Endpoint face verification (1:1)
+# ========================
+
+def verification_subject(db: Session, current_user: dict, nim: Optional[str]):
+    """
+    NIM yang diverifikasi. Mahasiswa selalu diverifikasi terhadap NIM-nya sendiri
+    (id_mahasiswa dari token), field nim diabaikan; hanya admin/super_admin yang
+    boleh memilih NIM lewat field nim. Return (nim, None) atau (None, pesan_error).
+    """
+    role = current_user.get("role")
+    if role == "mahasiswa":
+        mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.id_mahasiswa == current_user.get("id_mahasiswa")).first()
+        if not mahasiswa:
+            return None, "Data mahasiswa tidak ditemukan"
+        return mahasiswa.nim, None
+    if role in ["admin", "super_admin"]:
+        if not nim:
+            return None, "Field nim wajib diisi"
+        return nim, None
+    return None, "Akses ditolak"
+
+
+async def verify_nim(db: Session, nim: str, embed):
+    """
+    Verifikasi 1:1 terhadap embedding milik `nim`. `embed` adalah coroutine
+    function tanpa argumen yang mengembalikan (embedding, None) atau
+    (None, pesan_error); dipanggil setelah status registrasi dicek.
+    """
+    face_reg = await asyncio.to_thread(db.query(FaceRegistration).filter(FaceRegistration.nim == nim).first)
+    if face_reg and not face_reg.is_active:
+        return {"status": "error", "message": f"Face recognition untuk {nim} dinonaktifkan"}
+    await sync_gallery(db)
+    if nim not in face_index:
+        return {"status": "error", "message": f"Wajah {nim} belum terdaftar"}
+
+    embedding_new, error = await embed()
+    if error:
+        return {"status": "error", "message": error}
+
+    # Bandingkan hanya dengan satu embedding milik NIM tersebut
+    distance = await gallery_distance(db, nim, embedding_new)
+    if distance is None:
+        return {"status": "error", "message": f"Wajah {nim} belum terdaftar"}
+    verified = distance < THRESHOLD
+
+    if face_reg:
+        await asyncio.to_thread(record_verification, db, face_reg, success=verified)
+
+    return {
+        "status": "success",
+        "nim": nim,
+        "verified": verified,
+        "distance": distance,
+        "confidence": 1 - distance,
+        "message": "Wajah cocok" if verified else "Wajah tidak cocok"
+    }
+
+
+@router.post("/verify")
+async def verify_face(
+    file: UploadFile = File(...),
+    nim: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Verifikasi 1:1 wajah terhadap embedding milik mahasiswa yang login
+    (NIM dari token). Admin/super_admin memilih NIM lewat field nim.
+    Statistik FaceRegistration (verification_count, failed_attempts)
+    langsung diupdate di request yang sama.
+    """
+    try:
+        nim, error = await asyncio.to_thread(verification_subject, db, current_user, nim)
+        if error:
+            return {"status": "error", "message": error}
+
+        async def embed():
+            # Baca file gambar, deteksi wajah, lalu buat embedding
+            return await extract_face_embedding(await file.read())
+
+        return await verify_nim(db, nim, embed)
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@router.post("/verify-crop")
+async def verify_face_crop(
+    file: UploadFile = File(...),
+    nim: Optional[str] = Form(None),
+    pixel_format: Optional[str] = Form(None),
+    width: int = Form(160),
+    height: int = Form(160),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Sama dengan /verify, tetapi dengan crop wajah dari client (lihat
+    /recognize-crop): deteksi wajah di server dilewati.
+    """
+    try:
+        nim, error = await asyncio.to_thread(verification_subject, db, current_user, nim)
+        if error:
+            return {"status": "error", "message": error}
+
+        async def embed():
+            face_crop, error = load_client_crop(await file.read(), pixel_format, width, height)
+            if error:
+                return None, error
+            return await embedding_batcher.embed(face_crop), None
+
+        return await verify_nim(db, nim, embed)
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+# ========================
+# Endpoint check-in presensi (verifikasi wajah + update presensi dalam satu request)
+# ========================
+
+def checkin_response(row, status: str, message: str, waktu_input=None):
+    return {
+        "status": "success",
+        "message": message,
+        "data": {
+            "id_presensi": row.id_presensi,
+            "nim": row.nim,
+            "nama": row.nama,
+            "mata_kuliah": row.nama_mk or "-",
+            "kelas": row.nama_kelas or "-",
+            "tanggal": row.tanggal,
+            "pertemuan_ke": row.pertemuan_ke,
+            "status": status,
+            "waktu_input": waktu_input or row.waktu_input
+        }
+    }
+
+
+def load_check_in_row(db: Session, id_presensi: int):
+    """
+    Satu query untuk presensi, mahasiswa, info kelas, status face registration
+    dan rentang waktu (dibandingkan di SQL, kolom TIME mentah dari driver berupa timedelta).
+    """
+    now = datetime.now()
+    return db.execute(
+        text("""
+            SELECT p.id_presensi, p.tanggal, p.pertemuan_ke, p.waktu_mulai, p.waktu_selesai,
+                   p.status, p.waktu_input, m.nim, m.nama, mk.nama_mk, k.nama_kelas,
+                   fr.is_active AS face_active,
+                   p.tanggal = :today AS is_today,
+                   (p.waktu_mulai IS NULL OR p.waktu_mulai <= :now_time) AS is_open,
+                   (p.waktu_selesai IS NULL OR p.waktu_selesai >= :now_time) AS is_not_closed
+            FROM presensi p
+            JOIN mahasiswa m ON p.id_mahasiswa = m.id_mahasiswa
+            LEFT JOIN kelas_mata_kuliah km ON p.id_kelas_mk = km.id_kelas_mk
+            LEFT JOIN mata_kuliah mk ON km.kode_mk = mk.kode_mk
+            LEFT JOIN kelas k ON km.id_kelas = k.id_kelas
+            LEFT JOIN face_registrations fr ON fr.nim = m.nim
+            WHERE p.id_presensi = :id_presensi
+        """),
+        {"id_presensi": id_presensi, "today": now.date(), "now_time": now.time()}
+    ).fetchone()
+
+
+def commit_failed_check_in(db: Session, nim: str, disabled: bool):
+    """Commit statistik verifikasi yang gagal; jika batas gagal tercapai keluarkan juga dari index worker ini."""
+    db.commit()
+    if disabled:
+        face_gallery.set_active(db, nim, False)
+
+
+def mark_check_in_present(db: Session, id_presensi: int):
+    """
+    Ubah presensi ke Hadir (statistik verifikasi ikut di-commit). Status dan
+    rentang waktu dicek ulang di WHERE, jadi request yang bersamaan atau
+    terlambat tidak bisa menimpa presensi.
+    Return (waktu_input, None) jika berhasil, selain itu (None, status_presensi_terbaru).
+    """
+    now = datetime.now()
+    result = db.execute(
+        text("""
+            UPDATE presensi
+            SET status = 'Hadir', waktu_input = :now
+            WHERE id_presensi = :id_presensi
+            AND status <> 'Hadir'
+            AND tanggal = :today
+            AND (waktu_mulai IS NULL OR waktu_mulai <= :now_time)
+            AND (waktu_selesai IS NULL OR waktu_selesai >= :now_time)
+        """),
+        {"now": now, "today": now.date(), "now_time": now.time(), "id_presensi": id_presensi}
+    )
+    db.commit()
+    if result.rowcount == 1:
+        return now, None
+    return None, db.execute(
+        text("SELECT status, waktu_input FROM presensi WHERE id_presensi = :id_presensi"),
+        {"id_presensi": id_presensi}
+    ).fetchone()
+
+
+@router.post("/check-in")
+async def check_in(
+    file: UploadFile = File(...),
+    id_presensi: int = Form(...),
+    liveness_token: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Presensi dengan wajah dalam satu request (pengganti /face/recognize +
+    /presensi/update-status-face-recognition).
+    Wajah diverifikasi 1:1 terhadap embedding mahasiswa pemilik presensi,
+    lalu status diubah ke Hadir dengan satu UPDATE bersyarat (status dan
+    rentang waktu dicek di WHERE). Aman di-retry: presensi yang sudah Hadir
+    langsung dikembalikan sebagai sukses.
+    """
+    try:
+        row = await asyncio.to_thread(load_check_in_row, db, id_presensi)
+        if not row:
+            return {"status": "error", "message": "Presensi tidak ditemukan"}
+
+        # Retry setelah sukses: tidak perlu inference lagi
+        if row.status == "Hadir":
+            return checkin_response(row, "Hadir", "Presensi sudah tercatat")
+
+        # Cek tanggal dan waktu sebelum inference yang mahal
+        if not row.is_today:
+            return {"status": "error", "message": f"Presensi hanya bisa dilakukan pada tanggal {row.tanggal}"}
+        if not row.is_open:
+            return {"status": "error", "message": f"Presensi belum dibuka. Waktu mulai: {row.waktu_mulai}"}
+        if not row.is_not_closed:
+            return {"status": "error", "message": f"Waktu presensi sudah ditutup. Waktu selesai: {row.waktu_selesai}"}
+
+        if row.face_active is not None and not row.face_active:
+            return {"status": "error", "message": f"Face recognition untuk {row.nim} dinonaktifkan"}
+        # Token sekali pakai: hangus di sini, juga jika wajah di bawah tidak cocok
+        if PRESENSI_REQUIRE_LIVENESS and not await asyncio.to_thread(
+                consume_liveness_token, db, liveness_token, row.nim, id_presensi):
+            return {"status": "error", "message": "Liveness check belum dilakukan, token liveness tidak valid, atau sudah dipakai"}
+        await sync_gallery(db)
+        if row.nim not in face_index:
+            return {"status": "error", "message": f"Wajah {row.nim} belum terdaftar"}
+
+        image_bytes = await file.read()
+        embedding_new, error = await extract_face_embedding(image_bytes)
+        if error:
+            return {"status": "error", "message": error}
+
+        distance = await gallery_distance(db, row.nim, embedding_new)
+        if distance is None:
+            return {"status": "error", "message": f"Wajah {row.nim} belum terdaftar"}
+        verified = distance < THRESHOLD
+
+        disabled = False
+        if row.face_active is not None:
+            disabled = await asyncio.to_thread(record_verification_by_nim, db, row.nim, verified)
+        if not verified:
+            await asyncio.to_thread(commit_failed_check_in, db, row.nim, disabled)
+            return {
+                "status": "error",
+                "message": "Wajah tidak cocok",
+                "distance": distance,
+                "confidence": 1 - distance
+            }
+
+        waktu_input, current = await asyncio.to_thread(mark_check_in_present, db, id_presensi)
+        if waktu_input is not None:
+            return checkin_response(row, "Hadir", "Presensi berhasil disimpan", waktu_input=waktu_input)
+
+        # Tidak ada baris yang berubah: sudah Hadir oleh request lain, atau waktu sudah lewat
+        if current and current.status == "Hadir":
+            return checkin_response(row, "Hadir", "Presensi sudah tercatat", waktu_input=current.waktu_input)
+        return {"status": "error", "message": f"Waktu presensi sudah ditutup. Waktu selesai: {row.waktu_selesai}"}
+
     except Exception as e:
+        db.rollback()
         return {"status": "error", "message": str(e)}
 
+# ========================
+# WebSocket liveness challenge (kedip, toleh, angguk, senyum)
+# ========================
+
+# Jumlah sesi liveness yang sedang terbuka di worker ini (masing-masing punya FaceMesh sendiri)
+active_liveness_sessions = 0
+
+
+def liveness_subject(websocket: WebSocket, token: Optional[str], id_presensi: int):
+    """
+    NIM mahasiswa yang login (access token dari query `token` atau header
+    Authorization) jika id_presensi miliknya dan wajahnya terdaftar aktif.
+    Return (nim, None) atau (None, pesan_error).
+    """
+    if token is None:
+        authorization = websocket.headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:]
+    payload = verify_access_token(token) if token else None
+    if not payload or payload.get("role") != "mahasiswa" or payload.get("id_mahasiswa") is None:
+        return None, "Login sebagai mahasiswa diperlukan"
+
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            text("""
+                SELECT m.nim, fr.is_active AS face_active
+                FROM presensi p
+                JOIN mahasiswa m ON p.id_mahasiswa = m.id_mahasiswa
+                LEFT JOIN face_registrations fr ON fr.nim = m.nim
+                WHERE p.id_presensi = :id_presensi AND m.id_mahasiswa = :id_mahasiswa
+            """),
+            {"id_presensi": id_presensi, "id_mahasiswa": payload["id_mahasiswa"]}
+        ).fetchone()
+        if not row:
+            return None, "Presensi tidak ditemukan"
+        if row.face_active is not None and not row.face_active:
+            return None, f"Face recognition untuk {row.nim} dinonaktifkan"
+        face_gallery.sync(db)
+    finally:
+        db.close()
+    if row.nim not in face_index:
+        return None, f"Wajah {row.nim} belum terdaftar"
+    return row.nim, None
+
+
+async def liveness_identity_error(nim: str, frame_bytes: bytes):
+    """None jika wajah di frame challenge cocok dengan embedding `nim`, selain itu pesan error."""
+    embedding, error = await extract_face_embedding(frame_bytes)
+    if error:
+        return error
+    # Tanpa session request: gallery int8 membuka session sendiri (di thread terpisah)
+    distance = await gallery_distance(None, nim, embedding)
+    if distance is None or distance >= THRESHOLD:
+        return f"Wajah tidak cocok dengan {nim}"
+    return None
+
+
+@router.websocket("/liveness")
+async def liveness_challenge(websocket: WebSocket, id_presensi: int, token: Optional[str] = None,
+                             challenge: Optional[str] = None):
+    """
+    Liveness challenge lewat WebSocket: satu koneksi = satu sesi dengan
+    FaceMesh sendiri (mode tracking antar frame).
+
+    Hanya untuk mahasiswa yang login (access token di query `token` atau header
+    Authorization); NIM diambil dari token, dan id_presensi harus milik mahasiswa
+    tersebut. Wajah di frame pertama yang terdeteksi dan di frame yang
+    menyelesaikan challenge harus cocok dengan embedding NIM tersebut.
+
+    Alur: server mengirim {"type": "challenge", ...}, client mengirim frame
+    kamera sebagai pesan binary (JPEG), server membalas {"type": "progress", ...}
+    untuk setiap frame. Jika berhasil, server mengirim {"type": "completed",
+    "liveness_token": ...} (sekali pakai, untuk id_presensi ini saja, di
+    /face/check-in atau /presensi/update-status-face-recognition) lalu menutup
+    koneksi. Jika waktu habis, server mengirim {"type": "timeout"}.
+    """
+    global active_liveness_sessions
+    await websocket.accept()
+    if active_liveness_sessions >= FACE_LIVENESS_MAX_SESSIONS:
+        await websocket.send_json({"type": "error", "message": "Server sibuk, coba lagi"})
+        await websocket.close(code=1013)
+        return
+    if challenge is not None and challenge not in CHALLENGES:
+        await websocket.send_json({"type": "error", "message": f"Challenge tidak dikenal: {challenge}"})
+        await websocket.close(code=1008)
+        return
+    nim, error = await asyncio.to_thread(liveness_subject, websocket, token, id_presensi)
+    if error:
+        await websocket.send_json({"type": "error", "message": error})
+        await websocket.close(code=1008)
+        return
+
+    active_liveness_sessions += 1
+    session = None
+    identity_checked = False
+    try:
+        session = await run_inference(ChallengeSession, challenge)
+        await websocket.send_json({
+            "type": "challenge",
+            "challenge": session.challenge,
+            "instruction": session.instruction,
+            "timeout": session.timeout
+        })
+
+        while True:
+            frame_bytes = await websocket.receive_bytes()
+            if session.expired:
+                await websocket.send_json({"type": "timeout", "message": f"Waktu habis ({session.timeout:.0f} detik)"})
+                break
+
+            frame = decode_image(frame_bytes)
+            if frame is None:
+                await websocket.send_json({"type": "error", "message": "Frame tidak valid"})
+                continue
+
+            progress = await run_inference(session.process_frame, frame)
+            # Wajah yang melakukan challenge harus wajah pemilik NIM: dicek di awal dan di akhir
+            if (progress["face"] and not identity_checked) or progress["completed"]:
+                error = await liveness_identity_error(nim, frame_bytes)
+                if error:
+                    await websocket.send_json({"type": "error", "message": error})
+                    await websocket.close(code=1008)
+                    return
+                identity_checked = True
+            if progress["completed"]:
+                await websocket.send_json({
+                    "type": "completed",
+                    "challenge": session.challenge,
+                    "frames": session.frames,
+                    "details": progress["details"],
+                    "liveness_token": create_liveness_token(nim, session.challenge, id_presensi)
+                })
+                break
+
+            await websocket.send_json({"type": "progress", "remaining": round(session.remaining, 1), **progress})
+
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Liveness session {nim} failed: {e}")
+        await websocket.close(code=1011)
+    finally:
+        active_liveness_sessions -= 1
+        if session is not None:
+            session.close()
+
 # ========================
 # Endpoint list registered faces
 # ========================
 
 @router.get("/registered")
-async def list_registered_faces():
+async def list_registered_faces(db: Session = Depends(get_db)):
     """
     Melihat daftar wajah yang sudah terdaftar
     """
     try:
-        if not os.path.exists(EMBEDDINGS_DIR):
-            return {"status": "success", "registered": []}
-        
-        registered = []
-        for file_name in os.listdir(EMBEDDINGS_DIR):
-            if file_name.endswith('.pkl'):
-                registered.append(file_name.replace(".pkl", ""))
+        await sync_gallery(db)
+        registered = face_index.usernames
         
         return {"status": "success", "registered": registered, "count": len(registered)}
     
@@ -135,18 +1011,16 @@ async def list_registered_faces():
 # ========================
 
 @router.delete("/register/{username}")
-async def delete_registered_face(username: str):
+async def delete_registered_face(username: str, db: Session = Depends(get_db)):
     """
-    Menghapus registrasi wajah
+    Menghapus registrasi wajah (baris face_registrations beserta embedding-nya)
     """
     try:
-        embedding_path = os.path.join(EMBEDDINGS_DIR, f"{username}.pkl")
-        
-        if not os.path.exists(embedding_path):
+        if not await asyncio.to_thread(face_gallery.delete, db, username):
             return {"status": "error", "message": f"Wajah {username} tidak ditemukan"}
-        
-        os.remove(embedding_path)
+
         return {"status": "success", "message": f"Wajah {username} berhasil dihapus"}
     
     except Exception as e:
+        db.rollback()
         return {"status": "error", "message": str(e)}
@@ -5,6 +5,8 @@ from sqlalchemy import func
 from app.core.database import get_db
 from app.models.face_registration_model import FaceRegistration
 from app.models.mahasiswa_model import Mahasiswa
+from app.services.face_registration_service import get_active_registration, record_verification
+from app.services.face_gallery_service import face_gallery
 from app.schemas.face_registration_schema import (
     FaceRegistrationCreate,
     FaceRegistrationResponse,
@@ -12,7 +14,6 @@ from app.schemas.face_registration_schema import (
     FaceVerificationResponse
 )
 from typing import List
-from datetime import datetime
 
 router = APIRouter(prefix="/face-registration", tags=["Face Registration DB"])
 
@@ -22,8 +23,9 @@ def register_face_to_db(
     db: Session = Depends(get_db)
 ):
     """
-    Register mahasiswa's face embedding metadata to database.
-    Called AFTER mobile app successfully saves the .pkl file via /face/register
+    Confirm a face registration and re-enable face login.
+    /face/register already stores the embedding in face_registrations;
+    this endpoint is kept for clients that still call it afterwards.
     """
     # Check if mahasiswa exists
     mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.nim == registration.nim).first()
@@ -33,29 +35,16 @@ def register_face_to_db(
             detail=f"Mahasiswa with NIM {registration.nim} not found"
         )
     
-    # Check if already registered
-    existing = db.query(FaceRegistration).filter(FaceRegistration.nim == registration.nim).first()
-    if existing:
-        # Update existing registration
-        existing.embedding_filename = registration.embedding_filename
-        existing.registration_date = datetime.now()
-        existing.is_active = True
-        existing.failed_attempts = 0
-        db.commit()
-        db.refresh(existing)
-        return existing
-    
-    # Create new registration
-    new_registration = FaceRegistration(
-        nim=registration.nim,
-        embedding_filename=registration.embedding_filename
-    )
-    
-    db.add(new_registration)
-    db.commit()
-    db.refresh(new_registration)
+    # The embedding itself must have been registered via /face/register
+    face_reg = face_gallery.set_active(db, registration.nim, True)
+    if not face_reg or not face_reg.embedding:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No face embedding for NIM {registration.nim}, register the face via /face/register first"
+        )
     
-    return new_registration
+    db.refresh(face_reg)
+    return face_reg
 
 
 @router.post("/verify", response_model=FaceVerificationResponse)
@@ -64,14 +53,12 @@ def verify_face_update_stats(
     db: Session = Depends(get_db)
 ):
     """
-    Update verification statistics after successful face match.
-    Called AFTER mobile app successfully verifies face via /face/verify
+    Update verification statistics after a face match done on the client.
+    /face/verify already updates these statistics itself; this endpoint is
+    kept for clients that compute the confidence score on their own.
     """
     # Check if face is registered
-    face_reg = db.query(FaceRegistration).filter(
-        FaceRegistration.nim == verification.nim,
-        FaceRegistration.is_active == True
-    ).first()
+    face_reg = get_active_registration(db, verification.nim)
     
     if not face_reg:
         return FaceVerificationResponse(
@@ -84,10 +71,7 @@ def verify_face_update_stats(
     
     if verification.confidence_score >= CONFIDENCE_THRESHOLD:
         # Successful verification
-        face_reg.last_verified = datetime.now()
-        face_reg.verification_count += 1
-        face_reg.failed_attempts = 0  # Reset failed attempts on success
-        db.commit()
+        record_verification(db, face_reg, success=True)
         
         return FaceVerificationResponse(
             success=True,
@@ -96,14 +80,8 @@ def verify_face_update_stats(
             nim=verification.nim
         )
     else:
-        # Failed verification
-        face_reg.failed_attempts += 1
-        
-        # Auto-disable after too many failures
-        if face_reg.failed_attempts >= 10:
-            face_reg.is_active = False
-            
-        db.commit()
+        # Failed verification (auto-disable after too many failures)
+        record_verification(db, face_reg, success=False)
         
         return FaceVerificationResponse(
             success=False,
@@ -151,7 +129,7 @@ def toggle_face_active(
     db: Session = Depends(get_db)
 ):
     """Enable or disable face recognition for a mahasiswa"""
-    face_reg = db.query(FaceRegistration).filter(FaceRegistration.nim == nim).first()
+    face_reg = face_gallery.set_active(db, nim, is_active)
     
     if not face_reg:
         raise HTTPException(
@@ -159,12 +137,6 @@ def toggle_face_active(
             detail=f"No face registration found for NIM {nim}"
         )
     
-    face_reg.is_active = is_active
-    if is_active:
-        face_reg.failed_attempts = 0  # Reset failed attempts when re-enabling
-    
-    db.commit()
-    
     return {
         "success": True,
         "message": f"Face recognition {'enabled' if is_active else 'disabled'} for {nim}",
@@ -178,24 +150,16 @@ def delete_face_registration(
     db: Session = Depends(get_db)
 ):
     """
-    Delete face registration from database (admin only).
-    WARNING: Remember to also delete the .pkl file manually from embeddings folder!
+    Delete face registration, including its embedding, from database (admin only).
+    Same as DELETE /face/register/{nim}.
     """
-    face_reg = db.query(FaceRegistration).filter(FaceRegistration.nim == nim).first()
-    
-    if not face_reg:
+    if not face_gallery.delete(db, nim):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No face registration found for NIM {nim}"
         )
     
-    embedding_filename = face_reg.embedding_filename
-    
-    db.delete(face_reg)
-    db.commit()
-    
     return {
         "success": True,
-        "message": f"Face registration deleted for {nim}",
-        "note": f"Remember to manually delete file: embeddings/{embedding_filename}"
+        "message": f"Face registration deleted for {nim}"
     }
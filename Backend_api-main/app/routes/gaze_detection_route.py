@@ -1,4 +1,7 @@
 # app/routes/gaze_detection_route.py
+import asyncio
+import functools
+import logging
 import time
 import numpy as np
 import cv2
@@ -7,27 +10,44 @@ import os
 # Suppress MediaPipe logs
 os.environ["GLOG_minloglevel"] = "2"
 
-import mediapipe as mp
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from pydantic import BaseModel
-from typing import Tuple
+from fastapi import APIRouter, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
+from typing import Dict, List, Tuple
+from app.config import (
+    GAZE_STREAM_MAX_SESSIONS, GAZE_STREAM_MAX_FRAME_BYTES, GAZE_FACEMESH_POOL_SIZE, GAZE_LANDMARK_MAX_SAMPLES
+)
+from app.services.face_mesh_pool import FaceMeshPool
+from app.services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/gaze", tags=["Gaze Detection"])
 
-# MediaPipe init (Lazy)
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = None
-
-def get_face_mesh():
-    global face_mesh
-    if face_mesh is None:
-        face_mesh = mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.3,
-            min_tracking_confidence=0.3
-        )
-    return face_mesh
+# MediaPipe init (Lazy): import mediapipe juga ditunda sampai warm-up / request pertama
+def load_face_mesh(static_image_mode: bool = False):
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=static_image_mode,
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.3,
+        min_tracking_confidence=0.3
+    )
+
+# Pool FaceMesh untuk /gaze/predict: satu instance per request yang berjalan, maksimal
+# GAZE_FACEMESH_POOL_SIZE. Frame berurutan dari client yang sama bisa diproses instance
+# berbeda, jadi pool memakai static_image_mode (tracking hanya di /gaze/stream).
+face_mesh_model = model_registry.register(
+    "facemesh",
+    lambda: FaceMeshPool(functools.partial(load_face_mesh, static_image_mode=True), GAZE_FACEMESH_POOL_SIZE).warm_up()
+)
+
+
+async def get_face_mesh_pool() -> FaceMeshPool:
+    # Pembuatan pool pertama kali (import mediapipe + instance pertama) di luar event loop
+    if face_mesh_model.state == "ready":
+        return face_mesh_model.get()
+    return await asyncio.to_thread(face_mesh_model.get)
 
 # iris indices (MediaPipe face_mesh)
 LEFT_IRIS = [474, 475, 476, 477]
@@ -35,6 +55,11 @@ RIGHT_IRIS = [469, 470, 471, 472]
 # choose a nose landmark index for reference (common index)
 NOSE_INDEX = 1
 
+# Batas kiri/kanan sebagai fraksi lebar gambar (lihat classify_gaze)
+GAZE_LEFT_FRACTION = 0.4
+GAZE_RIGHT_FRACTION = 0.6
+GAZE_LABELS = np.array(["LEFT", "CENTER", "RIGHT"])
+
 class GazeResult(BaseModel):
     left_center: Tuple[int, int] | None
     right_center: Tuple[int, int] | None
@@ -51,49 +76,74 @@ def read_image_bytes(b: bytes):
         raise ValueError("Failed to decode image")
     return img
 
-def process_frame(frame):
-    h, w, _ = frame.shape
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+def classify_gaze(cx: np.ndarray, width) -> np.ndarray:
+    """Label LEFT/CENTER/RIGHT untuk setiap titik tengah iris `cx` (pixel) pada gambar selebar `width`."""
+    # basic default gaze (fallback) using simple fractions
+    bounds = np.array([GAZE_LEFT_FRACTION, GAZE_RIGHT_FRACTION]) * width
+    # cx < 0.4w -> LEFT, cx > 0.6w -> RIGHT, selain itu CENTER (batas ikut CENTER)
+    index = (cx >= bounds[0]).astype(np.intp) + (cx > bounds[1])
+    return GAZE_LABELS[index]
+
+
+def gaze_from_landmarks(left_iris: np.ndarray, right_iris: np.ndarray, nose_x: np.ndarray, width: int, height: int) -> dict:
+    """
+    Hitung gaze untuk N sampel sekaligus.
+
+    `left_iris`/`right_iris` berbentuk (N, 4, 2) dan `nose_x` (N,), dalam koordinat
+    ternormalisasi MediaPipe (0..1). Pembulatan ke pixel sama dengan perhitungan
+    per-frame sebelumnya, sehingga /gaze/predict, /gaze/stream, dan /gaze/landmarks
+    memberi hasil yang identik. Mengembalikan dict berisi array per kolom.
+    """
+    scale = np.array([width, height], dtype=np.float64)
+    left_center = np.trunc(left_iris * scale).mean(axis=1).astype(np.int64)
+    right_center = np.trunc(right_iris * scale).mean(axis=1).astype(np.int64)
+    cx = (left_center[:, 0] + right_center[:, 0]) // 2
+    cy = (left_center[:, 1] + right_center[:, 1]) // 2
+    return {
+        "left_center": left_center,
+        "right_center": right_center,
+        "cx": cx,
+        "cy": cy,
+        "nose_x": np.trunc(nose_x * width).astype(np.int64),
+        "gaze": classify_gaze(cx, width)
+    }
+
+
+def gaze_row(gaze: dict, i: int = 0) -> dict:
+    """Satu sampel dari hasil `gaze_from_landmarks`, dalam bentuk dict hasil process_frame."""
+    return {
+        "left_center": (int(gaze["left_center"][i, 0]), int(gaze["left_center"][i, 1])),
+        "right_center": (int(gaze["right_center"][i, 0]), int(gaze["right_center"][i, 1])),
+        "cx": int(gaze["cx"][i]),
+        "cy": int(gaze["cy"][i]),
+        "nose_x": int(gaze["nose_x"][i]),
+        "gaze": str(gaze["gaze"][i])
+    }
+
+
+def process_frame(frame, mesh):
     h, w, _ = frame.shape
     rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     
-    mesh = get_face_mesh()
     results = mesh.process(rgb)
     if not results.multi_face_landmarks:
         return None
 
     face_landmarks = results.multi_face_landmarks[0]
     try:
-        left = np.array([(int(face_landmarks.landmark[i].x * w),
-                          int(face_landmarks.landmark[i].y * h)) for i in LEFT_IRIS])
-        right = np.array([(int(face_landmarks.landmark[i].x * w),
-                           int(face_landmarks.landmark[i].y * h)) for i in RIGHT_IRIS])
-        left_center = left.mean(axis=0).astype(int)
-        right_center = right.mean(axis=0).astype(int)
-        cx = int((left_center[0] + right_center[0]) // 2)
-        cy = int((left_center[1] + right_center[1]) // 2)
-
-        nose = face_landmarks.landmark[NOSE_INDEX]
-        nose_x = int(nose.x * w)
+        landmark = face_landmarks.landmark
+        left = np.array([[(landmark[i].x, landmark[i].y) for i in LEFT_IRIS]])
+        right = np.array([[(landmark[i].x, landmark[i].y) for i in RIGHT_IRIS]])
+        nose_x = np.array([landmark[NOSE_INDEX].x])
     except Exception:
         return None
 
-    # basic default gaze (fallback) using simple fractions
-    if cx < w * 0.4:
-        gaze_text = "LEFT"
-    elif cx > w * 0.6:
-        gaze_text = "RIGHT"
-    else:
-        gaze_text = "CENTER"
+    return gaze_row(gaze_from_landmarks(left, right, nose_x, w, h))
+
+def predict_from_bytes(mesh, data: bytes):
+    """Decode + FaceMesh untuk /gaze/predict, dijalankan di thread pool FaceMesh."""
+    return process_frame(read_image_bytes(data), mesh)
 
-    return {
-        "left_center": (int(left_center[0]), int(left_center[1])),
-        "right_center": (int(right_center[0]), int(right_center[1])),
-        "cx": int(cx),
-        "cy": int(cy),
-        "nose_x": int(nose_x),
-        "gaze": gaze_text
-    }
 
 @router.post("/predict", response_model=GazeResult)
 async def predict_gaze(file: UploadFile = File(...)):
@@ -105,14 +155,14 @@ async def predict_gaze(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File harus berupa gambar")
     
     data = await file.read()
+    pool = await get_face_mesh_pool()
     start = time.time()
     
     try:
-        frame = read_image_bytes(data)
-    except Exception as e:
+        res = await pool.run(predict_from_bytes, data)
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
 
-    res = process_frame(frame)
     elapsed = (time.time() - start) * 1000.0
     
     if res is None:
@@ -136,16 +186,208 @@ async def predict_gaze(file: UploadFile = File(...)):
         processing_time_ms=round(elapsed, 2)
     )
 
+# ========================
+# Gaze dari landmark (MediaPipe di device)
+# ========================
+
+# Satu baris batch = 18 angka: x,y 4 titik LEFT_IRIS, x,y 4 titik RIGHT_IRIS, lalu x,y hidung.
+# Baris angka datar jauh lebih cepat divalidasi daripada ribuan objek bersarang.
+LANDMARK_ROW_LENGTH = 18
+
+
+class GazeLandmarkRequest(BaseModel):
+    width: int = Field(gt=0)   # Ukuran frame kamera di device (pixel)
+    height: int = Field(gt=0)
+    # Satu sampel: isi left_iris/right_iris/nose. Batch: isi samples (format LANDMARK_ROW_LENGTH).
+    # Semua koordinat ternormalisasi (0..1) seperti output MediaPipe.
+    left_iris: List[Tuple[float, float]] | None = None   # 4 titik LEFT_IRIS (474-477)
+    right_iris: List[Tuple[float, float]] | None = None  # 4 titik RIGHT_IRIS (469-472)
+    nose: Tuple[float, float] | None = None              # landmark NOSE_INDEX (1)
+    samples: List[List[float]] | None = None
+
+
+class GazeLandmarkBatchResult(BaseModel):
+    count: int
+    left_center: List[Tuple[int, int]]
+    right_center: List[Tuple[int, int]]
+    cx: List[int]
+    cy: List[int]
+    nose_x: List[int]
+    gaze: List[str]
+    summary: Dict[str, int]
+    processing_time_ms: float
+
+
+def landmark_arrays(rows: np.ndarray):
+    """(left_iris, right_iris, nose_x) dari baris batch berbentuk (N, LANDMARK_ROW_LENGTH)."""
+    return rows[:, 0:8].reshape(-1, 4, 2), rows[:, 8:16].reshape(-1, 4, 2), rows[:, 16]
+
+
+@router.post("/landmarks", response_model=GazeResult | GazeLandmarkBatchResult)
+def gaze_from_landmark_points(payload: GazeLandmarkRequest):
+    """
+    Deteksi arah pandangan dari landmark iris dan hidung yang dihitung MediaPipe di device.
+    Tidak ada gambar yang di-decode; klasifikasi sama dengan /gaze/predict.
+    Kirim satu sampel (left_iris, right_iris, nose) atau banyak sekaligus (samples).
+    """
+    start = time.time()
+    if payload.samples is not None:
+        samples = payload.samples
+        if not samples:
+            raise HTTPException(status_code=400, detail="samples tidak boleh kosong")
+        if len(samples) > GAZE_LANDMARK_MAX_SAMPLES:
+            raise HTTPException(status_code=400, detail=f"Maksimal {GAZE_LANDMARK_MAX_SAMPLES} sampel per request")
+        if any(len(row) != LANDMARK_ROW_LENGTH for row in samples):
+            raise HTTPException(status_code=400, detail=f"Setiap baris samples harus berisi {LANDMARK_ROW_LENGTH} angka")
+        rows = np.array(samples, dtype=np.float64)
+    elif None not in (payload.left_iris, payload.right_iris, payload.nose):
+        if len(payload.left_iris) != 4 or len(payload.right_iris) != 4:
+            raise HTTPException(status_code=400, detail="left_iris dan right_iris harus berisi 4 titik")
+        rows = np.array([[*np.ravel(payload.left_iris), *np.ravel(payload.right_iris), *payload.nose]], dtype=np.float64)
+    else:
+        raise HTTPException(status_code=400, detail="Isi samples, atau left_iris, right_iris, dan nose")
+
+    if not np.isfinite(rows).all():
+        raise HTTPException(status_code=400, detail="Koordinat landmark tidak valid")
+
+    left, right, nose_x = landmark_arrays(rows)
+    gaze = gaze_from_landmarks(left, right, nose_x, payload.width, payload.height)
+    elapsed = round((time.time() - start) * 1000.0, 2)
+
+    if payload.samples is None:
+        return GazeResult(**gaze_row(gaze), processing_time_ms=elapsed)
+
+    labels, counts = np.unique(gaze["gaze"], return_counts=True)
+    return GazeLandmarkBatchResult(
+        count=len(rows),
+        left_center=gaze["left_center"].tolist(),
+        right_center=gaze["right_center"].tolist(),
+        cx=gaze["cx"].tolist(),
+        cy=gaze["cy"].tolist(),
+        nose_x=gaze["nose_x"].tolist(),
+        gaze=gaze["gaze"].tolist(),
+        summary={str(label): int(count) for label, count in zip(labels, counts)},
+        processing_time_ms=elapsed
+    )
+
+# ========================
+# WebSocket gaze stream
+# ========================
+
+# Jumlah stream yang sedang terbuka di worker ini
+active_gaze_streams = 0
+
+
+def process_stream_frame(mesh, data: bytes):
+    """Decode satu frame stream lalu proses dengan FaceMesh milik koneksi tersebut."""
+    start = time.perf_counter()
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None, None
+    res = process_frame(frame, mesh)
+    return res, round((time.perf_counter() - start) * 1000.0, 2)
+
+
+@router.websocket("/stream")
+async def gaze_stream(websocket: WebSocket):
+    """
+    Gaze detection lewat WebSocket, pengganti POST /gaze/predict per frame.
+
+    Client mengirim frame kamera sebagai pesan binary (JPEG atau WebP), server
+    membalas satu pesan JSON per frame yang diproses:
+    {"type": "gaze", "seq": n, "gaze": "LEFT"/"CENTER"/"RIGHT"/null, "cx", "cy",
+    "nose_x", "left_center", "right_center", "processing_time_ms", "dropped"}.
+
+    Setiap koneksi punya FaceMesh sendiri dalam mode tracking, jadi setelah
+    wajah ditemukan landmark hanya di-track antar frame tanpa deteksi ulang.
+    Jika client mengirim lebih cepat dari kemampuan server, hanya frame terbaru
+    yang diproses; jumlah frame yang dilewati dikirim di "dropped".
+    """
+    global active_gaze_streams
+    await websocket.accept()
+    if active_gaze_streams >= GAZE_STREAM_MAX_SESSIONS:
+        await websocket.send_json({"type": "error", "message": "Server sibuk, coba lagi"})
+        await websocket.close(code=1013)
+        return
+
+    active_gaze_streams += 1
+    mesh = None
+    receiver = None
+    pending = None
+    received = 0
+    dropped = 0
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        # Simpan hanya frame terbaru; frame lama yang belum diproses dilewati
+        nonlocal pending, received, dropped
+        while True:
+            data = await websocket.receive_bytes()
+            received += 1
+            if pending is not None:
+                dropped += 1
+            pending = (received, data)
+            frame_ready.set()
+
+    try:
+        # FaceMesh milik koneksi ini (mode tracking); diproses di thread pool FaceMesh
+        pool = await get_face_mesh_pool()
+        mesh = await pool.submit(load_face_mesh)
+        receiver = asyncio.create_task(receive_frames())
+
+        while True:
+            waiter = asyncio.ensure_future(frame_ready.wait())
+            done, _ = await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                waiter.cancel()
+                receiver.result()  # WebSocketDisconnect / error dari receive
+                break
+            frame_ready.clear()
+            seq, data = pending
+            pending = None
+
+            if len(data) > GAZE_STREAM_MAX_FRAME_BYTES:
+                await websocket.send_json({"type": "error", "seq": seq, "message": "Frame terlalu besar"})
+                continue
+            res, elapsed = await pool.submit(process_stream_frame, mesh, data)
+            if elapsed is None:
+                await websocket.send_json({"type": "error", "seq": seq, "message": "Frame tidak valid"})
+                continue
+
+            await websocket.send_json({
+                "type": "gaze",
+                "seq": seq,
+                **(res or {"gaze": None}),
+                "processing_time_ms": elapsed,
+                "dropped": dropped
+            })
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Gaze stream failed: {e}")
+        await websocket.close(code=1011)
+    finally:
+        active_gaze_streams -= 1
+        if receiver is not None:
+            receiver.cancel()
+        if mesh is not None:
+            mesh.close()
+
+
 @router.get("/health")
 def gaze_health_check():
     """
     Health check untuk gaze detection service.
     Mengembalikan status MediaPipe dan model info.
     """
+    pool = face_mesh_model.get() if face_mesh_model.state == "ready" else None
     return {
         "status": "ok",
         "service": "gaze_detection",
         "model": "MediaPipe FaceMesh",
         "detection_confidence": 0.3,
-        "tracking_confidence": 0.3
+        "tracking_confidence": 0.3,
+        "active_streams": active_gaze_streams,
+        "pool": pool.metrics() if pool else None
     }
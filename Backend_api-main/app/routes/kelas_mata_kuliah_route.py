@@ -13,6 +13,7 @@ from app.schemas.kelas_mata_kuliah_schema import (
     KelasMatKuliahDetail
 )
 from app.utils.token_utils import get_current_user, require_super_admin, require_admin_or_super_admin
+from app.services.class_roster_service import class_roster_cache
 
 router = APIRouter(prefix="/kelas-mata-kuliah", tags=["Kelas Mata Kuliah"])
 
@@ -254,6 +255,8 @@ def update_kelas_mk(
     
     db.commit()
     db.refresh(kelas_mk)
+    # id_kelas bisa berubah, roster face check-in dimuat ulang
+    class_roster_cache.invalidate(id_kelas_mk)
     
     return kelas_mk
 
@@ -274,5 +277,7 @@ def delete_kelas_mk(
     
     db.delete(kelas_mk)
     db.commit()
+    class_roster_cache.invalidate(id_kelas_mk)
+    class_roster_cache.forget_presensi(id_kelas_mk=id_kelas_mk)
     
     return None
@@ -12,6 +12,9 @@ from app.schemas.presensi_schema import (
     PresensiMahasiswaResponse,
     FaceRecognitionUpdateRequest
 )
+from app.utils.token_utils import consume_liveness_token
+from app.services.class_roster_service import class_roster_cache
+from app.config import PRESENSI_REQUIRE_LIVENESS
 from typing import List
 from datetime import datetime, time, timedelta
 
@@ -461,13 +464,15 @@ def delete_presensi(
     Hapus presensi untuk pertemuan tertentu (hapus semua mahasiswa)
     """
     
-    deleted_count = db.query(Presensi).filter(
+    query = db.query(Presensi).filter(
         and_(
             Presensi.id_kelas_mk == id_kelas_mk,
             Presensi.tanggal == tanggal,
             Presensi.pertemuan_ke == pertemuan_ke
         )
-    ).delete()
+    )
+    id_presensi_list = [row.id_presensi for row in query.with_entities(Presensi.id_presensi).all()]
+    deleted_count = query.delete()
     
     if deleted_count == 0:
         raise HTTPException(
@@ -476,6 +481,7 @@ def delete_presensi(
         )
     
     db.commit()
+    class_roster_cache.forget_presensi(id_presensi_list)
     
     return {
         "message": f"Presensi berhasil dihapus ({deleted_count} record)"
@@ -683,7 +689,15 @@ def update_status_face_recognition(
             detail="Anda sudah melakukan presensi sebelumnya"
         )
     
-    # 6. Update status presensi
+    # 6. Validasi token liveness (dari WebSocket /face/liveness) jika diwajibkan.
+    # Dicek terakhir: token sekali pakai, jangan sampai hangus oleh request yang ditolak
+    if PRESENSI_REQUIRE_LIVENESS and not consume_liveness_token(db, request.liveness_token, request.nim, request.id_presensi):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Liveness check belum dilakukan, token liveness tidak valid, atau sudah dipakai"
+        )
+    
+    # 7. Update status presensi
     presensi.status = "Hadir"
     presensi.waktu_input = datetime.now()
     
@@ -6,6 +6,7 @@ from app.models.user_model import User, RoleEnum
 from app.models.mahasiswa_model import Mahasiswa
 from app.models.dosen_model import Dosen
 from app.models.kelas_model import Kelas
+from app.models.presensi_model import Presensi
 from app.schemas.user_schema import UserResponse, UserRegister, UserUpdate, AdminCreate, AdminResponse
 from app.schemas.mahasiswa_schema import (
     UserMahasiswaCreate, 
@@ -19,6 +20,7 @@ from app.schemas.dosen_schema import (
 )
 from app.core.security import hash_password
 from app.utils.token_utils import require_super_admin, require_admin_or_super_admin, get_current_user
+from app.services.class_roster_service import class_roster_cache
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -319,6 +321,8 @@ def create_mahasiswa(
         db.commit()
         db.refresh(new_user)
         db.refresh(new_mahasiswa)
+        # Mahasiswa baru ikut roster face check-in kelasnya
+        class_roster_cache.invalidate_kelas(new_mahasiswa.id_kelas)
         
         # Get kelas name
         nama_kelas = None
@@ -392,6 +396,7 @@ def update_mahasiswa(
         
         # Update mahasiswa profile
         mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.user_id == user_id).first()
+        old_id_kelas = mahasiswa.id_kelas if mahasiswa else None
         if mahasiswa:
             if update_data.nim is not None:
                 existing = db.query(Mahasiswa).filter(
@@ -422,6 +427,8 @@ def update_mahasiswa(
         db.commit()
         db.refresh(user)
         db.refresh(mahasiswa)
+        # NIM / kelas bisa berubah, roster face check-in kelas lama dan baru dimuat ulang
+        class_roster_cache.invalidate_kelas(old_id_kelas, mahasiswa.id_kelas)
         
         # Build response
         user_dict = {
@@ -685,10 +692,17 @@ def delete_user(
         )
     
     try:
+        id_kelas = None
+        id_presensi_list = []
         # Manual cascade delete untuk mahasiswa profile jika ada
         if user.role == RoleEnum.mahasiswa:
             mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.user_id == user_id).first()
             if mahasiswa:
+                id_kelas = mahasiswa.id_kelas
+                id_presensi_list = [
+                    row.id_presensi for row in
+                    db.query(Presensi.id_presensi).filter(Presensi.id_mahasiswa == mahasiswa.id_mahasiswa).all()
+                ]
                 # Delete akan cascade ke presensi melalui database FK
                 db.delete(mahasiswa)
         
@@ -702,6 +716,9 @@ def delete_user(
         # Delete user
         db.delete(user)
         db.commit()
+        # Mahasiswa keluar dari roster face check-in, presensinya ikut terhapus
+        class_roster_cache.invalidate_kelas(id_kelas)
+        class_roster_cache.forget_presensi(id_presensi_list)
         return {"message": "User berhasil dihapus", "id": user_id}
     except Exception as e:
         db.rollback()
@@ -5,12 +5,13 @@ from typing import Optional
 
 class FaceRegistrationCreate(BaseModel):
     nim: str
-    embedding_filename: str
+    embedding_filename: Optional[str] = None
 
 class FaceRegistrationResponse(BaseModel):
     id_registration: int
     nim: str
-    embedding_filename: str
+    embedding_filename: Optional[str] = None
+    is_active: Optional[bool] = None
     registration_date: datetime
     updated_at: Optional[datetime] = None
     
@@ -71,3 +71,4 @@ class FaceRecognitionUpdateRequest(BaseModel):
     """Request schema untuk POST /presensi/update-status-face-recognition - Android"""
     id_presensi: int
     nim: str
+    liveness_token: Optional[str] = None  # Wajib jika PRESENSI_REQUIRE_LIVENESS aktif
@@ -0,0 +1,110 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import FACE_ROSTER_CACHE_TTL, FACE_PRESENSI_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class ClassRosterCache:
+    """
+    Per-class cache of the students enrolled in a kelas_mata_kuliah.
+
+    Face check-in only needs to compare a probe against the ~40 students of
+    the class being attended, so the roster (NIM -> id_mahasiswa) is looked
+    up once per class and reused until `ttl_seconds` expires. The
+    id_presensi -> id_kelas_mk mapping is cached as well, in an LRU of at
+    most `max_presensi` entries.
+
+    The enrollment and presensi write routes call `invalidate()`,
+    `invalidate_kelas()` and `forget_presensi()` so this worker sees their
+    changes immediately; other workers pick them up when the TTL expires.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_presensi: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_presensi = max_presensi
+        self._lock = threading.Lock()
+        self._rosters = {}
+        self._presensi_kelas_mk = OrderedDict()
+
+    def get_roster(self, db: Session, id_kelas_mk: int):
+        """
+        Return {nim: id_mahasiswa} for the students of `id_kelas_mk`,
+        or None if the kelas_mata_kuliah does not exist.
+        """
+        now = time.monotonic()
+        cached = self._rosters.get(id_kelas_mk)
+        if cached is not None and now - cached[0] < self.ttl_seconds:
+            return cached[2]
+
+        kelas_mk = db.execute(
+            text("SELECT id_kelas FROM kelas_mata_kuliah WHERE id_kelas_mk = :id_kelas_mk"),
+            {"id_kelas_mk": id_kelas_mk}
+        ).fetchone()
+        if not kelas_mk:
+            return None
+
+        rows = db.execute(
+            text("SELECT nim, id_mahasiswa FROM mahasiswa WHERE id_kelas = :id_kelas"),
+            {"id_kelas": kelas_mk.id_kelas}
+        ).fetchall()
+        roster = {row.nim: row.id_mahasiswa for row in rows}
+
+        with self._lock:
+            self._rosters[id_kelas_mk] = (now, kelas_mk.id_kelas, roster)
+        return roster
+
+    def get_kelas_mk_for_presensi(self, db: Session, id_presensi: int):
+        """Return the id_kelas_mk a presensi row belongs to, or None if it does not exist."""
+        with self._lock:
+            id_kelas_mk = self._presensi_kelas_mk.get(id_presensi)
+            if id_kelas_mk is not None:
+                self._presensi_kelas_mk.move_to_end(id_presensi)
+                return id_kelas_mk
+
+        row = db.execute(
+            text("SELECT id_kelas_mk FROM presensi WHERE id_presensi = :id_presensi"),
+            {"id_presensi": id_presensi}
+        ).fetchone()
+        if not row:
+            return None
+
+        with self._lock:
+            self._presensi_kelas_mk[id_presensi] = row.id_kelas_mk
+            self._presensi_kelas_mk.move_to_end(id_presensi)
+            while len(self._presensi_kelas_mk) > self.max_presensi:
+                self._presensi_kelas_mk.popitem(last=False)
+        return row.id_kelas_mk
+
+    def invalidate(self, id_kelas_mk: int = None):
+        """Forget one cached roster, or all of them when no id is given."""
+        with self._lock:
+            if id_kelas_mk is None:
+                self._rosters.clear()
+            else:
+                self._rosters.pop(id_kelas_mk, None)
+
+    def invalidate_kelas(self, *id_kelas):
+        """Forget the rosters of every kelas_mata_kuliah taught to the given kelas."""
+        with self._lock:
+            for id_kelas_mk, (_, cached_kelas, _) in list(self._rosters.items()):
+                if cached_kelas in id_kelas:
+                    del self._rosters[id_kelas_mk]
+
+    def forget_presensi(self, id_presensi=None, id_kelas_mk: int = None):
+        """Drop cached id_presensi -> id_kelas_mk entries, by presensi id(s) or by kelas_mata_kuliah."""
+        with self._lock:
+            if id_kelas_mk is not None:
+                for key in [key for key, value in self._presensi_kelas_mk.items() if value == id_kelas_mk]:
+                    del self._presensi_kelas_mk[key]
+            for key in id_presensi or ():
+                self._presensi_kelas_mk.pop(key, None)
+
+
+class_roster_cache = ClassRosterCache(ttl_seconds=FACE_ROSTER_CACHE_TTL, max_presensi=FACE_PRESENSI_CACHE_SIZE)
@@ -0,0 +1,115 @@
+import os
+import threading
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FACENET_IMAGE_SIZE = 160
+
+
+def preprocess_faces(face_crops, image_size: int = FACENET_IMAGE_SIZE) -> np.ndarray:
+    """
+    FaceNet input batch, exactly as `keras_facenet.FaceNet.embeddings` builds it:
+    bilinear resize to `image_size` and fixed standardization to [-1, 1].
+    """
+    resized = [cv2.resize(crop, (image_size, image_size)) for crop in face_crops]
+    return (np.float32(resized) - 127.5) / 127.5
+
+
+class KerasFaceNetEngine:
+    """The reference `keras_facenet.FaceNet` model (full TensorFlow)."""
+
+    name = "keras"
+
+    def __init__(self):
+        from keras_facenet import FaceNet
+        self.facenet = FaceNet()
+
+    def embeddings(self, face_crops) -> np.ndarray:
+        return self.facenet.embeddings(face_crops)
+
+
+class OnnxFaceNetEngine:
+    """FaceNet exported to ONNX (see export_facenet.py), run with ONNX Runtime on CPU."""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, threads: int = 0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def embeddings(self, face_crops) -> np.ndarray:
+        batch = preprocess_faces(face_crops)
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class TFLiteFaceNetEngine:
+    """
+    FaceNet converted to TFLite (see export_facenet.py).
+
+    Uses `ai_edge_litert` or `tflite_runtime` when installed so the worker
+    does not need TensorFlow at all, otherwise falls back to `tf.lite`.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path: str, threads: int = 0):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=threads or None)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+        # One interpreter holds one set of tensors: calls must not overlap
+        self._lock = threading.Lock()
+
+    def embeddings(self, face_crops) -> np.ndarray:
+        batch = preprocess_faces(face_crops)
+        if self.input["dtype"] != np.float32:
+            # Fully integer-quantized model: quantize the input with the model's own parameters
+            scale, zero_point = self.input["quantization"]
+            batch = np.clip(np.round(batch / scale + zero_point), np.iinfo(self.input["dtype"]).min,
+                            np.iinfo(self.input["dtype"]).max).astype(self.input["dtype"])
+
+        with self._lock:
+            if self._batch_size != len(batch):
+                self.interpreter.resize_tensor_input(self.input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self.input["index"], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output["index"])
+
+        if self.output["dtype"] != np.float32:
+            scale, zero_point = self.output["quantization"]
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+EMBEDDING_ENGINES = ("keras", "onnx", "tflite")
+
+
+def create_embedding_engine(engine: str, model_path: str = None, threads: int = 0):
+    """Build the FaceNet engine named `engine`; `onnx` and `tflite` need an exported `model_path`."""
+    if engine == "keras":
+        return KerasFaceNetEngine()
+    if engine not in EMBEDDING_ENGINES:
+        raise ValueError(f"Unknown embedding engine '{engine}', expected one of {EMBEDDING_ENGINES}")
+    if not model_path or not os.path.exists(model_path):
+        raise FileNotFoundError(f"Exported FaceNet model not found: {model_path} (run export_facenet.py)")
+    logger.info(f"Loading {engine} FaceNet engine from {model_path}")
+    if engine == "onnx":
+        return OnnxFaceNetEngine(model_path, threads)
+    return TFLiteFaceNetEngine(model_path, threads)
@@ -0,0 +1,264 @@
+import glob
+import json
+import os
+import pickle
+import threading
+import logging
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+
+from app.services.face_index_service import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "gallery.json"
+VERSION_NAME = "gallery.version"
+LOCK_NAME = "gallery.lock"
+STORE_DTYPES = ("float32", "float16")
+
+
+class EmbeddingStore:
+    """
+    Single-file face gallery: one contiguous `.npy` matrix plus a JSON manifest.
+
+    Row `i` of `gallery-<generation>.npy` holds the L2-normalized embedding of
+    `manifest["rows"][i]`; a `null` entry is a tombstone left by a delete or
+    re-registration. The matrix is opened with `np.load(mmap_mode="r")`, so
+    loading the gallery is one mmap instead of one unpickle per student.
+
+    Writes append rows into spare capacity and then rewrite the manifest,
+    which is the commit point. Growing the matrix or compacting away
+    tombstones writes a new generation file first and switches the manifest
+    to it, so a crash never leaves the manifest pointing at rows that moved.
+
+    Several processes (uvicorn/gunicorn workers) can share one store: writers
+    serialize on a lock file, and every committed write bumps the counter in
+    `gallery.version` so readers know when to remap.
+
+    Legacy format: the API now reads embeddings from face_registrations
+    (`FaceGallery`), and the store is only used by migrate_embeddings.py to
+    convert old `.pkl` files and move galleries into the database.
+    """
+
+    def __init__(self, directory: str, dtype: str = "float32", initial_capacity: int = 1024,
+                 compact_min_tombstones: int = 64, compact_ratio: float = 0.25):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unsupported embedding store dtype '{dtype}', expected one of {STORE_DTYPES}")
+        self.directory = directory
+        self.dtype = dtype
+        self.initial_capacity = initial_capacity
+        self.compact_min_tombstones = compact_min_tombstones
+        self.compact_ratio = compact_ratio
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    @property
+    def version_path(self):
+        return os.path.join(self.directory, VERSION_NAME)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def read_manifest(self) -> dict:
+        if not self.exists():
+            return {"version": 0, "generation": 0, "file": None, "dim": None, "dtype": self.dtype, "rows": []}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def version(self) -> int:
+        """Counter bumped by every committed write; cheap enough to poll per request."""
+        try:
+            with open(self.version_path, "r", encoding="utf-8") as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def open(self):
+        """
+        Map the gallery read-only.
+
+        Returns (matrix, rows, manifest) where `matrix` is a read-only memmap
+        of the used rows and `rows` the parallel list of ids (None = tombstone).
+        """
+        for attempt in range(3):
+            manifest = self.read_manifest()
+            rows = manifest["rows"]
+            if not rows:
+                return np.zeros((0, manifest["dim"] or 0), dtype=manifest["dtype"]), [], manifest
+            try:
+                matrix = np.load(os.path.join(self.directory, manifest["file"]), mmap_mode="r")
+            except FileNotFoundError:
+                # Another process compacted between reading the manifest and mapping the file
+                if attempt == 2:
+                    raise
+                continue
+            return matrix[:len(rows)], rows, manifest
+
+    def ids(self):
+        return [row for row in self.read_manifest()["rows"] if row is not None]
+
+    def __contains__(self, id_: str):
+        return id_ in self.read_manifest()["rows"]
+
+    def put(self, id_: str, embedding: np.ndarray):
+        """Store `embedding` for `id_`, tombstoning any previous row of the same id."""
+        vector = l2_normalize(np.asarray(embedding).ravel())
+        with self._locked():
+            manifest = self.read_manifest()
+            rows = manifest["rows"]
+            if manifest["dim"] is None:
+                manifest["dim"] = int(vector.shape[0])
+            elif manifest["dim"] != vector.shape[0]:
+                raise ValueError(f"Embedding dimension {vector.shape[0]} does not match store dimension {manifest['dim']}")
+
+            rows[:] = [None if row == id_ else row for row in rows]
+            capacity = self._capacity(manifest)
+            if len(rows) >= capacity:
+                self._rewrite(manifest, capacity=max(self.initial_capacity, 2 * capacity))
+                rows = manifest["rows"]
+
+            matrix = np.lib.format.open_memmap(os.path.join(self.directory, manifest["file"]), mode="r+")
+            matrix[len(rows)] = vector
+            matrix.flush()
+            del matrix
+
+            rows.append(id_)
+            self._write_manifest(manifest)
+
+    def put_many(self, items):
+        """Bulk-load (id, embedding) pairs, e.g. for a migration. Rewrites the store once."""
+        items = list(items)
+        if not items:
+            return
+        vectors = l2_normalize(np.stack([np.asarray(embedding).ravel() for _, embedding in items]))
+        with self._locked():
+            manifest = self.read_manifest()
+            existing, existing_rows = self._live(manifest)
+            new_ids = [id_ for id_, _ in items]
+            keep = [i for i, id_ in enumerate(existing_rows) if id_ not in set(new_ids)]
+            ids = [existing_rows[i] for i in keep] + new_ids
+            matrix = np.concatenate([existing[keep], vectors]) if len(keep) else vectors
+            manifest["dim"] = int(matrix.shape[1])
+            self._write_generation(manifest, matrix, ids, capacity=max(self.initial_capacity, 2 * len(ids)))
+
+    def delete(self, id_: str) -> bool:
+        """Tombstone the row of `id_`. Returns False if it is not stored."""
+        with self._locked():
+            manifest = self.read_manifest()
+            rows = manifest["rows"]
+            if id_ not in rows:
+                return False
+            rows[:] = [None if row == id_ else row for row in rows]
+            tombstones = rows.count(None)
+            if tombstones >= self.compact_min_tombstones and tombstones >= self.compact_ratio * len(rows):
+                self._rewrite(manifest, capacity=self._capacity(manifest))
+            else:
+                self._write_manifest(manifest)
+            return True
+
+    def compact(self):
+        """Rewrite the matrix without tombstones."""
+        with self._locked():
+            manifest = self.read_manifest()
+            if manifest["rows"]:
+                self._rewrite(manifest, capacity=self._capacity(manifest))
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive write access across threads and processes."""
+        with self._lock:
+            with open(os.path.join(self.directory, LOCK_NAME), "a+b") as f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                    else:
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _capacity(self, manifest):
+        if manifest["file"] is None:
+            return 0
+        path = os.path.join(self.directory, manifest["file"])
+        return np.load(path, mmap_mode="r").shape[0]
+
+    def _live(self, manifest):
+        """Live rows of the current generation as an in-memory matrix plus their ids."""
+        rows = manifest["rows"]
+        live = [i for i, row in enumerate(rows) if row is not None]
+        if not live:
+            return np.zeros((0, manifest["dim"] or 0), dtype=np.float32), []
+        matrix = np.load(os.path.join(self.directory, manifest["file"]), mmap_mode="r")
+        return np.asarray(matrix[live], dtype=np.float32), [rows[i] for i in live]
+
+    def _rewrite(self, manifest, capacity: int):
+        # Called with the write lock held: copy live rows into a fresh generation
+        matrix, ids = self._live(manifest)
+        self._write_generation(manifest, matrix, ids, capacity=max(capacity, self.initial_capacity, len(ids) + 1))
+
+    def _write_generation(self, manifest, matrix, ids, capacity: int):
+        generation = manifest["generation"] + 1
+        file_name = f"gallery-{generation}.npy"
+        path = os.path.join(self.directory, file_name)
+        data = np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype, shape=(capacity, manifest["dim"]))
+        data[:len(ids)] = matrix
+        data.flush()
+        del data
+
+        manifest.update(generation=generation, file=file_name, dtype=self.dtype, rows=list(ids))
+        self._write_manifest(manifest)
+
+        # Older generations are unused once the manifest switched. Windows refuses to
+        # delete a file another worker still maps; it is retried on the next rewrite.
+        for path in glob.glob(os.path.join(self.directory, "gallery-*.npy")):
+            if os.path.basename(path) != file_name:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove old gallery file {os.path.basename(path)}: {e}")
+
+    def _write_manifest(self, manifest):
+        manifest["version"] = manifest.get("version", 0) + 1
+        self._write_atomic(self.manifest_path, json.dumps(manifest))
+        # Published after the manifest, so a reader seeing the new version also sees its rows
+        self._write_atomic(self.version_path, str(manifest["version"]))
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+def load_pickle_directory(directory: str):
+    """Read legacy `<id>.pkl` embeddings from `directory` as a list of (id, vector)."""
+    items = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".pkl"):
+            continue
+        try:
+            with open(os.path.join(directory, file_name), "rb") as f:
+                items.append((file_name[:-len(".pkl")], np.asarray(pickle.load(f), dtype=np.float32).ravel()))
+        except Exception as e:
+            logger.error(f"Failed to load embedding {file_name}: {e}")
+    return items
@@ -0,0 +1,182 @@
+import os
+import threading
+import logging
+
+import cv2
+import numpy as np
+
+from app.config import FACE_DNN_MODEL_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class FaceDetector:
+    """
+    Common interface of the face detector backends.
+
+    `detect_faces(image)` takes a BGR image (as decoded by OpenCV) and
+    returns MTCNN-style dicts, `{"box": [x, y, w, h], "confidence": float,
+    "keypoints": {...}}`, clipped to the image and sorted largest face
+    first, so callers that take `faces[0]` get the main subject whatever
+    backend is configured. Faces smaller than `min_face_size` pixels are
+    dropped.
+    """
+
+    name = None
+
+    def __init__(self, min_face_size: int = 20, min_confidence: float = 0.5):
+        self.min_face_size = min_face_size
+        self.min_confidence = min_confidence
+
+    def detect_faces(self, image: np.ndarray):
+        height, width = image.shape[:2]
+        faces = []
+        for face in self._detect(image):
+            x, y, w, h = (int(round(v)) for v in face["box"])
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(width, x + w), min(height, y + h)
+            if min(x1 - x0, y1 - y0) < self.min_face_size or face["confidence"] < self.min_confidence:
+                continue
+            face["box"] = [x0, y0, x1 - x0, y1 - y0]
+            faces.append(face)
+        faces.sort(key=lambda face: face["box"][2] * face["box"][3], reverse=True)
+        return faces
+
+    def _detect(self, image: np.ndarray):
+        raise NotImplementedError
+
+
+class MTCNNDetector(FaceDetector):
+    """MTCNN (TensorFlow). Most accurate on small and rotated faces, slowest on CPU."""
+
+    name = "mtcnn"
+
+    def __init__(self, min_face_size: int = 20, min_confidence: float = 0.5, **mtcnn_kwargs):
+        super().__init__(min_face_size, min_confidence)
+        from mtcnn import MTCNN
+        self.detector = MTCNN(min_face_size=min_face_size, **mtcnn_kwargs)
+
+    def _detect(self, image):
+        faces = self.detector.detect_faces(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        return [{"box": face["box"], "confidence": float(face["confidence"]), "keypoints": face.get("keypoints", {})}
+                for face in faces]
+
+
+class MediaPipeDetector(FaceDetector):
+    """MediaPipe BlazeFace short/full-range face detection."""
+
+    name = "mediapipe"
+    # Order of MediaPipe's six relative keypoints
+    KEYPOINT_NAMES = ("right_eye", "left_eye", "nose", "mouth_center", "right_ear", "left_ear")
+
+    def __init__(self, min_face_size: int = 20, min_confidence: float = 0.5, model_selection: int = 1):
+        super().__init__(min_face_size, min_confidence)
+        import mediapipe as mp
+        self.detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=model_selection,  # 0 = faces within ~2 m, 1 = up to ~5 m
+            min_detection_confidence=min_confidence
+        )
+        # A MediaPipe graph must not be fed from several threads at once
+        self._lock = threading.Lock()
+
+    def _detect(self, image):
+        height, width = image.shape[:2]
+        with self._lock:
+            results = self.detector.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        faces = []
+        for detection in results.detections or []:
+            box = detection.location_data.relative_bounding_box
+            keypoints = {
+                name: (int(point.x * width), int(point.y * height))
+                for name, point in zip(self.KEYPOINT_NAMES, detection.location_data.relative_keypoints)
+            }
+            faces.append({
+                "box": [box.xmin * width, box.ymin * height, box.width * width, box.height * height],
+                "confidence": float(detection.score[0]),
+                "keypoints": keypoints,
+            })
+        return faces
+
+
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade. Fastest, but frontal faces only and no real confidence score."""
+
+    name = "haar"
+
+    def __init__(self, min_face_size: int = 20, min_confidence: float = 0.0,
+                 scale_factor: float = 1.1, min_neighbors: int = 5):
+        super().__init__(min_face_size, min_confidence)
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise RuntimeError("Haar cascades were removed from OpenCV 5; install opencv-python-headless<5")
+        path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self.detector = cv2.CascadeClassifier(path)
+        if self.detector.empty():
+            raise FileNotFoundError(f"Haar cascade not found at {path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        # CascadeClassifier keeps per-call scale data, detectMultiScale is not thread-safe
+        self._lock = threading.Lock()
+
+    def _detect(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        with self._lock:
+            boxes = self.detector.detectMultiScale(
+                gray,
+                scaleFactor=self.scale_factor,
+                minNeighbors=self.min_neighbors,
+                minSize=(self.min_face_size, self.min_face_size)
+            )
+        return [{"box": list(box), "confidence": 1.0, "keypoints": {}} for box in boxes]
+
+
+class DNNDetector(FaceDetector):
+    """
+    OpenCV DNN ResNet-10 SSD face detector (res10_300x300).
+
+    Needs `deploy.prototxt` and `res10_300x300_ssd_iter_140000.caffemodel`
+    in `model_dir` (from the OpenCV samples, not shipped with this repo).
+    """
+
+    name = "dnn"
+    PROTOTXT = "deploy.prototxt"
+    CAFFEMODEL = "res10_300x300_ssd_iter_140000.caffemodel"
+
+    def __init__(self, min_face_size: int = 20, min_confidence: float = 0.5, model_dir: str = None):
+        super().__init__(min_face_size, min_confidence)
+        model_dir = model_dir or FACE_DNN_MODEL_DIR
+        prototxt = os.path.join(model_dir, self.PROTOTXT)
+        caffemodel = os.path.join(model_dir, self.CAFFEMODEL)
+        for path in (prototxt, caffemodel):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"DNN face detector file not found: {path}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, caffemodel)
+        # cv2.dnn.Net is not thread-safe
+        self._lock = threading.Lock()
+
+    def _detect(self, image):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()[0, 0]
+        faces = []
+        for detection in detections:
+            confidence = float(detection[2])
+            if confidence < self.min_confidence:
+                continue
+            x0, y0, x1, y1 = detection[3:7] * np.array([width, height, width, height])
+            faces.append({"box": [x0, y0, x1 - x0, y1 - y0], "confidence": confidence, "keypoints": {}})
+        return faces
+
+
+DETECTOR_BACKENDS = {
+    detector.name: detector for detector in (MTCNNDetector, MediaPipeDetector, HaarDetector, DNNDetector)
+}
+
+
+def create_face_detector(backend: str, **kwargs) -> FaceDetector:
+    """Build the detector named `backend` ("mtcnn", "mediapipe", "haar" or "dnn")."""
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown face detector backend '{backend}', expected one of {tuple(DETECTOR_BACKENDS)}")
+    logger.info(f"Loading face detector backend {backend}")
+    return DETECTOR_BACKENDS[backend](**kwargs)
@@ -0,0 +1,209 @@
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+
+from app.config import FACE_GALLERY_SYNC_SECONDS
+from app.core.database import SessionLocal
+from app.models.face_registration_model import FaceRegistration
+from app.services.face_index_service import face_index, l2_normalize
+
+logger = logging.getLogger(__name__)
+
+# Rows committed slightly after their updated_at was stamped are still picked up
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def encode_embedding(embedding: np.ndarray) -> bytes:
+    """L2-normalized embedding as little-endian float32 bytes for face_registrations.embedding."""
+    return l2_normalize(np.asarray(embedding).ravel()).astype("<f4").tobytes()
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<f4").astype(np.float32)
+
+
+class FaceGallery:
+    """
+    Read-through cache of the embeddings stored in face_registrations.
+
+    The table is the single source of truth: registering, deleting and
+    enabling/disabling face login all go through this class, which writes
+    the row and then updates the worker's in-memory `FaceEmbeddingIndex`.
+    Only active registrations with an embedding are in the index.
+
+    Other workers (or other nodes) pick up those writes in `sync`: at most
+    every `sync_seconds`, rows updated since the cached watermark (minus
+    `SYNC_OVERLAP`) are re-read and applied one by one. This runs on every
+    interval rather than only when MAX(updated_at) moved: `updated_at` has
+    one-second precision, so a delete plus a register in the same second
+    leaves both the count and the MAX unchanged. Deleted rows leave nothing
+    to re-read, so the active rows' count and sum of `id_registration` (a
+    fingerprint of the NIM set) are compared with the cache afterwards, and
+    the whole gallery is reloaded when they disagree.
+
+    The gallery is also the vector source of the index: a quantized (int8)
+    index re-ranks its candidates with the exact embeddings read back from
+    the table by `fetch_embeddings`.
+    """
+
+    def __init__(self, index, sync_seconds: float = 2.0, session_factory=SessionLocal):
+        self.index = index
+        self.sync_seconds = sync_seconds
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._watermark = None
+        # Hash of the stored embedding per NIM, to skip rows whose embedding did not change
+        self._digests = {}
+        # id_registration per cached NIM, for the NIM-set fingerprint in `sync`
+        self._row_ids = {}
+        index.attach_vector_source(self.fetch_embeddings)
+
+    def needs_sync(self) -> bool:
+        """True when `sync` would query the table, i.e. never synced or `sync_seconds` have passed."""
+        return self._synced_at is None or time.monotonic() - self._synced_at >= self.sync_seconds
+
+    def sync(self, db: Session, force: bool = False):
+        """Bring the index up to date with face_registrations if it may be stale."""
+        if not force and not self.needs_sync():
+            return
+        # A request that finds another one syncing keeps using the current snapshot
+        if not self._lock.acquire(blocking=force or self._synced_at is None):
+            return
+        try:
+            state = db.execute(text("""
+                SELECT COUNT(CASE WHEN is_active AND embedding IS NOT NULL THEN 1 END) AS total,
+                       SUM(CASE WHEN is_active AND embedding IS NOT NULL THEN id_registration ELSE 0 END) AS id_sum,
+                       MAX(updated_at) AS latest
+                FROM face_registrations
+            """)).fetchone()
+
+            if self._synced_at is None or force:
+                self._reload(db)
+            else:
+                self._apply_changes(db)
+                if (state.total, int(state.id_sum or 0)) != self._fingerprint():
+                    self._reload(db)
+            self._watermark = state.latest
+            self._synced_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def register(self, db: Session, nim: str, embedding: np.ndarray) -> FaceRegistration:
+        """Store (or replace) the embedding of `nim`, re-enable face login and commit."""
+        face_reg = db.query(FaceRegistration).filter(FaceRegistration.nim == nim).first()
+        if face_reg is None:
+            face_reg = FaceRegistration(nim=nim)
+            db.add(face_reg)
+        else:
+            face_reg.registration_date = datetime.now()
+        face_reg.embedding = encode_embedding(embedding)
+        face_reg.embedding_filename = None
+        face_reg.is_active = True
+        face_reg.failed_attempts = 0
+        db.commit()
+        db.refresh(face_reg)
+
+        self._add(nim, face_reg.id_registration, face_reg.embedding)
+        return face_reg
+
+    def delete(self, db: Session, nim: str) -> bool:
+        """Delete the registration (and embedding) of `nim`. Returns False if there is none."""
+        face_reg = db.query(FaceRegistration).filter(FaceRegistration.nim == nim).first()
+        if face_reg is None:
+            return False
+        db.delete(face_reg)
+        db.commit()
+
+        self._remove(nim)
+        return True
+
+    def set_active(self, db: Session, nim: str, is_active: bool):
+        """Enable or disable face login for `nim`. Returns the row, or None if not registered."""
+        face_reg = db.query(FaceRegistration).filter(FaceRegistration.nim == nim).first()
+        if face_reg is None:
+            return None
+        face_reg.is_active = is_active
+        if is_active:
+            face_reg.failed_attempts = 0  # Reset failed attempts when re-enabling
+        db.commit()
+
+        if is_active and face_reg.embedding:
+            self._add(nim, face_reg.id_registration, face_reg.embedding)
+        else:
+            self._remove(nim)
+        return face_reg
+
+    def fetch_embeddings(self, nims, db: Session = None) -> dict:
+        """
+        {nim: embedding} read from face_registrations, for exact re-ranking.
+        Uses the request's session `db` when given, else a short-lived one.
+        """
+        if not nims:
+            return {}
+        session = db or self.session_factory()
+        try:
+            rows = session.execute(
+                text("SELECT nim, embedding FROM face_registrations WHERE nim IN :nims")
+                .bindparams(bindparam("nims", expanding=True)),
+                {"nims": list(nims)}
+            ).fetchall()
+        finally:
+            if db is None:
+                session.close()
+        return {row.nim: decode_embedding(row.embedding) for row in rows if row.embedding}
+
+    def _reload(self, db: Session):
+        rows = db.execute(text("""
+            SELECT id_registration, nim, embedding FROM face_registrations
+            WHERE is_active AND embedding IS NOT NULL
+        """)).fetchall()
+        if rows:
+            self.index.load_matrix(np.stack([decode_embedding(row.embedding) for row in rows]),
+                                   [row.nim for row in rows])
+        else:
+            self.index.load_matrix(np.zeros((0, 0), dtype=np.float32), [])
+        self._digests = {row.nim: hash(bytes(row.embedding)) for row in rows}
+        self._row_ids = {row.nim: row.id_registration for row in rows}
+        logger.info(f"Face gallery loaded {len(rows)} embedding(s) from face_registrations")
+
+    def _apply_changes(self, db: Session):
+        since = self._watermark
+        if isinstance(since, datetime):
+            since -= SYNC_OVERLAP
+        rows = db.execute(
+            text("""
+                SELECT id_registration, nim, embedding, is_active FROM face_registrations
+                WHERE updated_at >= :since
+            """),
+            {"since": since}
+        ).fetchall() if since is not None else []
+
+        for row in rows:
+            if not (row.is_active and row.embedding):
+                self._remove(row.nim)
+            elif (self._digests.get(row.nim) != hash(bytes(row.embedding))
+                  or self._row_ids.get(row.nim) != row.id_registration):
+                # Most re-read rows only had their verification statistics updated
+                self._add(row.nim, row.id_registration, row.embedding)
+
+    def _fingerprint(self):
+        return len(self._row_ids), sum(self._row_ids.values())
+
+    def _add(self, nim: str, id_registration: int, blob: bytes):
+        self.index.add(nim, decode_embedding(blob))
+        self._digests[nim] = hash(bytes(blob))
+        self._row_ids[nim] = id_registration
+
+    def _remove(self, nim: str):
+        self.index.remove(nim)
+        self._digests.pop(nim, None)
+        self._row_ids.pop(nim, None)
+
+
+face_gallery = FaceGallery(face_index, sync_seconds=FACE_GALLERY_SYNC_SECONDS)
@@ -0,0 +1,416 @@
+import os
+import json
+import threading
+import logging
+
+import numpy as np
+
+from app.config import (
+    FACE_SEARCH_MODE, FACE_IVF_NLIST, FACE_IVF_NPROBE, FACE_IVF_MIN_SIZE,
+    FACE_INDEX_QUANTIZATION, FACE_RERANK_CANDIDATES
+)
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ("exact", "ivf")
+QUANTIZATION_MODES = ("none", "int8")
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return float32 copy of `vectors` scaled to unit length along the last axis."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def load_threshold(report_path: str, default: float, engine: str = None) -> float:
+    """
+    Cosine distance threshold from a report of face-recognition-test/evaluate_threshold.py,
+    or `default` when there is no readable report.
+
+    The report records which FaceNet engine produced the evaluated embeddings;
+    a mismatch with `engine` is logged, since distances shift between engines.
+    """
+    if not report_path or not os.path.exists(report_path):
+        return default
+    try:
+        with open(report_path) as f:
+            report = json.load(f)
+        threshold = float(report["threshold"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring threshold report {report_path}: {e}")
+        return default
+
+    if engine and report.get("engine") and report["engine"] != engine:
+        logger.warning(f"Threshold report {report_path} was evaluated with engine "
+                       f"'{report['engine']}', but '{engine}' is configured")
+    logger.info(f"Face threshold {threshold} from {report_path} "
+                f"(FAR {report.get('far')}, FRR {report.get('frr')}, EER {report.get('eer')})")
+    return threshold
+
+
+def quantize_int8(vectors: np.ndarray):
+    """
+    Symmetric per-row int8 quantization: `vectors[i] ~= codes[i] * scales[i]`.
+    Returns (codes, scales) as int8 and float32 arrays.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray, block_size: int = 4096) -> np.ndarray:
+    """
+    Approximate dot products of int8 rows with a float query.
+
+    NumPy has no BLAS path for integer matrices, so each block of rows is
+    widened to float32 and multiplied with BLAS; the temporary stays a few
+    MB and cache-sized regardless of the gallery size.
+    """
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), block_size):
+        stop = start + block_size
+        scores[start:stop] = (codes[start:stop].astype(np.float32) @ query) * scales[start:stop]
+    return scores
+
+
+def top_k_smallest(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` smallest entries of `values`, in ascending order."""
+    k = min(k, len(values))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(values):
+        top = np.argpartition(values, k - 1)[:k]
+    else:
+        top = np.arange(len(values))
+    return top[np.argsort(values[top], kind="stable")]
+
+
+class IVFQuantizer:
+    """
+    Inverted-file coarse quantizer for approximate cosine search.
+
+    Unit vectors are clustered with spherical k-means into `nlist` cells.
+    A search scores the probe against the centroids, then scans only the
+    rows of the `nprobe` closest cells. Rows are kept grouped by cell
+    (`order` + `offsets`) so each cell is one contiguous index range.
+    """
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = centroids
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        self.trained_size = 0
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, nlist: int, iterations: int = 15, sample_size: int = 50000, seed: int = 0):
+        """Fit `nlist` centroids with spherical k-means on (a sample of) `matrix`."""
+        rng = np.random.default_rng(seed)
+        sample = matrix
+        if len(matrix) > sample_size:
+            sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+        sample = np.ascontiguousarray(sample, dtype=np.float32)
+
+        nlist = max(1, min(nlist, len(sample)))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Reseed empty cells with random points so no centroid is wasted
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            centroids = l2_normalize(sums)
+
+        quantizer = cls(centroids)
+        quantizer.trained_size = len(matrix)
+        return quantizer
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Cell id of the closest centroid for every row of `vectors`."""
+        if len(vectors) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def with_assignments(self, assignments: np.ndarray):
+        """Copy of this quantizer indexing rows whose cells are `assignments`."""
+        quantizer = IVFQuantizer(self.centroids)
+        quantizer.trained_size = self.trained_size
+        quantizer.assignments = assignments
+        quantizer.order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        quantizer.offsets[1:] = np.cumsum(counts)
+        return quantizer
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row indices stored in the `nprobe` cells closest to `query`."""
+        cells = top_k_smallest(-(self.centroids @ query), nprobe)
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+
+
+class _GallerySnapshot:
+    """Immutable view of the gallery handed to readers."""
+
+    __slots__ = ("matrix", "scales", "usernames", "rows", "ivf")
+
+    def __init__(self, matrix, usernames, ivf=None, scales=None):
+        # float32 unit vectors, or int8 codes with per-row `scales` for a quantized gallery
+        self.matrix = matrix
+        self.scales = scales
+        self.usernames = usernames
+        self.rows = {name: i for i, name in enumerate(usernames)}
+        self.ivf = ivf
+
+
+class FaceEmbeddingIndex:
+    """
+    Process-wide gallery of registered face embeddings.
+
+    Embeddings are kept as one L2-normalized float32 matrix with a parallel
+    array of usernames, so matching a probe is a single matrix-vector product
+    (cosine distance = 1 - dot product of unit vectors) followed by an
+    argpartition top-k instead of unpickling every file per request.
+
+    With `search_mode="ivf"` and at least `ivf_min_size` faces, the scan is
+    restricted to the rows of the closest IVF cells. Centroids are trained
+    once and retrained when the gallery has doubled since the last training;
+    registrations in between are assigned to the existing cells.
+
+    Writers build a new snapshot and swap it in under a lock; readers take
+    the current snapshot without locking, so a search never sees a
+    half-updated gallery.
+
+    The index itself is not persistent: `FaceGallery` loads it from
+    face_registrations and keeps it in sync across workers.
+
+    With `quantization="int8"` the gallery keeps only int8 codes and one
+    scale per row (a quarter of the float32 matrix). The approximate scan
+    selects the `rerank_candidates` closest rows, which are then re-ranked
+    with their exact float embeddings from the attached vector source
+    (see `attach_vector_source`), so returned distances are exact.
+    """
+
+    def __init__(self, search_mode: str = "exact", nlist: int = 0, nprobe: int = 8, ivf_min_size: int = 2000,
+                 quantization: str = "none", rerank_candidates: int = 32):
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown face search mode '{search_mode}', expected one of {SEARCH_MODES}")
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown face index quantization '{quantization}', expected one of {QUANTIZATION_MODES}")
+        self.search_mode = search_mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_min_size = ivf_min_size
+        self.quantization = quantization
+        self.rerank_candidates = rerank_candidates
+        self._lock = threading.Lock()
+        self._vector_source = None
+        self._snapshot = _GallerySnapshot(np.zeros((0, 0), dtype=np.float32), np.array([], dtype=object))
+
+    def __len__(self):
+        return len(self._current().rows)
+
+    def __contains__(self, username: str):
+        return username in self._current().rows
+
+    @property
+    def usernames(self):
+        return list(self._current().rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the gallery matrix (and int8 scales)."""
+        snapshot = self._current()
+        return snapshot.matrix.nbytes + (0 if snapshot.scales is None else snapshot.scales.nbytes)
+
+    def attach_vector_source(self, fetch):
+        """
+        Exact embeddings for re-ranking a quantized gallery: `fetch(usernames)`
+        returns {username: float vector}. Without a source, a quantized index
+        returns the approximate int8 distances.
+        """
+        self._vector_source = fetch
+
+    def load_matrix(self, matrix: np.ndarray, usernames):
+        """Replace the whole gallery with `matrix` rows labelled by `usernames`."""
+        scales = None
+        if len(usernames):
+            matrix, scales = self._encode(l2_normalize(matrix))
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            self._swap(matrix, np.array(usernames, dtype=object), ivf=None, scales=scales)
+
+    def add(self, username: str, embedding: np.ndarray):
+        """Insert or replace the embedding registered for `username`."""
+        vector = l2_normalize(np.asarray(embedding).ravel())
+        encoded, scale = self._encode(vector[np.newaxis, :])
+        with self._lock:
+            snapshot = self._snapshot
+            matrix, usernames, scales = snapshot.matrix, snapshot.usernames, snapshot.scales
+            row = snapshot.rows.get(username)
+            if row is not None:
+                matrix = matrix.copy()
+                matrix[row] = encoded[0]
+                if scales is not None:
+                    scales = scales.copy()
+                    scales[row] = scale[0]
+            elif len(usernames) == 0:
+                matrix, scales = encoded, scale
+                usernames = np.array([username], dtype=object)
+            else:
+                matrix = np.vstack([matrix, encoded])
+                if scales is not None:
+                    scales = np.append(scales, scale)
+                usernames = np.append(usernames, np.array([username], dtype=object))
+
+            ivf = snapshot.ivf
+            if ivf is not None:
+                if row is None:
+                    assignments = np.append(ivf.assignments, ivf.assign(vector[np.newaxis, :]))
+                else:
+                    assignments = ivf.assignments.copy()
+                    assignments[row] = ivf.assign(vector[np.newaxis, :])[0]
+                ivf = ivf.with_assignments(assignments.astype(np.int32))
+            self._swap(matrix, usernames, ivf, scales=scales)
+
+    def remove(self, username: str) -> bool:
+        """Drop `username` from the index. Returns False if it was not present."""
+        with self._lock:
+            snapshot = self._snapshot
+            row = snapshot.rows.get(username)
+            if row is None:
+                return False
+            ivf = snapshot.ivf
+            if ivf is not None:
+                ivf = ivf.with_assignments(np.delete(ivf.assignments, row))
+            scales = None if snapshot.scales is None else np.delete(snapshot.scales, row)
+            self._swap(np.delete(snapshot.matrix, row, axis=0), np.delete(snapshot.usernames, row), ivf,
+                       scales=scales)
+            return True
+
+    def search(self, embedding: np.ndarray, k: int = 5, threshold: float = None, exact: bool = False,
+               candidates=None, vector_source=None):
+        """
+        Find the `k` registered faces closest to `embedding`.
+
+        Returns a list of (username, cosine_distance) sorted by distance,
+        keeping only matches below `threshold` when it is given. `exact=True`
+        forces a full scan even when the IVF search mode is active.
+
+        `candidates` restricts the search to those usernames (e.g. the
+        roster of one class); unregistered names are ignored.
+        `vector_source` replaces the attached source for this call.
+        """
+        return self.search_batch([embedding], k, threshold, exact, candidates, vector_source)[0]
+
+    def search_batch(self, embeddings, k: int = 5, threshold: float = None, exact: bool = False,
+                     candidates=None, vector_source=None):
+        """
+        `search` for several probes at once (e.g. every face of one photo),
+        against the same snapshot. A quantized gallery fetches the exact
+        vectors of all probes' re-rank candidates with a single call of the
+        vector source instead of one per probe.
+        """
+        snapshot = self._current()
+        if not snapshot.rows or len(embeddings) == 0:
+            return [[] for _ in embeddings]
+        limit = np.inf if threshold is None else threshold
+
+        scans = []
+        for embedding in embeddings:
+            query = l2_normalize(np.asarray(embedding).ravel())
+            rows, distances = self._scan(snapshot, query, exact, candidates)
+            top = top_k_smallest(distances, k if snapshot.scales is None else max(k, self.rerank_candidates))
+            scans.append((query, [snapshot.usernames[rows[i]] for i in top], distances[top]))
+
+        if snapshot.scales is None:
+            return [[(name, float(d)) for name, d in zip(names, distances) if d < limit]
+                    for _, names, distances in scans]
+
+        source = vector_source or self._vector_source
+        vectors = source(sorted({name for _, names, _ in scans for name in names})) if source else None
+        return [self._rerank(names, distances, query, k, limit, vectors) for query, names, distances in scans]
+
+    def distance(self, username: str, embedding: np.ndarray, vector_source=None):
+        """Cosine distance between `embedding` and the face of `username` (1:1), or None if unregistered."""
+        snapshot = self._current()
+        row = snapshot.rows.get(username)
+        if row is None:
+            return None
+        query = l2_normalize(np.asarray(embedding).ravel())
+        source = vector_source or self._vector_source
+        if snapshot.scales is not None and source is not None:
+            vector = source([username]).get(username)
+            if vector is not None:
+                return float(1.0 - l2_normalize(vector) @ query)
+        return float(1.0 - self._scores(snapshot, np.array([row]), query)[0])
+
+    def _encode(self, vectors: np.ndarray):
+        """(matrix, scales) stored for unit `vectors` in the configured quantization."""
+        if self.quantization == "int8":
+            return quantize_int8(vectors)
+        return vectors, None
+
+    @staticmethod
+    def _scores(snapshot: _GallerySnapshot, rows, query: np.ndarray) -> np.ndarray:
+        """Dot products of `query` with the gallery `rows` (None = all rows), approximate if quantized."""
+        matrix = snapshot.matrix if rows is None else snapshot.matrix[rows]
+        if snapshot.scales is None:
+            return matrix @ query
+        return int8_scores(matrix, snapshot.scales if rows is None else snapshot.scales[rows], query)
+
+    def _scan(self, snapshot: _GallerySnapshot, query: np.ndarray, exact: bool, candidates):
+        """(rows, approximate distances) of the rows a search for `query` has to consider."""
+        if candidates is not None:
+            rows = np.array([snapshot.rows[name] for name in candidates if name in snapshot.rows], dtype=np.int64)
+            if len(rows) == 0:
+                return rows, np.zeros(0, dtype=np.float32)
+            return rows, 1.0 - self._scores(snapshot, rows, query)
+        if snapshot.ivf is not None and not exact:
+            rows = snapshot.ivf.candidates(query, self.nprobe)
+            return rows, 1.0 - self._scores(snapshot, rows, query)
+        return np.arange(len(snapshot.usernames)), 1.0 - self._scores(snapshot, None, query)
+
+    @staticmethod
+    def _rerank(names, distances, query, k, limit, vectors):
+        """Top-k of a quantized shortlist, re-scored with exact `vectors` ({username: vector}) when given."""
+        if vectors is not None:
+            names = [name for name in names if name in vectors]
+            if not names:
+                return []
+            distances = 1.0 - l2_normalize(np.stack([np.asarray(vectors[name]).ravel() for name in names])) @ query
+
+        order = top_k_smallest(distances, k)
+        order = order[distances[order] < limit]
+        return [(names[i], float(distances[i])) for i in order]
+
+    def _current(self) -> _GallerySnapshot:
+        return self._snapshot
+
+    def _swap(self, matrix: np.ndarray, usernames: np.ndarray, ivf, scales=None):
+        # Called with self._lock held
+        size = len(usernames)
+        if self.search_mode != "ivf" or size < self.ivf_min_size:
+            ivf = None
+        elif ivf is None or size >= 2 * ivf.trained_size:
+            nlist = self.nlist or int(np.sqrt(size))
+            # Quantized rows are dequantized once for training and cell assignment
+            dense = matrix if scales is None else matrix.astype(np.float32) * scales[:, None]
+            ivf = IVFQuantizer.train(dense, nlist)
+            ivf = ivf.with_assignments(ivf.assign(dense))
+            logger.info(f"Face index trained IVF with {len(ivf.centroids)} cells on {size} faces")
+        self._snapshot = _GallerySnapshot(matrix, usernames, ivf, scales)
+
+
+face_index = FaceEmbeddingIndex(
+    search_mode=FACE_SEARCH_MODE,
+    nlist=FACE_IVF_NLIST,
+    nprobe=FACE_IVF_NPROBE,
+    ivf_min_size=FACE_IVF_MIN_SIZE,
+    quantization=FACE_INDEX_QUANTIZATION,
+    rerank_candidates=FACE_RERANK_CANDIDATES,
+)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FaceMeshPool:
+    """
+    Bounded pool of MediaPipe FaceMesh graphs for concurrent gaze requests.
+
+    A FaceMesh graph must not be called from two threads at once, so every
+    request checks one instance out and returns it when done. Instances are
+    created lazily, up to `size` (default: CPU count). The pool owns a
+    thread pool of the same size, so `run()` keeps MediaPipe off the event
+    loop and off the TensorFlow inference pool, and at most `size` graphs
+    run in parallel.
+
+    `metrics()` reports how long requests waited for an instance (from
+    `run()` until checkout, including queueing for a thread) and the
+    utilization, i.e. the share of instance-time spent processing.
+    """
+
+    def __init__(self, factory, size: int = 0, wait_samples: int = 1000):
+        self.factory = factory
+        self.size = size or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="facemesh")
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._busy_seconds = 0.0
+        self._waits = deque(maxlen=wait_samples)
+        self._started = time.monotonic()
+
+    def warm_up(self):
+        """Build the first instance now, so the first request does not pay for it."""
+        with self._lock:
+            create = self._created == 0
+            if create:
+                self._created += 1
+        if create:
+            self._idle.put(self._create())
+        return self
+
+    @contextmanager
+    def acquire(self, requested_at: float = None):
+        """Check out a FaceMesh for the calling thread; blocks while all `size` are in use."""
+        requested_at = requested_at or time.monotonic()
+        mesh = self._checkout()
+        checked_out = time.monotonic()
+        with self._lock:
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            self._checkouts += 1
+            self._waits.append(checked_out - requested_at)
+        try:
+            yield mesh
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._busy_seconds += time.monotonic() - checked_out
+            self._idle.put(mesh)
+
+    async def run(self, func, *args):
+        """Run `func(mesh, *args)` on the pool's threads with a checked-out FaceMesh."""
+        requested_at = time.monotonic()
+
+        def call():
+            with self.acquire(requested_at) as mesh:
+                return func(mesh, *args)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    async def submit(self, func, *args):
+        """Run `func(*args)` on the pool's threads without a checkout (e.g. a stream's own FaceMesh)."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: func(*args))
+
+    def metrics(self) -> dict:
+        with self._lock:
+            waits = np.array(self._waits, dtype=np.float64) * 1000.0
+            busy = self._busy_seconds
+            in_use, peak, created, checkouts = self._in_use, self._peak_in_use, self._created, self._checkouts
+        elapsed = time.monotonic() - self._started
+        return {
+            "size": self.size,
+            "created": created,
+            "in_use": in_use,
+            "peak_in_use": peak,
+            "checkouts": checkouts,
+            "wait_ms": {
+                "samples": len(waits),
+                "avg": round(float(waits.mean()), 3) if len(waits) else None,
+                "p95": round(float(np.percentile(waits, 95)), 3) if len(waits) else None,
+                "max": round(float(waits.max()), 3) if len(waits) else None,
+            },
+            "utilization": round(busy / (self.size * elapsed), 4) if elapsed > 0 else 0.0,
+        }
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        return self._create()
+
+    def _create(self):
+        """Build one instance; the caller has already counted it in `_created`."""
+        try:
+            mesh = self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        logger.info(f"FaceMesh pool created instance {self._created}/{self.size}")
+        return mesh
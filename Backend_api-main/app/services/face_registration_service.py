@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.face_registration_model import FaceRegistration
+from app.services.face_gallery_service import face_gallery
+
+# Face login dinonaktifkan otomatis setelah gagal verifikasi sebanyak ini
+MAX_FAILED_ATTEMPTS = 10
+
+
+def get_active_registration(db: Session, nim: str):
+    """Return the active FaceRegistration row for `nim`, or None."""
+    return db.query(FaceRegistration).filter(
+        FaceRegistration.nim == nim,
+        FaceRegistration.is_active == True
+    ).first()
+
+
+def record_verification(db: Session, face_reg: FaceRegistration, success: bool):
+    """
+    Update verification statistics of `face_reg` and commit.
+
+    A success resets the failure counter; too many consecutive failures
+    disable face verification for the student, through `face_gallery` so
+    the face also leaves this worker's index right away.
+    """
+    if success:
+        face_reg.last_verified = datetime.now()
+        face_reg.verification_count = (face_reg.verification_count or 0) + 1
+        face_reg.failed_attempts = 0
+    else:
+        face_reg.failed_attempts = (face_reg.failed_attempts or 0) + 1
+        if face_reg.failed_attempts >= MAX_FAILED_ATTEMPTS:
+            face_gallery.set_active(db, face_reg.nim, False)
+            return
+    db.commit()
+
+
+def record_verification_by_nim(db: Session, nim: str, success: bool) -> bool:
+    """
+    Same statistics as `record_verification`, as one UPDATE by NIM without
+    loading the row and without committing (the caller commits it together
+    with its own changes).
+
+    Returns True when this failure reached MAX_FAILED_ATTEMPTS. The UPDATE
+    already cleared is_active; after committing, the caller must pass the
+    deactivation to `face_gallery.set_active` so the face leaves the index.
+    """
+    if success:
+        db.execute(
+            text("""
+                UPDATE face_registrations
+                SET last_verified = :now,
+                    verification_count = COALESCE(verification_count, 0) + 1,
+                    failed_attempts = 0
+                WHERE nim = :nim
+            """),
+            {"now": datetime.now(), "nim": nim}
+        )
+        return False
+    else:
+        # is_active dihitung lebih dulu: MySQL memakai nilai baru untuk kolom yang sudah di-SET
+        db.execute(
+            text("""
+                UPDATE face_registrations
+                SET is_active = CASE WHEN COALESCE(failed_attempts, 0) + 1 >= :max_failed THEN FALSE ELSE is_active END,
+                    failed_attempts = COALESCE(failed_attempts, 0) + 1
+                WHERE nim = :nim
+            """),
+            {"max_failed": MAX_FAILED_ATTEMPTS, "nim": nim}
+        )
+        failed_attempts = db.execute(
+            text("SELECT failed_attempts FROM face_registrations WHERE nim = :nim"),
+            {"nim": nim}
+        ).scalar()
+        return failed_attempts == MAX_FAILED_ATTEMPTS
@@ -0,0 +1,108 @@
+import math
+import struct
+
+import cv2
+import numpy as np
+
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...), excluding DHT/JPG/DAC
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def probe_image_size(image_bytes: bytes):
+    """(width, height) read from a JPEG or PNG header without decoding, or None."""
+    if image_bytes[:8] == b"\x89PNG\r\n\x1a\n" and len(image_bytes) >= 24:
+        return struct.unpack(">II", image_bytes[16:24])
+    if image_bytes[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(image_bytes):
+        if image_bytes[i] != 0xFF:
+            return None
+        marker = image_bytes[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", image_bytes[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", image_bytes[i + 2:i + 4])[0]
+    return None
+
+
+def reduction_factor(size, max_side: int) -> int:
+    """Largest JPEG DCT scale (1, 2, 4, 8) that keeps the long side at or above `max_side`."""
+    if not size or not max_side:
+        return 1
+    long_side = max(size)
+    factor = 1
+    for candidate in (2, 4, 8):
+        if long_side / candidate >= max_side:
+            factor = candidate
+    return factor
+
+
+def decode_image(image_bytes: bytes, factor: int = 1):
+    """Decode `image_bytes` as BGR, `factor` times smaller per side. None if not an image."""
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), REDUCED_DECODE_FLAGS[factor])
+
+
+def scale_box(box, from_shape, to_shape):
+    """Map an [x, y, w, h] box from an image of `from_shape` onto one of `to_shape`, clipped."""
+    scale_y = to_shape[0] / from_shape[0]
+    scale_x = to_shape[1] / from_shape[1]
+    x, y, w, h = box
+    x0, y0 = max(0, math.floor(x * scale_x)), max(0, math.floor(y * scale_y))
+    x1 = min(to_shape[1], math.ceil((x + w) * scale_x))
+    y1 = min(to_shape[0], math.ceil((y + h) * scale_y))
+    return [x0, y0, x1 - x0, y1 - y0]
+
+
+def locate_faces(image_bytes: bytes, detector, max_side: int = 0):
+    """
+    Detect on a reduced decode of a large upload, crop from the full-resolution one.
+
+    JPEG decoding with IMREAD_REDUCED_COLOR_N scales in the DCT domain, so
+    the small frame costs a fraction of a full decode, and detection runs on
+    ~`max_side` pixels instead of every camera pixel. The full image is only
+    decoded when a face was found, and the boxes are mapped back onto it so
+    the embedding model still gets full-quality crops.
+
+    Returns (image, faces), largest face first, with every face's "box"
+    mapped onto `image`: `image` is None if the bytes are not an image,
+    `faces` is empty if no face was found.
+    """
+    factor = reduction_factor(probe_image_size(image_bytes), max_side)
+    frame = decode_image(image_bytes, factor)
+    if frame is None:
+        return None, []
+
+    faces = detector.detect_faces(frame)
+    if not faces or factor == 1:
+        return frame, faces
+
+    image = decode_image(image_bytes)
+    for face in faces:
+        face["box"] = scale_box(face["box"], frame.shape, image.shape)
+    return image, faces
+
+
+def locate_largest_face(image_bytes: bytes, detector, max_side: int = 0):
+    """
+    `locate_faces` for a single-subject photo: returns (image, box) of the
+    largest face, `box` is None if no face was found.
+    """
+    image, faces = locate_faces(image_bytes, detector, max_side)
+    return image, (faces[0]["box"] if faces else None)
+
+
+def sharpness(face_crop: np.ndarray, size: int = 160) -> float:
+    """Variance of the Laplacian of the crop at FaceNet input size; low values mean blur."""
+    gray = cv2.cvtColor(cv2.resize(face_crop, (size, size)), cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
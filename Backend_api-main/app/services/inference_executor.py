@@ -0,0 +1,24 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import FACE_INFERENCE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Dedicated pool for TensorFlow inference (MTCNN/FaceNet).
+# A thread pool is used rather than a process pool: TensorFlow releases the
+# GIL inside its kernels, and worker processes would each load their own
+# copy of the models. Keeping inference off Starlette's default pool also
+# leaves that pool free for the sync CRUD endpoints.
+inference_executor = ThreadPoolExecutor(
+    max_workers=max(1, FACE_INFERENCE_WORKERS),
+    thread_name_prefix="face-inference"
+)
+
+
+async def run_inference(func, *args, **kwargs):
+    """Run a blocking model call on the inference pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, functools.partial(func, *args, **kwargs))
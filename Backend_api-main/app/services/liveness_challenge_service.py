@@ -0,0 +1,173 @@
+import random
+import time
+import logging
+
+import cv2
+import numpy as np
+
+from app.config import FACE_LIVENESS_CHALLENGE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Same challenges and thresholds as face-recognition-test/liveness_detection.py,
+# except SMILE_THRESHOLD (see below)
+CHALLENGES = {
+    "BLINK": "Kedipkan mata 3 kali",
+    "TURN_LEFT": "Toleh ke kiri",
+    "TURN_RIGHT": "Toleh ke kanan",
+    "NOD": "Anggukkan kepala ke bawah",
+    "SMILE": "Tersenyum lebar",
+}
+
+EYE_AR_THRESHOLD = 0.21  # Eye Aspect Ratio untuk deteksi kedipan
+HEAD_TURN_THRESHOLD = 15  # Derajat untuk head turn
+HEAD_NOD_THRESHOLD = 12  # Derajat untuk head nod
+# Perubahan rasio lebar/tinggi mulut untuk senyum. Prototype memakai 0.02, padahal
+# jitter FaceMesh saat tracking pada foto diam saja sudah ~0.1, jadi foto lolos
+SMILE_THRESHOLD = 0.25
+REQUIRED_BLINKS = 3
+CALIBRATION_FRAMES = 10
+CONFIRM_FRAMES = 3  # Toleh/angguk/senyum harus terdeteksi di sekian frame berturut-turut
+
+LEFT_EYE = [33, 160, 158, 133, 153, 144]
+RIGHT_EYE = [362, 385, 387, 263, 373, 380]
+NOSE_TIP, CHIN, LEFT_EYE_CORNER, RIGHT_EYE_CORNER = 1, 152, 33, 263
+MOUTH_LEFT, MOUTH_RIGHT, MOUTH_TOP, MOUTH_BOTTOM = 61, 291, 0, 17
+
+
+def eye_aspect_ratio(eye: np.ndarray) -> float:
+    """EAR of six eye landmarks (corner, top, top, corner, bottom, bottom)."""
+    vertical = np.linalg.norm(eye[1] - eye[5]) + np.linalg.norm(eye[2] - eye[4])
+    return float(vertical / (2.0 * np.linalg.norm(eye[0] - eye[3])))
+
+
+def head_pose(points: np.ndarray, frame_width: int):
+    """Approximate (yaw, pitch) in degrees from nose, eye corners and chin."""
+    eye_center = (points[LEFT_EYE_CORNER] + points[RIGHT_EYE_CORNER]) / 2
+    nose, chin = points[NOSE_TIP], points[CHIN]
+    yaw = (nose[0] - eye_center[0]) / frame_width * 180
+    pitch = (nose[1] - eye_center[1]) / max(chin[1] - eye_center[1], 1e-6) * 90
+    return float(yaw), float(pitch)
+
+
+def mouth_ratio(points: np.ndarray) -> float:
+    height = np.linalg.norm(points[MOUTH_TOP] - points[MOUTH_BOTTOM])
+    if height == 0:
+        return 0.0
+    return float(np.linalg.norm(points[MOUTH_LEFT] - points[MOUTH_RIGHT]) / height)
+
+
+class ChallengeSession:
+    """
+    One liveness challenge (blink, turn, nod or smile) for one WebSocket connection.
+
+    The session owns its own FaceMesh in video mode (`static_image_mode=False`),
+    so after the first detection MediaPipe only tracks the landmarks from
+    frame to frame instead of re-running the face detector. The per-challenge
+    state (blink counter, calibrated head pose, mouth baseline) follows the
+    desktop prototype in face-recognition-test/liveness_detection.py.
+
+    Not thread-safe: frames of one session must be processed one at a time.
+    """
+
+    def __init__(self, challenge: str = None, timeout: float = FACE_LIVENESS_CHALLENGE_TIMEOUT):
+        import mediapipe as mp
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+        self.challenge = challenge or random.choice(list(CHALLENGES))
+        if self.challenge not in CHALLENGES:
+            raise ValueError(f"Unknown liveness challenge '{challenge}', expected one of {tuple(CHALLENGES)}")
+        self.timeout = timeout
+        self.started_at = time.monotonic()
+        self.frames = 0
+        self.completed = False
+
+        self._closed_frames = 0
+        self._blinks = 0
+        self._calibration = 0
+        self._baseline = None
+        self._confirmed = 0
+
+    @property
+    def instruction(self) -> str:
+        return CHALLENGES[self.challenge]
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.timeout - (time.monotonic() - self.started_at))
+
+    @property
+    def expired(self) -> bool:
+        return not self.completed and self.remaining <= 0
+
+    def process_frame(self, frame_bgr: np.ndarray) -> dict:
+        """
+        Feed one BGR frame and return the challenge progress:
+        `{"face": bool, "completed": bool, "calibrating": bool, "details": {...}}`.
+        """
+        self.frames += 1
+        height, width = frame_bgr.shape[:2]
+        results = self.face_mesh.process(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))
+        if not results.multi_face_landmarks:
+            return {"face": False, "completed": False, "calibrating": False, "details": {}}
+
+        landmarks = results.multi_face_landmarks[0].landmark
+        points = np.array([(lm.x * width, lm.y * height) for lm in landmarks], dtype=np.float32)
+        success, calibrating, details = self._check(points, width)
+        if self.challenge == "BLINK":
+            completed = success
+        else:
+            self._confirmed = self._confirmed + 1 if success else 0
+            completed = self._confirmed >= CONFIRM_FRAMES
+        self.completed = completed
+        return {"face": True, "completed": completed, "calibrating": calibrating, "details": details}
+
+    def _calibrate(self, value: float) -> bool:
+        """Smooth the neutral baseline over the first frames; True once calibrated."""
+        if self._calibration >= CALIBRATION_FRAMES:
+            return True
+        if self._baseline is None:
+            self._baseline = value
+        else:
+            self._baseline = 0.7 * np.asarray(self._baseline) + 0.3 * np.asarray(value)
+        self._calibration += 1
+        return False
+
+    def _check(self, points: np.ndarray, width: int):
+        if self.challenge == "BLINK":
+            ear = (eye_aspect_ratio(points[LEFT_EYE]) + eye_aspect_ratio(points[RIGHT_EYE])) / 2
+            if ear < EYE_AR_THRESHOLD:
+                self._closed_frames += 1
+            else:
+                if self._closed_frames >= 2:
+                    self._blinks += 1
+                self._closed_frames = 0
+            details = {"blink_count": self._blinks, "required": REQUIRED_BLINKS, "ear": round(ear, 3)}
+            return self._blinks >= REQUIRED_BLINKS, False, details
+
+        if self.challenge == "SMILE":
+            ratio = mouth_ratio(points)
+            if not self._calibrate(ratio):
+                return False, True, {}
+            intensity = ratio - float(self._baseline)
+            return intensity > SMILE_THRESHOLD, False, {"intensity": round(intensity, 3)}
+
+        yaw, pitch = head_pose(points, width)
+        if not self._calibrate((yaw, pitch)):
+            return False, True, {}
+        delta_yaw, delta_pitch = yaw - self._baseline[0], pitch - self._baseline[1]
+        if self.challenge == "TURN_LEFT":
+            success, angle, required = delta_yaw < -HEAD_TURN_THRESHOLD, abs(delta_yaw), HEAD_TURN_THRESHOLD
+        elif self.challenge == "TURN_RIGHT":
+            success, angle, required = delta_yaw > HEAD_TURN_THRESHOLD, abs(delta_yaw), HEAD_TURN_THRESHOLD
+        else:
+            success, angle, required = delta_pitch > HEAD_NOD_THRESHOLD, abs(delta_pitch), HEAD_NOD_THRESHOLD
+        return success, False, {"angle": round(float(angle), 1), "required": required}
+
+    def close(self):
+        self.face_mesh.close()
@@ -0,0 +1,113 @@
+import threading
+
+import cv2
+import numpy as np
+
+from app.config import (
+    FACE_LIVENESS_ANALYSIS_SIZE, FACE_LIVENESS_MOIRE_THRESHOLD,
+    FACE_LIVENESS_S_VAR_THRESHOLD, FACE_LIVENESS_V_VAR_THRESHOLD
+)
+
+
+class PassiveLiveness:
+    """
+    Single-frame screen-replay check, ported from the prototype in
+    face-recognition-test/face_recognize.py (`check_liveness`).
+
+    Two cues are combined, and either one rejects the face:
+
+    - Moiré / frequency: a face re-captured from a phone or laptop screen is
+      smoother than a real one, so the share of spectral energy outside a
+      low-frequency disc (radius min(h, w) / 6) is low.
+    - Artificial light: a backlit screen gives flat colour, so both the
+      saturation and the value variance are low.
+
+    Unlike the prototype, the crop is first resized to a fixed
+    `analysis_size`, the spectrum is a real FFT (`rfft2`) on float32, and
+    the disc mask is built once per spectrum shape and reused.
+    """
+
+    def __init__(self, analysis_size: int = 128, moire_threshold: float = 0.4,
+                 s_var_threshold: float = 400, v_var_threshold: float = 500):
+        self.analysis_size = analysis_size
+        self.moire_threshold = moire_threshold
+        self.s_var_threshold = s_var_threshold
+        self.v_var_threshold = v_var_threshold
+        self._lock = threading.Lock()
+        self._weights = {}
+
+    def _spectrum_weights(self, shape):
+        """
+        (total, high) weights over the `rfft2` half-spectrum of an image of `shape`.
+
+        `total` counts every column except DC (and Nyquist for even widths)
+        twice, so sums over the half-spectrum equal sums over the full
+        `fft2` magnitude. `high` additionally zeroes the low-frequency disc.
+        """
+        weights = self._weights.get(shape)
+        if weights is not None:
+            return weights
+
+        h, w = shape
+        fy = np.fft.fftfreq(h) * h
+        fx = np.arange(w // 2 + 1, dtype=np.float32)
+        radius = min(h, w) // 6
+        low = fy[:, None] ** 2 + fx[None, :] ** 2 <= radius ** 2
+
+        total = np.full((h, w // 2 + 1), 2.0, dtype=np.float32)
+        total[:, 0] = 1.0
+        if w % 2 == 0:
+            total[:, -1] = 1.0
+        high = np.where(low, 0.0, total).astype(np.float32)
+
+        with self._lock:
+            self._weights[shape] = (total, high)
+        return total, high
+
+    def moire_score(self, gray: np.ndarray) -> float:
+        """High-frequency share of the magnitude spectrum of a grayscale image."""
+        magnitude = np.abs(np.fft.rfft2(gray.astype(np.float32)))
+        total, high = self._spectrum_weights(gray.shape)
+        return float(np.vdot(magnitude, high) / (np.vdot(magnitude, total) + 1e-6))
+
+    def check(self, face_bgr: np.ndarray) -> dict:
+        """Liveness verdict and scores for a BGR face crop."""
+        size = self.analysis_size
+        face = cv2.resize(face_bgr, (size, size), interpolation=cv2.INTER_AREA)
+
+        moire_score = self.moire_score(cv2.cvtColor(face, cv2.COLOR_BGR2GRAY))
+        moire_detected = moire_score < self.moire_threshold
+
+        hsv = cv2.cvtColor(face, cv2.COLOR_BGR2HSV)
+        s_var = float(np.var(hsv[:, :, 1]))
+        v_var = float(np.var(hsv[:, :, 2]))
+        artificial_light = s_var < self.s_var_threshold and v_var < self.v_var_threshold
+
+        if moire_detected:
+            confidence = min(max(1.0 - moire_score / self.moire_threshold, 0.0), 1.0)
+            method = "moire"
+        elif artificial_light:
+            confidence = 1.0 - min(s_var / self.s_var_threshold, 1.0)
+            method = "artificial_light"
+        else:
+            confidence = min(moire_score / self.moire_threshold, 1.0)
+            method = "live"
+
+        return {
+            "is_live": not (moire_detected or artificial_light),
+            "confidence": confidence,
+            "method": method,
+            "moire_detected": moire_detected,
+            "moire_score": moire_score,
+            "artificial_light": artificial_light,
+            "saturation_var": s_var,
+            "value_var": v_var,
+        }
+
+
+passive_liveness = PassiveLiveness(
+    analysis_size=FACE_LIVENESS_ANALYSIS_SIZE,
+    moire_threshold=FACE_LIVENESS_MOIRE_THRESHOLD,
+    s_var_threshold=FACE_LIVENESS_S_VAR_THRESHOLD,
+    v_var_threshold=FACE_LIVENESS_V_VAR_THRESHOLD
+)
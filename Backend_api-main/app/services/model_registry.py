@@ -0,0 +1,107 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModel:
+    """
+    A model that is built on first use instead of at import time.
+
+    `factory` does the heavy imports and construction (TensorFlow, MediaPipe,
+    ...). `get()` builds the model once, and concurrent callers wait for that
+    single build. `state` is one of "cold", "loading", "ready" or "failed".
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.state = "cold"
+        self.load_seconds = None
+        self.error = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        model = self._model
+        if model is not None:
+            return model
+        with self._lock:
+            if self._model is None:
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._model = self.factory()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    logger.error(f"Failed to load model {self.name}: {e}")
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 2)
+                self.state = "ready"
+                self.error = None
+                logger.info(f"Model {self.name} loaded in {self.load_seconds}s")
+            return self._model
+
+    def status(self) -> dict:
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+
+class ModelRegistry:
+    """
+    Models registered by the routers that are actually mounted.
+
+    Routers register their models at import, which costs nothing; the
+    models are then built either on the first request that needs them or by
+    `start_warm_up()` in a background thread right after startup, so the
+    API accepts (non-ML) requests immediately.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self.warm_up_started = False
+
+    def register(self, name: str, factory) -> LazyModel:
+        model = LazyModel(name, factory)
+        self._models[name] = model
+        return model
+
+    def status(self) -> dict:
+        return {name: model.status() for name, model in self._models.items()}
+
+    def state(self) -> str:
+        """
+        Overall state: ready when every model is loaded, failed if any failed,
+        lazy when no warm-up was started and nothing is loading (models are
+        built on the first request that needs them), else warming_up.
+        """
+        states = [model.state for model in self._models.values()]
+        if all(state == "ready" for state in states):
+            return "ready"
+        if "failed" in states:
+            return "failed"
+        if not self.warm_up_started and "loading" not in states:
+            return "lazy"
+        return "warming_up"
+
+    def is_ready(self) -> bool:
+        """Whether the process can take traffic: all models loaded, or loaded on demand (lazy)."""
+        return self.state() in ("ready", "lazy")
+
+    def warm_up(self):
+        """Build every registered model in order, logging (not raising) failures."""
+        for model in list(self._models.values()):
+            try:
+                model.get()
+            except Exception:
+                pass
+
+    def start_warm_up(self):
+        self.warm_up_started = True
+        thread = threading.Thread(target=self.warm_up, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+
+model_registry = ModelRegistry()
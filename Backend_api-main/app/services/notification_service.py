@@ -1,5 +1,3 @@
-import firebase_admin
-from firebase_admin import credentials, messaging
 import os
 import logging
 
@@ -11,27 +9,35 @@ class NotificationService:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(NotificationService, cls).__new__(cls)
-            cls._instance.active = False
-            cls._instance._initialize()
+            cls._instance._active = None
         return cls._instance
 
+    @property
+    def active(self):
+        # Firebase is imported and initialized on first use, not when the API starts
+        if self._active is None:
+            self._active = self._initialize()
+        return self._active
+
     def _initialize(self):
         # Check specifically in the root directory
         cred_path = os.path.join(os.getcwd(), "serviceAccountKey.json")
         if os.path.exists(cred_path):
             try:
+                import firebase_admin
+                from firebase_admin import credentials
                 # Check if already initialized
                 if not firebase_admin._apps:
                     cred = credentials.Certificate(cred_path)
                     firebase_admin.initialize_app(cred)
-                self.active = True
                 logger.info("Firebase Admin Initialized successfully")
+                return True
             except Exception as e:
                 logger.error(f"Failed to initialize Firebase: {e}")
-                self.active = False
+                return False
         else:
             logger.warning(f"serviceAccountKey.json not found at {cred_path}. Notifications will be disabled.")
-            self.active = False
+            return False
 
     def send_multicast(self, tokens: list, title: str, body: str, data: dict = None, db_session=None):
         """
@@ -65,6 +71,8 @@ class NotificationService:
         invalid_tokens = []
         
         try:
+            from firebase_admin import messaging
+
             # Configure notification with Android-specific settings
             android_config = messaging.AndroidConfig(
                 priority='high',
@@ -1,7 +1,12 @@
+import uuid
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import LIVENESS_TOKEN_EXPIRE_SECONDS
+from app.models.liveness_token_use_model import LivenessTokenUse
 
 SECRET_KEY = "secretjwtkey123"  # ganti jadi environment variable nanti
 ALGORITHM = "HS256"
@@ -12,7 +17,7 @@ security = HTTPBearer()
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
     token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return token
 
@@ -23,6 +28,67 @@ def verify_token(token: str):
     except JWTError:
         return None
 
+def verify_access_token(token: str):
+    """
+    Seperti verify_token, tetapi hanya untuk access token login. Token lain
+    dengan SECRET_KEY yang sama (mis. token liveness) ditolak; access token
+    lama tanpa field type tetap diterima.
+    """
+    payload = verify_token(token)
+    if not payload or payload.get("type", "access") != "access":
+        return None
+    return payload
+
+def create_liveness_token(nim: str, challenge: str, id_presensi: int):
+    """
+    Token bukti liveness challenge berhasil (dari WebSocket /face/liveness).
+    Ditandatangani dengan SECRET_KEY yang sama (type "liveness", ditolak
+    oleh get_current_user sebagai access token), berlaku singkat, terikat ke NIM dan
+    id_presensi, dan hanya bisa dipakai sekali (jti, lihat consume_liveness_token).
+    """
+    expire = datetime.utcnow() + timedelta(seconds=LIVENESS_TOKEN_EXPIRE_SECONDS)
+    return jwt.encode({
+        "type": "liveness",
+        "sub": nim,
+        "id_presensi": id_presensi,
+        "challenge": challenge,
+        "jti": uuid.uuid4().hex,
+        "exp": expire
+    }, SECRET_KEY, algorithm=ALGORITHM)
+
+def verify_liveness_token(token: str, nim: str, id_presensi: int):
+    """Payload token liveness jika valid, belum expired, dan milik NIM dan presensi tersebut; selain itu None."""
+    payload = verify_token(token) if token else None
+    if not payload or payload.get("type") != "liveness" or not payload.get("jti"):
+        return None
+    if payload.get("sub") != nim or payload.get("id_presensi") != id_presensi:
+        return None
+    return payload
+
+def consume_liveness_token(db: Session, token: str, nim: str, id_presensi: int) -> bool:
+    """
+    Verifikasi token liveness lalu tandai jti-nya sudah dipakai (commit).
+    False jika token tidak valid atau sudah pernah dipakai, juga oleh worker lain.
+    """
+    payload = verify_liveness_token(token, nim, id_presensi)
+    if payload is None:
+        return False
+    now = datetime.now()
+    db.query(LivenessTokenUse).filter(LivenessTokenUse.expires_at < now).delete()
+    db.add(LivenessTokenUse(
+        jti=payload["jti"],
+        nim=nim,
+        id_presensi=id_presensi,
+        # Token yang dipakai sekarang pasti sudah expired setelah masa berlaku penuh
+        expires_at=now + timedelta(seconds=LIVENESS_TOKEN_EXPIRE_SECONDS)
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
@@ -31,7 +97,7 @@ def get_current_user(
     Returns user data including user_id, username, email, role
     """
     token = credentials.credentials
-    payload = verify_token(token)
+    payload = verify_access_token(token)
     
     if payload is None:
         raise HTTPException(
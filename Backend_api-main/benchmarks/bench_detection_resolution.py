@@ -0,0 +1,105 @@
+"""
+Face detection latency versus upload size, full-resolution vs reduced decode.
+
+One face photo is re-encoded as JPEG at several megapixel sizes (like
+different phone cameras). For each size this measures
+  - before: cv2.imdecode(IMREAD_COLOR) + detection on every pixel
+  - after:  locate_largest_face (IMREAD_REDUCED_COLOR_N + detection on
+            ~FACE_DETECT_MAX_SIDE pixels + full decode for the crop)
+and the IoU between both boxes on the full image.
+
+Cara menjalankan (dari folder Backend_api-main):
+    python -m benchmarks.bench_detection_resolution --image foto_wajah.jpg
+    python -m benchmarks.bench_detection_resolution --image foto_wajah.jpg --detector mtcnn --megapixels 1 4 12
+"""
+import argparse
+import json
+import math
+import time
+
+import cv2
+import numpy as np
+
+from app.config import FACE_DETECTOR_BACKEND, FACE_DETECT_MAX_SIDE
+from app.services.face_detectors import DETECTOR_BACKENDS, create_face_detector
+from app.services.image_preprocessing import locate_largest_face, decode_image
+from benchmarks.common import percentile_ms
+
+
+def encode_at_megapixels(img: np.ndarray, megapixels: float, quality: int = 90) -> bytes:
+    h, w = img.shape[:2]
+    scale = math.sqrt(megapixels * 1e6 / (w * h))
+    resized = cv2.resize(img, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_CUBIC)
+    return cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def iou(a, b):
+    if a is None or b is None:
+        return None
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    return round(inter / float(a[2] * a[3] + b[2] * b[3] - inter), 3)
+
+
+def before(image_bytes: bytes, detector):
+    img = decode_image(image_bytes)
+    faces = detector.detect_faces(img)
+    return faces[0]["box"] if faces else None
+
+
+def after(image_bytes: bytes, detector, max_side: int):
+    _, box = locate_largest_face(image_bytes, detector, max_side)
+    return box
+
+
+def timed(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, percentile_ms(samples, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", required=True, help="Foto berisi satu wajah")
+    parser.add_argument("--detector", choices=list(DETECTOR_BACKENDS), default=FACE_DETECTOR_BACKEND)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[0.3, 1, 3, 8, 12])
+    parser.add_argument("--max-side", type=int, default=FACE_DETECT_MAX_SIDE or 640)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    args = parser.parse_args()
+
+    img = cv2.imread(args.image, cv2.IMREAD_COLOR)
+    if img is None:
+        parser.error(f"Tidak dapat membaca {args.image}")
+    detector = create_face_detector(args.detector)
+    detector.detect_faces(img)  # warm-up
+
+    results = []
+    print(f"detector={args.detector}  max_side={args.max_side}\n")
+    print(f"{'MP':>5} {'before ms':>10} {'after ms':>9} {'speedup':>8} {'IoU':>6}")
+    for megapixels in args.megapixels:
+        image_bytes = encode_at_megapixels(img, megapixels)
+        box_before, ms_before = timed(lambda: before(image_bytes, detector), args.repeat)
+        box_after, ms_after = timed(lambda: after(image_bytes, detector, args.max_side), args.repeat)
+        row = {
+            "megapixels": megapixels,
+            "before_p50_ms": ms_before,
+            "after_p50_ms": ms_after,
+            "speedup": round(ms_before / ms_after, 2) if ms_after else None,
+            "iou": iou(box_before, box_after),
+        }
+        results.append(row)
+        print(f"{megapixels:>5} {ms_before:>10} {ms_after:>9} {str(row['speedup']):>8} {str(row['iou']):>6}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Throughput of FaceNet embeddings with and without micro-batching.
+
+N concurrent clients each embed face crops in a loop for a fixed duration,
+once through an EmbeddingBatcher with batch size 1 (the old behaviour) and
+once with the configured window/batch size.
+
+Cara menjalankan (dari folder Backend_api-main):
+    python -m benchmarks.bench_embedding_batcher                 # FaceNet asli (FACE_EMBEDDING_ENGINE)
+    python -m benchmarks.bench_embedding_batcher --engine synthetic
+
+The synthetic engine replaces FaceNet with a fixed per-call overhead plus a
+per-crop cost. It only checks the batcher mechanics on machines without
+TensorFlow; use the FaceNet numbers for tuning.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.config import FACE_EMBEDDING_ENGINE, FACE_EMBEDDING_MODEL_PATH, FACE_EMBEDDING_THREADS
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_engines import create_embedding_engine
+from benchmarks.common import latency_summary, synthetic_engine
+
+
+def facenet_engine():
+    # Engine yang sama dengan API (keras, onnx atau tflite), sesuai FACE_EMBEDDING_* env
+    embedder = create_embedding_engine(FACE_EMBEDDING_ENGINE, FACE_EMBEDDING_MODEL_PATH, FACE_EMBEDDING_THREADS)
+    embedder.embeddings([np.zeros((160, 160, 3), dtype=np.uint8)])  # warm-up graph
+    return embedder.embeddings
+
+
+async def client(batcher: EmbeddingBatcher, crop: np.ndarray, deadline: float, latencies: list):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await batcher.embed(crop)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_scenario(embed_fn, executor, clients: int, max_batch_size: int, max_wait_ms: float, duration: float):
+    batcher = EmbeddingBatcher(embed_fn, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, executor=executor)
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 255, (160, 160, 3), dtype=np.uint8) for _ in range(clients)]
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(client(batcher, crops[i], deadline, latencies) for i in range(clients)))
+    # Request yang masih berjalan saat deadline ikut dihitung, jadi bagi dengan waktu sebenarnya
+    elapsed = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    summary["throughput_per_s"] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=["facenet", "synthetic"], default="facenet",
+                        help=f"facenet = engine FACE_EMBEDDING_ENGINE ({FACE_EMBEDDING_ENGINE})")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--window-ms", type=float, default=15)
+    parser.add_argument("--workers", type=int, default=1, help="Ukuran inference pool")
+    parser.add_argument("--duration", type=float, default=10.0, help="Detik per skenario")
+    parser.add_argument("--call-overhead-ms", type=float, default=40.0, help="Synthetic: biaya tetap per panggilan")
+    parser.add_argument("--per-crop-ms", type=float, default=8.0, help="Synthetic: biaya per crop")
+    args = parser.parse_args()
+
+    if args.engine == "facenet":
+        embed_fn = facenet_engine()
+    else:
+        embed_fn = synthetic_engine(args.call_overhead_ms, args.per_crop_ms)
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    print(f"{'clients':>7} {'mode':>10} {'emb/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for clients in args.clients:
+        for mode, batch_size, window in (("single", 1, 0), ("batched", args.max_batch_size, args.window_ms)):
+            summary = asyncio.run(run_scenario(embed_fn, executor, clients, batch_size, window, args.duration))
+            print(f"{clients:>7} {mode:>10} {summary['throughput_per_s']:>8} "
+                  f"{summary['p50_ms']:>8} {summary['p99_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
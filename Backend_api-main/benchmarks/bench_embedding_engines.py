@@ -0,0 +1,95 @@
+"""
+Latency and memory of the FaceNet embedding engines (keras / onnx / tflite).
+
+Each engine runs in its own fresh process so RSS reflects only that engine
+(TensorFlow, ONNX Runtime or the TFLite interpreter plus the model).
+Content of the crops does not affect latency, so random 160x160 crops are used.
+
+Cara menjalankan (dari folder Backend_api-main):
+    python -m benchmarks.bench_embedding_engines \\
+        --engine keras --engine onnx:models/facenet.onnx --engine onnx:models/facenet-int8.onnx \\
+        --engine tflite:models/facenet-fp16.tflite --output engines.json
+
+Gunakan bersama check_embedding_parity.py: pilih engine tercepat/terkecil
+yang masih lolos parity untuk deployment tersebut.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import latency_summary, rss_mb
+
+
+def run_child(spec: str, batch_sizes, iterations: int, threads: int):
+    engine, _, model_path = spec.partition(":")
+    from app.services.embedding_engines import create_embedding_engine
+
+    result = {"engine": engine, "model_path": model_path or None, "rss_before_mb": rss_mb()}
+    start = time.perf_counter()
+    embedder = create_embedding_engine(engine, model_path or None, threads)
+    result["load_s"] = round(time.perf_counter() - start, 2)
+    result["rss_after_load_mb"] = rss_mb()
+
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        crops = [rng.integers(0, 255, (160, 160, 3), dtype=np.uint8) for _ in range(batch_size)]
+        embedder.embeddings(crops)  # warm-up (alokasi tensor / graph)
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            embedder.embeddings(crops)
+            latencies.append(time.perf_counter() - start)
+        summary = latency_summary(latencies)
+        summary["faces_per_s"] = round(batch_size * len(latencies) / sum(latencies), 1)
+        result[f"batch_{batch_size}"] = summary
+    result["rss_peak_mb"] = rss_mb()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", action="append", dest="engines",
+                        help="keras, onnx:<path> atau tflite:<path> (boleh diulang)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=0, help="Thread runtime ONNX/TFLite (0 = default)")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.batch_sizes, args.iterations, args.threads)
+        return
+
+    results = []
+    header = f"{'engine':>40} {'load s':>7} {'rss MB':>8}"
+    header += "".join(f" {'p50 b=' + str(b):>10} {'face/s':>7}" for b in args.batch_sizes)
+    print(header)
+    for spec in args.engines or ["keras"]:
+        command = [sys.executable, "-m", "benchmarks.bench_embedding_engines", "--child", spec,
+                   "--iterations", str(args.iterations), "--threads", str(args.threads),
+                   "--batch-sizes", *map(str, args.batch_sizes)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            error = (completed.stderr.strip().splitlines() or ["unknown error"])[-1]
+            print(f"{spec:>40}  gagal: {error}")
+            results.append({"engine": spec, "error": error})
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        line = f"{spec:>40} {result['load_s']:>7} {str(result['rss_peak_mb']):>8}"
+        for b in args.batch_sizes:
+            line += f" {result[f'batch_{b}']['p50_ms']:>10} {result[f'batch_{b}']['faces_per_s']:>7}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
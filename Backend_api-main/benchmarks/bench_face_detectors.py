@@ -0,0 +1,103 @@
+"""
+Detection latency and miss rate of each face detector backend.
+
+Every image in the folder is assumed to contain at least one face; an image
+on which a backend finds no face counts as a miss. Latency is measured per
+image after one warm-up call, on a single thread.
+
+Cara menjalankan (dari folder Backend_api-main):
+    python -m benchmarks.bench_face_detectors --images ../face-recognition-test/test_images
+    python -m benchmarks.bench_face_detectors --images foto/ --backends mediapipe haar --max-side 640
+
+Backend yang gagal di-load (library tidak terinstall, file model DNN tidak ada)
+dilewati dan alasannya ditampilkan.
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+
+from app.services.face_detectors import DETECTOR_BACKENDS, create_face_detector
+from benchmarks.common import latency_summary
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def load_images(directory: str, max_side: int):
+    images = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        img = cv2.imread(os.path.join(directory, file_name), cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        scale = max_side / max(img.shape[:2]) if max_side else 1.0
+        if scale < 1.0:
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        images.append((file_name, img))
+    return images
+
+
+def bench_backend(backend: str, images, min_face_size: int):
+    start = time.perf_counter()
+    detector = create_face_detector(backend, min_face_size=min_face_size)
+    load_s = time.perf_counter() - start
+    detector.detect_faces(images[0][1])  # warm-up
+
+    latencies = []
+    missed = []
+    multiple = 0
+    for file_name, img in images:
+        start = time.perf_counter()
+        faces = detector.detect_faces(img)
+        latencies.append(time.perf_counter() - start)
+        if not faces:
+            missed.append(file_name)
+        elif len(faces) > 1:
+            multiple += 1
+
+    summary = latency_summary(latencies)
+    summary.update(
+        load_s=round(load_s, 2),
+        miss_rate=round(len(missed) / len(images), 3),
+        multiple_faces=multiple,
+        missed=missed,
+    )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder foto yang masing-masing berisi wajah")
+    parser.add_argument("--backends", nargs="+", choices=list(DETECTOR_BACKENDS), default=list(DETECTOR_BACKENDS))
+    parser.add_argument("--min-face-size", type=int, default=20)
+    parser.add_argument("--max-side", type=int, default=0, help="Perkecil gambar ke sisi terpanjang ini (0 = ukuran asli)")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.max_side)
+    if not images:
+        parser.error(f"Tidak ada gambar di {args.images}")
+
+    results = {}
+    print(f"{len(images)} gambar dari {args.images}\n")
+    print(f"{'backend':>10} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'miss':>6} {'multi':>6}")
+    for backend in args.backends:
+        try:
+            results[backend] = bench_backend(backend, images, args.min_face_size)
+        except Exception as e:
+            results[backend] = {"error": str(e)}
+            print(f"{backend:>10}  dilewati: {e}")
+            continue
+        r = results[backend]
+        print(f"{backend:>10} {r['load_s']:>7} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['miss_rate']:>6} {r['multiple_faces']:>6}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Measure /auth/login latency while /face/recognize is under concurrent load.
+
+Start the API first (uvicorn main:app), then run from Backend_api-main:
+    python -m benchmarks.bench_login_under_face_load \\
+        --image test_face.jpg --username admin --password admin123
+
+To compare before/after, run the same command against a server started
+from the older commit and one started from the current tree. When
+inference runs on the event loop, login p99 grows with the number of face
+clients. With the inference pool it should stay close to the idle baseline.
+
+Requires httpx (pip install httpx).
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import latency_summary
+
+
+async def face_load(client: httpx.AsyncClient, image: bytes, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.post("/face/recognize", files={"file": ("face.jpg", image, "image/jpeg")})
+        latencies.append(time.perf_counter() - start)
+
+
+async def measure_logins(client: httpx.AsyncClient, username: str, password: str, count: int, interval: float):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await client.post("/auth/login", json={"username": username, "password": password})
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run(args):
+    with open(args.image, "rb") as f:
+        image = f.read()
+
+    results = {}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120) as client:
+        for face_clients in args.face_clients:
+            stop = asyncio.Event()
+            face_latencies = []
+            workers = [asyncio.create_task(face_load(client, image, stop, face_latencies)) for _ in range(face_clients)]
+            # Beri waktu load face recognition untuk mencapai steady state
+            await asyncio.sleep(args.warmup if face_clients else 0)
+
+            login_latencies = await measure_logins(client, args.username, args.password, args.logins, args.interval)
+            stop.set()
+            await asyncio.gather(*workers)
+
+            results[face_clients] = {
+                "login": latency_summary(login_latencies),
+                "face_recognize": latency_summary(face_latencies),
+            }
+            print(f"face_clients={face_clients:>3}  login p50={results[face_clients]['login']['p50_ms']} ms"
+                  f"  p99={results[face_clients]['login']['p99_ms']} ms"
+                  f"  | recognize p50={results[face_clients]['face_recognize']['p50_ms']} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"base_url": args.base_url, "results": results}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--image", required=True, help="Foto wajah untuk /face/recognize")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--face-clients", type=int, nargs="+", default=[0, 4, 16])
+    parser.add_argument("--logins", type=int, default=100, help="Jumlah request login per skenario")
+    parser.add_argument("--interval", type=float, default=0.05, help="Jeda antar login (detik)")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Per-stage latency of the face check-in pipeline, as machine-readable JSON.
+
+Every simulated check-in goes through the same steps as /face/check-in and
+/face/recognize, each timed separately:
+  decode       probe_image_size + (reduced) JPEG decode
+  detect       detector.detect_faces on the decoded frame
+  crop_resize  full decode for the crop (large uploads only), box mapping,
+               crop and FaceNet preprocessing (resize to 160, standardize)
+  liveness     passive_liveness.check (only with --liveness)
+  embed        FaceNet engine of face_recognition_route (or --engine synthetic)
+  match        FaceEmbeddingIndex.search over a synthetic gallery, restricted
+               to a 40-student roster like the class-scoped endpoints
+  db_update    the conditional UPDATE of /face/check-in on an in-memory SQLite
+               presensi table (statement overhead only, not MySQL round trips)
+
+Input photos are the --images files plus synthetic re-encodes of each at
+--megapixels sizes (phone cameras). The pipeline runs for every gallery size
+and concurrency level; p50/p95/p99 per stage go to --output, and --baseline
+prints the p95 change per stage against an earlier JSON file (e.g. from the
+previous commit).
+
+With --prototype-liveness the liveness check of face-recognition-test
+(face_recognize.check_liveness, full-size fft2) is timed next to the backend
+one; that import loads keras_facenet.
+
+Cara menjalankan (dari folder Backend_api-main):
+    python -m benchmarks.bench_pipeline_stages --images foto/ --output stages.json
+    FACE_DETECTOR_BACKEND=mediapipe python -m benchmarks.bench_pipeline_stages --images foto/ \\
+        --engine synthetic --gallery-sizes 1000 50000 --concurrency 1 4 --baseline stages.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.config import FACE_DETECT_MAX_SIDE, FACE_DETECTOR_BACKEND, FACE_EMBEDDING_ENGINE
+from app.services.embedding_engines import preprocess_faces
+from app.services.face_index_service import FaceEmbeddingIndex, l2_normalize
+from app.services.image_preprocessing import decode_image, probe_image_size, reduction_factor, scale_box
+from app.services.liveness_service import passive_liveness
+from benchmarks.common import latency_summary, rss_mb, synthetic_engine
+from benchmarks.bench_detection_resolution import encode_at_megapixels
+
+STAGES = ("decode", "detect", "crop_resize", "liveness", "prototype_liveness", "embed", "match", "db_update")
+ROSTER_SIZE = 40
+DIM = 512
+
+CHECKIN_UPDATE = text("""
+    UPDATE presensi
+    SET status = 'Hadir', waktu_input = :now
+    WHERE id_presensi = :id_presensi
+    AND status <> 'Hadir'
+    AND tanggal = :today
+    AND (waktu_mulai IS NULL OR waktu_mulai <= :now_time)
+    AND (waktu_selesai IS NULL OR waktu_selesai >= :now_time)
+""")
+
+
+def load_images(directory: str, megapixels):
+    """(name, jpeg bytes) for every photo in `directory` and its re-encodes at `megapixels`."""
+    images = []
+    for file_name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, file_name)
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        with open(path, "rb") as f:
+            images.append((file_name, f.read()))
+        for mp in megapixels:
+            images.append((f"{file_name}@{mp}MP", encode_at_megapixels(img, mp)))
+    return images
+
+
+def load_prototype_liveness():
+    """check_liveness from face-recognition-test/face_recognize.py, or (None, reason)."""
+    prototype_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "face-recognition-test")
+    sys.path.append(os.path.abspath(prototype_dir))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import face_recognize
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+    def check(face_bgr):
+        # Prototype mencetak debug di setiap panggilan dan mengharapkan RGB
+        with contextlib.redirect_stdout(io.StringIO()):
+            return face_recognize.check_liveness(cv2.cvtColor(face_bgr, cv2.COLOR_BGR2RGB))
+    return check, None
+
+
+def synthetic_index(size: int, rng: np.random.Generator):
+    index = FaceEmbeddingIndex()
+    matrix = l2_normalize(rng.standard_normal((size, DIM)).astype(np.float32))
+    index.load_matrix(matrix, np.array([f"nim{i:06d}" for i in range(size)]))
+    roster = [f"nim{i:06d}" for i in rng.choice(size, min(ROSTER_SIZE, size), replace=False)]
+    return index, roster
+
+
+def presensi_db(rows: int):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE presensi (id_presensi INTEGER PRIMARY KEY, tanggal TEXT, waktu_mulai TEXT, "
+            "waktu_selesai TEXT, status TEXT, waktu_input TEXT)"
+        ))
+        today = datetime.now().date().isoformat()
+        conn.execute(
+            text("INSERT INTO presensi VALUES (:id, :today, '00:00:00', '23:59:59', 'Belum Absen', NULL)"),
+            [{"id": i, "today": today} for i in range(rows)]
+        )
+    return engine
+
+
+class Pipeline:
+    def __init__(self, detector, embed_fn, max_side: int, liveness: bool, prototype_liveness):
+        self.detector = detector
+        self.embed_fn = embed_fn
+        self.max_side = max_side
+        self.liveness = liveness
+        self.prototype_liveness = prototype_liveness
+        self.index = None
+        self.roster = None
+        self.db = None
+        self._db_lock = threading.Lock()
+        self._next_presensi = 0
+
+    def run(self, image_bytes: bytes) -> dict:
+        """Time one check-in; returns {stage: seconds} (stages after a miss are absent)."""
+        timings = {}
+        start = time.perf_counter()
+        factor = reduction_factor(probe_image_size(image_bytes), self.max_side)
+        frame = decode_image(image_bytes, factor)
+        timings["decode"] = time.perf_counter() - start
+        if frame is None:
+            return timings
+
+        start = time.perf_counter()
+        faces = self.detector.detect_faces(frame)
+        timings["detect"] = time.perf_counter() - start
+        if not faces:
+            return timings
+
+        start = time.perf_counter()
+        image, box = frame, faces[0]["box"]
+        if factor > 1:
+            image = decode_image(image_bytes)
+            box = scale_box(box, frame.shape, image.shape)
+        x, y, w, h = box
+        crop = image[y:y + h, x:x + w]
+        preprocess_faces([crop])
+        timings["crop_resize"] = time.perf_counter() - start
+
+        if self.liveness:
+            start = time.perf_counter()
+            passive_liveness.check(crop)
+            timings["liveness"] = time.perf_counter() - start
+        if self.prototype_liveness is not None:
+            start = time.perf_counter()
+            self.prototype_liveness(crop)
+            timings["prototype_liveness"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        embedding = self.embed_fn([crop])[0]
+        timings["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.index.search(embedding, k=5, threshold=0.4, candidates=self.roster)
+        timings["match"] = time.perf_counter() - start
+
+        with self._db_lock:
+            id_presensi = self._next_presensi
+            self._next_presensi += 1
+        now = datetime.now()
+        start = time.perf_counter()
+        with self.db.begin() as conn:
+            conn.execute(CHECKIN_UPDATE, {
+                "now": now.isoformat(" "), "today": now.date().isoformat(),
+                "now_time": now.strftime("%H:%M:%S"), "id_presensi": id_presensi
+            })
+        timings["db_update"] = time.perf_counter() - start
+        return timings
+
+
+def run_scenario(pipeline: Pipeline, images, concurrency: int, requests: int):
+    samples = {stage: [] for stage in STAGES}
+    totals = []
+    jobs = [images[i % len(images)][1] for i in range(requests)]
+
+    def one(image_bytes):
+        start = time.perf_counter()
+        timings = pipeline.run(image_bytes)
+        return timings, time.perf_counter() - start
+
+    pipeline.db = presensi_db(requests)
+    pipeline._next_presensi = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for timings, total in pool.map(one, jobs):
+            totals.append(total)
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+    elapsed = time.perf_counter() - start
+
+    stages = {stage: latency_summary(values) for stage, values in samples.items() if values}
+    return {
+        "stages": stages,
+        "total": latency_summary(totals),
+        "throughput_per_s": round(len(totals) / elapsed, 2),
+        "faces_found": len(samples["embed"]),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path: str):
+    """Print the p95 change per stage against a previous run of this script."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["gallery_size"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit')}), p95 ms:")
+    for result in results:
+        old = previous.get((result["gallery_size"], result["concurrency"]))
+        if old is None:
+            continue
+        print(f"  gallery={result['gallery_size']} concurrency={result['concurrency']}")
+        for stage in (*STAGES, "total"):
+            new_summary = result["total"] if stage == "total" else result["stages"].get(stage)
+            old_summary = old["total"] if stage == "total" else old["stages"].get(stage)
+            if not new_summary or not old_summary or not old_summary["p95_ms"]:
+                continue
+            change = (new_summary["p95_ms"] - old_summary["p95_ms"]) / old_summary["p95_ms"] * 100
+            print(f"    {stage:>18} {old_summary['p95_ms']:>10} -> {new_summary['p95_ms']:>10}  {change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder foto wajah (satu wajah per foto)")
+    parser.add_argument("--megapixels", type=float, nargs="*", default=[1, 8],
+                        help="Ukuran re-encode sintetis tiap foto (kosongkan untuk foto asli saja)")
+    parser.add_argument("--engine", choices=["route", "synthetic"], default="route",
+                        help=f"route = FaceNet dari face_recognition_route ({FACE_EMBEDDING_ENGINE})")
+    parser.add_argument("--synthetic-ms", type=float, nargs=2, default=[40, 8], metavar=("CALL", "PER_CROP"))
+    parser.add_argument("--gallery-sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--requests", type=int, default=50, help="Jumlah check-in per skenario")
+    parser.add_argument("--max-side", type=int, default=FACE_DETECT_MAX_SIDE)
+    parser.add_argument("--liveness", action="store_true", help="Ikut ukur passive liveness backend")
+    parser.add_argument("--prototype-liveness", action="store_true",
+                        help="Ikut ukur check_liveness dari face-recognition-test (butuh keras_facenet)")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    parser.add_argument("--baseline", help="JSON hasil run sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.megapixels)
+    if not images:
+        parser.error(f"Tidak ada gambar di {args.images}")
+
+    # Model diambil dari route supaya yang diukur sama dengan konfigurasi API (FACE_* env)
+    from app.routes import face_recognition_route as route
+    detector = route.detector_model.get()
+    if args.engine == "synthetic":
+        embed_fn = synthetic_engine(*args.synthetic_ms, dim=DIM)
+    else:
+        embed_fn = route.embed_faces
+        embed_fn([np.zeros((160, 160, 3), dtype=np.uint8)])  # warm-up
+
+    prototype = None
+    if args.prototype_liveness:
+        prototype, reason = load_prototype_liveness()
+        if prototype is None:
+            print(f"⚠️  prototype_liveness dilewati: {reason}")
+
+    pipeline = Pipeline(detector, embed_fn, args.max_side, args.liveness, prototype)
+    for _, image_bytes in images[:3]:
+        detector.detect_faces(decode_image(image_bytes))  # warm-up
+
+    rng = np.random.default_rng(0)
+    results = []
+    print(f"detector={FACE_DETECTOR_BACKEND} engine={args.engine} images={len(images)} requests={args.requests}")
+    for size in args.gallery_sizes:
+        pipeline.index, pipeline.roster = synthetic_index(size, rng)
+        for concurrency in args.concurrency:
+            result = {"gallery_size": size, "concurrency": concurrency,
+                      **run_scenario(pipeline, images, concurrency, args.requests)}
+            results.append(result)
+            stages = "  ".join(f"{stage}={summary['p95_ms']}" for stage, summary in result["stages"].items())
+            print(f"gallery={size:>6} c={concurrency:>2}  {result['throughput_per_s']:>7}/s  "
+                  f"total p95={result['total']['p95_ms']} ms  [p95 ms] {stages}")
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "detector": FACE_DETECTOR_BACKEND,
+            "engine": FACE_EMBEDDING_ENGINE if args.engine == "route" else "synthetic",
+            "max_side": args.max_side,
+            "liveness": args.liveness,
+            "images": [name for name, _ in images],
+            "requests": args.requests,
+            "rss_mb": rss_mb(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Hasil disimpan di {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
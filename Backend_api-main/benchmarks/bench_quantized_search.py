@@ -0,0 +1,78 @@
+"""
+Benchmark the int8 quantized face gallery against the float32 gallery.
+
+For every gallery size, reports gallery memory, per-query latency and the
+top-1 agreement with the exact float32 scan. The int8 index re-ranks its
+`--rerank` best candidates with the exact float vectors; `--rerank 0`
+shows the approximate int8 distances alone (no vector source).
+
+The vector source here is an in-memory dict. In the API it is one
+`SELECT ... WHERE nim IN (...)` on face_registrations per request (all faces
+of a frame are re-ranked together, see `search_batch`), so add one database
+round trip to the int8 latency.
+
+Cara menjalankan (dari folder Backend_api-main):
+    python -m benchmarks.bench_quantized_search
+    python -m benchmarks.bench_quantized_search --sizes 10000 50000 --rerank 0 8 32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.face_index_service import FaceEmbeddingIndex
+from benchmarks.bench_face_search import synthetic_gallery, synthetic_probes
+from benchmarks.common import percentile_ms
+
+
+def run_queries(index: FaceEmbeddingIndex, probes: np.ndarray):
+    latencies = []
+    top1 = []
+    for probe in probes:
+        start = time.perf_counter()
+        result = index.search(probe, k=1)
+        latencies.append(time.perf_counter() - start)
+        top1.append(result[0] if result else (None, None))
+    return top1, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 8, 32],
+                        help="Kandidat re-ranking int8 (0 = tanpa re-ranking)")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'size':>7} {'mode':>12} {'MB':>7} {'top1 agree':>10} {'max |d-d0|':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in args.sizes:
+        gallery = synthetic_gallery(size, rng)
+        usernames = [f"S{i:06d}" for i in range(size)]
+        probes = synthetic_probes(gallery, args.queries, rng)
+
+        index = FaceEmbeddingIndex()
+        index.load_matrix(gallery, usernames)
+        exact_top1, exact_lat = run_queries(index, probes)
+        print(f"{size:>7} {'float32':>12} {index.nbytes / 2**20:>7.2f} {1.0:>10.3f} {0.0:>10.1e} "
+              f"{percentile_ms(exact_lat, 50):>8} {percentile_ms(exact_lat, 95):>8}")
+
+        vectors = dict(zip(usernames, gallery))
+        quantized = FaceEmbeddingIndex(quantization="int8")
+        quantized.load_matrix(gallery, usernames)
+        for rerank in args.rerank:
+            quantized.rerank_candidates = rerank
+            quantized.attach_vector_source(
+                (lambda names: {name: vectors[name] for name in names}) if rerank else None
+            )
+            top1, lat = run_queries(quantized, probes)
+            agree = np.mean([a[0] == b[0] for a, b in zip(top1, exact_top1)])
+            error = max(abs(a[1] - b[1]) for a, b in zip(top1, exact_top1) if a[0] == b[0])
+            mode = f"int8/rr={rerank}" if rerank else "int8"
+            print(f"{size:>7} {mode:>12} {quantized.nbytes / 2**20:>7.2f} {agree:>10.3f} {error:>10.1e} "
+                  f"{percentile_ms(lat, 50):>8} {percentile_ms(lat, 95):>8}")
+
+
+if __name__ == "__main__":
+    main()
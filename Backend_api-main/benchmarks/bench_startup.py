@@ -0,0 +1,94 @@
+"""
+Import time and memory of `main:app` with and without the ML routers.
+
+Each configuration runs in a fresh Python process (so nothing is cached
+between runs) that imports `main`, then optionally builds every registered
+model the way the background warm-up does.
+
+Cara menjalankan (dari folder Backend_api-main):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --warm-up --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Dijalankan di proses baru; mencetak satu baris JSON
+CHILD = r"""
+import json, sys, time
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return None
+
+result = {"rss_before_mb": rss_mb()}
+start = time.perf_counter()
+import main
+result["import_s"] = time.perf_counter() - start
+result["rss_after_import_mb"] = rss_mb()
+
+if "--warm-up" in sys.argv:
+    from app.services.model_registry import model_registry
+    start = time.perf_counter()
+    model_registry.warm_up()
+    result["warm_up_s"] = time.perf_counter() - start
+    result["rss_after_warm_up_mb"] = rss_mb()
+    result["models"] = model_registry.status()
+print(json.dumps(result))
+"""
+
+
+def run_child(ml_routers: bool, warm_up: bool):
+    env = dict(os.environ, ENABLE_ML_ROUTERS="1" if ml_routers else "0", ML_WARMUP_ON_STARTUP="0")
+    args = [sys.executable, "-c", CHILD] + (["--warm-up"] if warm_up else [])
+    completed = subprocess.run(args, env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def median(runs, key):
+    values = [run[key] for run in runs if run.get(key) is not None]
+    return round(statistics.median(values), 2) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Jumlah proses per konfigurasi")
+    parser.add_argument("--warm-up", action="store_true", help="Ukur juga waktu dan memori setelah semua model di-load")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'ml_routers':>10} {'import s':>9} {'rss MB':>8} {'warm-up s':>10} {'rss warm MB':>12}")
+    for ml_routers in (False, True):
+        runs = [run_child(ml_routers, args.warm_up) for _ in range(args.repeat)]
+        summary = {
+            "import_s": median(runs, "import_s"),
+            "rss_after_import_mb": median(runs, "rss_after_import_mb"),
+            "warm_up_s": median(runs, "warm_up_s"),
+            "rss_after_warm_up_mb": median(runs, "rss_after_warm_up_mb"),
+            "models": runs[-1].get("models"),
+        }
+        results["ml" if ml_routers else "crud_only"] = summary
+        print(f"{str(ml_routers):>10} {summary['import_s']:>9} {summary['rss_after_import_mb']:>8} "
+              f"{str(summary['warm_up_s']):>10} {str(summary['rss_after_warm_up_mb']):>12}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
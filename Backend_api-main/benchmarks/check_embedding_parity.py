@@ -0,0 +1,97 @@
+"""
+Parity check: embeddings of an exported FaceNet engine vs the Keras model.
+
+Faces are detected in every photo of --images with the configured detector
+(or used as-is with --crops), embedded by both keras_facenet and the engine
+under test, and compared by cosine distance. The check also embeds the same
+faces one by one to make sure the result does not depend on the batch size.
+
+Exit code 1 when any face differs by more than --tolerance, so this can run
+as a gate after export_facenet.py.
+
+Cara menjalankan (dari folder Backend_api-main, butuh TensorFlow untuk model referensi):
+    python -m benchmarks.check_embedding_parity --engine onnx --model-path models/facenet.onnx --images foto/
+    python -m benchmarks.check_embedding_parity --engine tflite --model-path models/facenet-int8.tflite \\
+        --images crop/ --crops --tolerance 0.03
+
+Toleransi yang wajar (cosine distance): float32 ~1e-4, float16 ~5e-3, int8 ~3e-2.
+Bandingkan dengan THRESHOLD recognition (0.4): selisih engine harus jauh di bawahnya.
+"""
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from app.config import FACE_DETECTOR_BACKEND
+from app.services.embedding_engines import EMBEDDING_ENGINES, KerasFaceNetEngine, create_embedding_engine
+from app.services.face_detectors import create_face_detector
+from app.services.face_index_service import l2_normalize
+
+
+def load_face_crops(directory: str, already_cropped: bool, detector_backend: str):
+    detector = None if already_cropped else create_face_detector(detector_backend)
+    crops = []
+    for file_name in sorted(os.listdir(directory)):
+        img = cv2.imread(os.path.join(directory, file_name), cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        if detector is None:
+            crops.append(img)
+            continue
+        faces = detector.detect_faces(img)
+        if faces:
+            x, y, w, h = faces[0]["box"]
+            crops.append(img[y:y+h, x:x+w])
+    return crops
+
+
+def cosine_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return 1.0 - np.sum(l2_normalize(a) * l2_normalize(b), axis=1)
+
+
+def describe(label: str, distances: np.ndarray):
+    print(f"{label:>22}: max={distances.max():.6f}  mean={distances.mean():.6f}  "
+          f"p99={np.percentile(distances, 99):.6f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=[e for e in EMBEDDING_ENGINES if e != "keras"], required=True)
+    parser.add_argument("--model-path", required=True)
+    parser.add_argument("--images", required=True, help="Folder foto wajah (atau crop wajah dengan --crops)")
+    parser.add_argument("--crops", action="store_true", help="Gambar di --images sudah berupa crop wajah")
+    parser.add_argument("--detector", default=FACE_DETECTOR_BACKEND)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--tolerance", type=float, default=0.03, help="Maksimal cosine distance keras vs engine")
+    args = parser.parse_args()
+
+    crops = load_face_crops(args.images, args.crops, args.detector)
+    if not crops:
+        parser.error(f"Tidak ada wajah di {args.images}")
+    print(f"{len(crops)} wajah dari {args.images}")
+
+    reference = KerasFaceNetEngine()
+    engine = create_embedding_engine(args.engine, args.model_path)
+
+    batches = [crops[i:i + args.batch_size] for i in range(0, len(crops), args.batch_size)]
+    expected = np.concatenate([reference.embeddings(batch) for batch in batches])
+    batched = np.concatenate([engine.embeddings(batch) for batch in batches])
+    single = np.concatenate([engine.embeddings([crop]) for crop in crops])
+
+    vs_keras = cosine_distances(expected, batched)
+    vs_batch = cosine_distances(batched, single)
+    describe(f"{args.engine} vs keras", vs_keras)
+    describe("batch vs single", vs_batch)
+
+    worst = max(vs_keras.max(), vs_batch.max())
+    if worst > args.tolerance:
+        print(f"❌ Parity gagal: {worst:.6f} > toleransi {args.tolerance}")
+        return 1
+    print(f"✅ Parity OK (toleransi {args.tolerance})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
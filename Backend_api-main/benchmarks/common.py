@@ -0,0 +1,48 @@
+"""Helper bersama untuk script benchmark."""
+import time
+
+import numpy as np
+
+
+def percentile_ms(samples, q):
+    """Percentile `q` of `samples` (in seconds), in milliseconds."""
+    if len(samples) == 0:
+        return None
+    return round(float(np.percentile(samples, q)) * 1000.0, 3)
+
+
+def latency_summary(samples):
+    """p50/p95/p99 (ms) and count for a list of latencies in seconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile_ms(samples, 50),
+        "p95_ms": percentile_ms(samples, 95),
+        "p99_ms": percentile_ms(samples, 99),
+    }
+
+
+def synthetic_engine(call_overhead_ms: float, per_crop_ms: float, dim: int = 512):
+    """
+    Stand-in for FaceNet on machines without the real engine: a fixed
+    per-call overhead plus a per-crop cost, returning random `dim`-d embeddings.
+    """
+    def embeddings(crops):
+        time.sleep((call_overhead_ms + per_crop_ms * len(crops)) / 1000.0)
+        return np.random.default_rng().standard_normal((len(crops), dim)).astype(np.float32)
+    return embeddings
+
+
+def rss_mb():
+    """Resident memory of this process in MB (Linux /proc, else psutil), or None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    except ImportError:
+        return None
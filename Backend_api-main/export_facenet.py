@@ -0,0 +1,105 @@
+"""
+Export the keras_facenet FaceNet model to ONNX or TFLite, optionally quantized,
+for FACE_EMBEDDING_ENGINE=onnx / tflite.
+
+Export cukup dilakukan sekali di mesin yang punya TensorFlow; worker API yang
+memakai file hasil export tidak butuh TensorFlow (onnxruntime / tflite-runtime saja).
+
+Cara menjalankan (dari folder Backend_api-main):
+    python export_facenet.py --format onnx --output models/facenet.onnx
+    python export_facenet.py --format onnx --quantize int8 --output models/facenet-int8.onnx
+    python export_facenet.py --format tflite --quantize float16 --output models/facenet-fp16.tflite
+    python export_facenet.py --format tflite --quantize int8 --calibration-dir crop_wajah/ --output models/facenet-int8.tflite
+
+Setelah export, jalankan benchmarks/check_embedding_parity.py untuk memastikan
+embedding masih sama dengan model Keras sebelum dipakai di production.
+
+Butuh: tensorflow, keras-facenet, dan untuk ONNX: tf2onnx, onnx, onnxruntime
+(+ onnxconverter-common untuk float16).
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import cv2
+
+from app.services.embedding_engines import FACENET_IMAGE_SIZE, preprocess_faces
+
+
+def load_keras_model():
+    from keras_facenet import FaceNet
+    return FaceNet().model
+
+
+def calibration_batches(directory: str, limit: int = 200):
+    """Representative inputs (face crops) for full-integer TFLite quantization."""
+    files = sorted(f for f in os.listdir(directory) if f.lower().endswith((".jpg", ".jpeg", ".png")))[:limit]
+    for file_name in files:
+        img = cv2.imread(os.path.join(directory, file_name), cv2.IMREAD_COLOR)
+        if img is not None:
+            yield [preprocess_faces([img])]
+
+
+def export_onnx(model, output: str, quantize: str):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, FACENET_IMAGE_SIZE, FACENET_IMAGE_SIZE, 3), tf.float32, name="input"),)
+    if quantize == "none":
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=output)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp32_path = os.path.join(tmp, "facenet.onnx")
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=fp32_path)
+        if quantize == "int8":
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(fp32_path, output, weight_type=QuantType.QInt8)
+        else:
+            import onnx
+            from onnxconverter_common import float16
+            fp16_model = float16.convert_float_to_float16(onnx.load(fp32_path), keep_io_types=True)
+            onnx.save(fp16_model, output)
+
+
+def export_tflite(model, output: str, quantize: str, calibration_dir: str = None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        # Tanpa data kalibrasi: dynamic-range (bobot int8, aktivasi float)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if calibration_dir:
+            converter.representative_dataset = lambda: calibration_batches(calibration_dir)
+    with open(output, "wb") as f:
+        f.write(converter.convert())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=["onnx", "tflite"], required=True)
+    parser.add_argument("--quantize", choices=["none", "float16", "int8"], default="none")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--calibration-dir", help="TFLite int8: folder crop wajah untuk kalibrasi aktivasi")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    model = load_keras_model()
+    if args.format == "onnx":
+        export_onnx(model, args.output, args.quantize)
+    else:
+        export_tflite(model, args.output, args.quantize, args.calibration_dir)
+
+    size_mb = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"✅ FaceNet diexport ke {args.output} ({args.format}, {args.quantize}, {size_mb:.1f} MB)")
+    print("   Cek parity: python -m benchmarks.check_embedding_parity "
+          f"--engine {args.format} --model-path {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -63,9 +63,12 @@
 
 # app.include_router(auth_route.router)
 
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
+from app.config import ENABLE_ML_ROUTERS, ML_WARMUP_ON_STARTUP
+from app.services.model_registry import model_registry
 from app.routes import (
     auth_route, 
     mata_kuliah_route, 
@@ -78,8 +81,6 @@ from app.routes import (
     dashboard_route,
     kelas_mata_kuliah_route,
     face_registration_db_route,
-    face_recognition_route,
-    gaze_detection_route,
     informasi_route,
     jadwal_kuliah_route,
     informasi_route,
@@ -91,7 +92,20 @@ from app.routes import (
 # Import models (no relationships needed)
 from app.models import mata_kuliah_model, kelas_model, mahasiswa_model, dosen_model, presensi_model, kelas_mata_kuliah_model, face_registration_model, informasi_model, jadwal_kuliah_model, skor_materi_model, user_device_model
 
-app = FastAPI(title="E-Learning API", version="1.0.0")
+# Router yang butuh model ML (FaceNet/MTCNN/MediaPipe) bisa dimatikan untuk proses khusus CRUD
+if ENABLE_ML_ROUTERS:
+    from app.routes import face_recognition_route, gaze_detection_route
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model di-load di background thread, API langsung bisa menerima request
+    if ENABLE_ML_ROUTERS and ML_WARMUP_ON_STARTUP:
+        model_registry.start_warm_up()
+    yield
+
+
+app = FastAPI(title="E-Learning API", version="1.0.0", lifespan=lifespan)
 
 # 🚀 Tambahkan middleware CORS
 app.add_middleware(
@@ -121,13 +135,29 @@ app.include_router(presensi_route.router)
 app.include_router(mahasiswa_route.router)
 app.include_router(dashboard_route.router)
 app.include_router(face_registration_db_route.router)
-app.include_router(face_recognition_route.router)
-app.include_router(gaze_detection_route.router)
+if ENABLE_ML_ROUTERS:
+    app.include_router(face_recognition_route.router)
+    app.include_router(gaze_detection_route.router)
 app.include_router(informasi_route.router)
 app.include_router(jadwal_kuliah_route.router)
 app.include_router(skor_materi_route.router)
 app.include_router(notification_route.router)
 
+@app.get("/ready")
+def readiness():
+    """
+    Status warm-up model ML per model (cold / loading / ready / failed).
+    Endpoint non-ML sudah bisa dipakai walaupun status masih "warming_up".
+    Dengan ML_WARMUP_ON_STARTUP=0 status "lazy": model di-load saat request
+    pertama, jadi dianggap siap (ready = true) untuk readiness probe.
+    """
+    return {
+        "status": model_registry.state(),
+        "ready": model_registry.is_ready(),
+        "ml_routers": ENABLE_ML_ROUTERS,
+        "models": model_registry.status()
+    }
+
 # Mount static files untuk uploads
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -151,6 +181,7 @@ def read_root():
             "face_registration": "/face-registration",
             "face_recognition": "/face",
             "gaze_detection": "/gaze",
+            "ready": "/ready",
             "informasi": "/api/informasi",
             "skor_materi": "/skor-materi"
         }
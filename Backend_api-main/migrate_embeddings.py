@@ -0,0 +1,102 @@
+"""
+Convert the legacy embeddings/<NIM>.pkl files into the single-file gallery
+(gallery-<n>.npy + gallery.json), or move embeddings from disk into the
+`face_registrations.embedding` column used by the face recognition API.
+
+Cara menjalankan (dari folder Backend_api-main, server dalam keadaan mati):
+    python migrate_embeddings.py
+    python migrate_embeddings.py --dtype float16 --remove-pkl
+    python migrate_embeddings.py --to-db    # setelah migrations/add_face_registration_embedding_column.sql
+"""
+import argparse
+import os
+import sys
+
+from app.config import FACE_STORE_DTYPE
+from app.services.embedding_store import EmbeddingStore, STORE_DTYPES, load_pickle_directory
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embeddings")
+
+
+def migrate(directory: str, dtype: str, remove_pkl: bool):
+    items = load_pickle_directory(directory)
+    if not items:
+        print(f"⚠️ Tidak ada file .pkl di {directory}")
+        return False
+
+    store = EmbeddingStore(directory, dtype=dtype)
+    store.put_many(items)
+    print(f"✅ {len(items)} embedding dipindahkan ke {store.manifest_path} ({dtype})")
+
+    # Cek ulang: semua NIM harus ada di gallery sebelum .pkl dihapus
+    stored = set(store.ids())
+    missing = [id_ for id_, _ in items if id_ not in stored]
+    if missing:
+        print(f"❌ {len(missing)} embedding tidak tersimpan: {missing}")
+        return False
+
+    if remove_pkl:
+        for id_, _ in items:
+            os.remove(os.path.join(directory, f"{id_}.pkl"))
+        print(f"🗑️ {len(items)} file .pkl dihapus")
+    return True
+
+
+def migrate_to_db(directory: str):
+    """Salin embedding dari gallery .npy (atau .pkl jika gallery belum ada) ke face_registrations."""
+    from app.core.database import SessionLocal
+    from app.models.face_registration_model import FaceRegistration
+    from app.models.mahasiswa_model import Mahasiswa
+    from app.services.face_gallery_service import encode_embedding
+
+    store = EmbeddingStore(directory)
+    if store.exists():
+        matrix, rows, _ = store.open()
+        items = [(id_, matrix[i]) for i, id_ in enumerate(rows) if id_ is not None]
+    else:
+        items = load_pickle_directory(directory)
+    if not items:
+        print(f"⚠️ Tidak ada embedding di {directory}")
+        return False
+
+    db = SessionLocal()
+    try:
+        nims = [id_ for id_, _ in items]
+        known = {row.nim for row in db.query(Mahasiswa.nim).filter(Mahasiswa.nim.in_(nims))}
+        registrations = {reg.nim: reg for reg in db.query(FaceRegistration).filter(FaceRegistration.nim.in_(nims))}
+
+        # Statistik dan status aktif registrasi yang sudah ada tetap dipertahankan
+        for nim, embedding in items:
+            if nim not in known:
+                continue
+            face_reg = registrations.get(nim)
+            if face_reg is None:
+                face_reg = FaceRegistration(nim=nim)
+                db.add(face_reg)
+            face_reg.embedding = encode_embedding(embedding)
+            face_reg.embedding_filename = None
+        db.commit()
+    finally:
+        db.close()
+
+    skipped = [nim for nim in nims if nim not in known]
+    print(f"✅ {len(nims) - len(skipped)} embedding dipindahkan ke tabel face_registrations")
+    if skipped:
+        print(f"⚠️ {len(skipped)} embedding dilewati karena NIM tidak ada di tabel mahasiswa: {skipped}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Folder embeddings")
+    parser.add_argument("--dtype", choices=STORE_DTYPES, default=FACE_STORE_DTYPE)
+    parser.add_argument("--remove-pkl", action="store_true", help="Hapus file .pkl setelah migrasi berhasil")
+    parser.add_argument("--to-db", action="store_true", help="Pindahkan embedding ke kolom face_registrations.embedding")
+    args = parser.parse_args()
+    if args.to_db:
+        sys.exit(0 if migrate_to_db(args.dir) else 1)
+    sys.exit(0 if migrate(args.dir, args.dtype, args.remove_pkl) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+-- ====================================================================
+-- Simpan embedding wajah langsung di tabel face_registrations
+-- Sebelumnya embedding ada di file (embeddings/*.pkl / gallery-*.npy) di disk
+-- server, sehingga tidak bisa dipakai beberapa server sekaligus.
+-- Setelah migration ini jalankan: python migrate_embeddings.py --to-db
+-- ====================================================================
+
+USE `e-learn`;
+
+ALTER TABLE `face_registrations`
+  ADD COLUMN `embedding` blob NULL DEFAULT NULL COMMENT 'L2-normalized float32 face embedding (little-endian)' AFTER `nim`,
+  MODIFY `embedding_filename` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL COMMENT 'Legacy .pkl filename, NULL once the embedding is stored in the row',
+  ADD INDEX `idx_face_registrations_updated_at` (`updated_at`);
+
+SELECT 'Kolom embedding face_registrations berhasil ditambahkan' AS status;
@@ -0,0 +1,15 @@
+-- ====================================================================
+-- Tambah kolom statistik verifikasi wajah pada tabel face_registrations
+-- Dibutuhkan oleh /face/verify dan /face-registration/verify
+-- (sudah ada di dump "e-learn sekarang.sql", belum ada di dump lama)
+-- ====================================================================
+
+USE `e-learn`;
+
+ALTER TABLE `face_registrations`
+  ADD COLUMN `last_verified` timestamp NULL DEFAULT NULL COMMENT 'Last successful face verification' AFTER `registration_date`,
+  ADD COLUMN `verification_count` int DEFAULT '0' COMMENT 'Total number of successful verifications' AFTER `last_verified`,
+  ADD COLUMN `failed_attempts` int DEFAULT '0' COMMENT 'Number of failed verification attempts' AFTER `verification_count`,
+  ADD COLUMN `is_active` tinyint(1) DEFAULT '1' COMMENT 'Can be set to false to disable face login' AFTER `failed_attempts`;
+
+SELECT 'Kolom statistik face_registrations berhasil ditambahkan' AS status;
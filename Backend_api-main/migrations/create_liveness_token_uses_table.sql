@@ -0,0 +1,20 @@
+-- ====================================================================
+-- Token liveness (WebSocket /face/liveness) hanya boleh dipakai sekali.
+-- jti token dicatat di tabel ini saat presensi; jti yang sudah ada ditolak
+-- (primary key), sehingga berlaku juga untuk beberapa worker/server.
+-- Baris yang expires_at-nya lewat dihapus otomatis oleh API.
+-- ====================================================================
+
+USE `e-learn`;
+
+CREATE TABLE IF NOT EXISTS `liveness_token_uses` (
+  `jti` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL COMMENT 'ID token liveness yang sudah dipakai',
+  `nim` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `id_presensi` int NOT NULL,
+  `used_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `expires_at` datetime NOT NULL COMMENT 'Baris boleh dihapus setelah waktu ini',
+  PRIMARY KEY (`jti`),
+  KEY `idx_liveness_token_uses_expires_at` (`expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+SELECT 'Tabel liveness_token_uses berhasil dibuat' AS status;
@@ -0,0 +1,99 @@
+"""
+Consistency of the per-worker face gallery with the face_registrations table.
+
+Runs against an in-memory SQLite copy of face_registrations (no MySQL needed).
+
+Cara menjalankan (dari folder Backend_api-main):
+    python -m pytest
+"""
+import importlib
+import pkgutil
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models
+from app.models.face_registration_model import FaceRegistration
+from app.services.face_gallery_service import FaceGallery, face_gallery
+from app.services.face_index_service import FaceEmbeddingIndex, face_index
+from app.services.face_registration_service import (
+    MAX_FAILED_ATTEMPTS, record_verification, record_verification_by_nim
+)
+
+
+@pytest.fixture
+def sessions():
+    # Semua model di-import supaya relasi antar mapper bisa di-resolve
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    FaceRegistration.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return {name: rng.normal(size=512).astype(np.float32) for name in "ABCDE"}
+
+
+@pytest.fixture
+def gallery(sessions, monkeypatch):
+    """The module-level face_gallery (used by face_registration_service) on the SQLite database."""
+    monkeypatch.setattr(face_gallery, "session_factory", sessions)
+    db = sessions()
+    face_gallery.sync(db, force=True)
+    yield db
+    db.close()
+
+
+def test_sync_sees_same_second_delete_and_register(sessions, vectors):
+    # updated_at has one-second precision: count and MAX(updated_at) do not change
+    writer = FaceGallery(FaceEmbeddingIndex(), 0, sessions)
+    reader = FaceGallery(FaceEmbeddingIndex(), 0, sessions)
+    db = sessions()
+    # Mulai di awal detik supaya semua tulis dan sync di bawah jatuh di detik yang sama
+    time.sleep(1 - time.time() % 1 + 0.05)
+    writer.register(db, "C", vectors["C"])
+    writer.register(db, "D", vectors["D"])
+    reader.sync(db)
+    writer.delete(db, "C")
+    writer.register(db, "E", vectors["E"])
+    time.sleep(1.1)
+    reader.sync(db)
+    found = sorted(name for name, _ in reader.index.search(vectors["C"], k=5))
+    db.close()
+    assert found == ["D", "E"]
+
+
+def test_record_verification_auto_disable_leaves_index(gallery, vectors):
+    face_reg = face_gallery.register(gallery, "A", vectors["A"])
+    face_reg.failed_attempts = MAX_FAILED_ATTEMPTS - 1
+    gallery.commit()
+
+    record_verification(gallery, face_reg, success=False)
+    gallery.refresh(face_reg)
+
+    assert not face_reg.is_active
+    assert "A" not in face_index
+
+
+def test_record_verification_by_nim_auto_disable_leaves_index(gallery, vectors):
+    face_gallery.register(gallery, "B", vectors["B"])
+    face_reg = gallery.query(FaceRegistration).filter(FaceRegistration.nim == "B").first()
+    face_reg.failed_attempts = MAX_FAILED_ATTEMPTS - 1
+    gallery.commit()
+
+    # Seperti /face/check-in: commit dulu, lalu set_active jika batas gagal tercapai
+    disabled = record_verification_by_nim(gallery, "B", success=False)
+    gallery.commit()
+    if disabled:
+        face_gallery.set_active(gallery, "B", False)
+
+    assert disabled
+    assert "B" not in face_index
@@ -0,0 +1,225 @@
+"""
+Evaluasi Threshold Face Recognition (FAR / FRR / EER)
+=====================================================
+Menghitung distribusi distance genuine (NIM sama) dan impostor (NIM beda)
+dari dataset foto berlabel, lalu memilih threshold cosine distance.
+
+Struktur dataset (beberapa foto per NIM):
+    dataset/
+    ├── 2141720001/
+    │   ├── 1.jpg
+    │   └── 2.jpg
+    └── 2141720002/
+        └── ...
+
+Semua pasangan dihitung dengan perkalian matrix NumPy per blok baris
+(bukan loop scipy `cosine`), dan distance dikumpulkan ke histogram halus,
+jadi ribuan embedding selesai dalam hitungan detik tanpa menyimpan jutaan
+distance impostor di memori.
+
+Cara menjalankan:
+    python evaluate_threshold.py --dataset dataset/ --save-embeddings dataset.npz
+    python evaluate_threshold.py --embeddings dataset.npz --target-far 0.001 \\
+        --output ../Backend_api-main/models/face_threshold.json
+
+File --output dibaca backend lewat FACE_THRESHOLD_REPORT untuk mengganti THRESHOLD = 0.4.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# Detector dan engine FaceNet sama dengan backend API (env FACE_DETECTOR_BACKEND, FACE_EMBEDDING_ENGINE)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Backend_api-main"))
+from app.config import (
+    FACE_DETECTOR_BACKEND, FACE_EMBEDDING_ENGINE, FACE_EMBEDDING_MODEL_PATH, FACE_EMBEDDING_THREADS
+)
+
+# Resolusi histogram distance (cosine distance 0..2)
+HISTOGRAM_BINS = 20000
+MAX_DISTANCE = 2.0
+
+
+def embed_dataset(dataset_dir, batch_size=32):
+    """Embedding semua foto di dataset/<NIM>/*.jpg; return (embeddings, labels)."""
+    from app.services.face_detectors import create_face_detector
+    from app.services.embedding_engines import create_embedding_engine
+
+    detector = create_face_detector(FACE_DETECTOR_BACKEND, min_face_size=40)
+    engine = create_embedding_engine(FACE_EMBEDDING_ENGINE, FACE_EMBEDDING_MODEL_PATH, FACE_EMBEDDING_THREADS)
+
+    crops, labels = [], []
+    skipped = 0
+    for nim in sorted(os.listdir(dataset_dir)):
+        person_dir = os.path.join(dataset_dir, nim)
+        if not os.path.isdir(person_dir):
+            continue
+        for file_name in sorted(os.listdir(person_dir)):
+            img = cv2.imread(os.path.join(person_dir, file_name), cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            faces = detector.detect_faces(img)
+            if not faces:
+                skipped += 1
+                continue
+            x, y, w, h = faces[0]["box"]
+            crops.append(img[y:y+h, x:x+w])
+            labels.append(nim)
+
+    print(f"📷 {len(crops)} wajah dari {len(set(labels))} NIM ({skipped} foto tanpa wajah dilewati)")
+    embeddings = [engine.embeddings(crops[i:i + batch_size]) for i in range(0, len(crops), batch_size)]
+    return np.concatenate(embeddings).astype(np.float32), np.array(labels)
+
+
+def distance_histograms(embeddings, labels, block_size=2048):
+    """
+    Histogram distance genuine dan impostor untuk semua pasangan i < j,
+    plus rank-1 identification (leave-one-out), dihitung per blok baris.
+    """
+    e = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    _, label_ids = np.unique(labels, return_inverse=True)
+    n = len(e)
+
+    genuine = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    impostor = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    rank1_correct = 0
+    rank1_total = 0
+    scale = HISTOGRAM_BINS / MAX_DISTANCE
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        distances = 1.0 - e[start:stop] @ e.T                      # (blok, n)
+        same = label_ids[start:stop, None] == label_ids[None, :]
+        upper = np.arange(n)[None, :] > np.arange(start, stop)[:, None]  # pasangan i < j saja
+
+        bins = np.clip((distances * scale).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+        genuine += np.bincount(bins[same & upper], minlength=HISTOGRAM_BINS)
+        impostor += np.bincount(bins[~same & upper], minlength=HISTOGRAM_BINS)
+
+        # Rank-1: tetangga terdekat selain dirinya, hanya untuk NIM yang punya > 1 foto
+        distances[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        has_mate = same.sum(axis=1) > 1
+        nearest = np.argmin(distances, axis=1)
+        rank1_correct += int(np.sum(has_mate & (label_ids[nearest] == label_ids[start:stop])))
+        rank1_total += int(np.sum(has_mate))
+
+    return genuine, impostor, (rank1_correct / rank1_total if rank1_total else None)
+
+
+def error_rates(genuine, impostor):
+    """
+    FAR(t) dan FRR(t) untuk setiap batas bin t (diterima jika distance < t).
+    Return (thresholds, far, frr).
+    """
+    thresholds = np.arange(1, HISTOGRAM_BINS + 1) * (MAX_DISTANCE / HISTOGRAM_BINS)
+    far = np.cumsum(impostor) / max(impostor.sum(), 1)
+    frr = 1.0 - np.cumsum(genuine) / max(genuine.sum(), 1)
+    return thresholds, far, frr
+
+
+def histogram_stats(histogram):
+    """Mean dan percentile distance dari histogram."""
+    total = histogram.sum()
+    if total == 0:
+        return None
+    centers = (np.arange(HISTOGRAM_BINS) + 0.5) * (MAX_DISTANCE / HISTOGRAM_BINS)
+    cumulative = np.cumsum(histogram) / total
+    percentile = lambda q: round(float(centers[np.searchsorted(cumulative, q / 100)]), 4)
+    return {
+        "count": int(total),
+        "mean": round(float(np.dot(centers, histogram) / total), 4),
+        "p1": percentile(1), "p5": percentile(5), "p50": percentile(50),
+        "p95": percentile(95), "p99": percentile(99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dataset", help="Folder dataset/<NIM>/*.jpg")
+    source.add_argument("--embeddings", help="File .npz hasil --save-embeddings (embeddings, labels)")
+    parser.add_argument("--save-embeddings", help="Simpan embedding dataset ke .npz agar evaluasi ulang tanpa inference")
+    parser.add_argument("--target-far", type=float, default=0.001,
+                        help="FAR maksimal di operating point (default 0.1%%); 0 = pakai threshold EER")
+    parser.add_argument("--output", default="face_threshold.json", help="File report JSON untuk backend")
+    args = parser.parse_args()
+
+    if args.dataset:
+        embeddings, labels = embed_dataset(args.dataset)
+        if args.save_embeddings:
+            np.savez_compressed(args.save_embeddings, embeddings=embeddings, labels=labels)
+            print(f"💾 Embedding disimpan di {args.save_embeddings}")
+    else:
+        data = np.load(args.embeddings)
+        embeddings, labels = data["embeddings"].astype(np.float32), data["labels"]
+
+    if len(set(labels)) < 2:
+        print("❌ Dataset butuh minimal 2 NIM")
+        return 1
+
+    start = time.perf_counter()
+    genuine, impostor, rank1 = distance_histograms(embeddings, labels)
+    thresholds, far, frr = error_rates(genuine, impostor)
+    elapsed = time.perf_counter() - start
+    if genuine.sum() == 0:
+        print("❌ Tidak ada pasangan genuine: butuh minimal 2 foto untuk sebagian NIM")
+        return 1
+
+    # Jika kedua distribusi terpisah, |FAR - FRR| minimal di satu rentang: ambil tengahnya
+    gap = np.abs(far - frr)
+    ties = np.nonzero(gap == gap.min())[0]
+    eer_index = int(ties[len(ties) // 2])
+    if args.target_far > 0:
+        # Threshold terbesar (FRR terkecil) yang FAR-nya masih <= target
+        allowed = np.nonzero(far <= args.target_far)[0]
+        op_index = int(allowed[-1]) if len(allowed) else 0
+    else:
+        op_index = eer_index
+
+    sweep = [
+        {"threshold": round(float(thresholds[i]), 3), "far": round(float(far[i]), 6), "frr": round(float(frr[i]), 6)}
+        for i in range(HISTOGRAM_BINS // 200 - 1, HISTOGRAM_BINS // 2, HISTOGRAM_BINS // 200)  # 0.01 .. 1.0
+    ]
+    report = {
+        "threshold": round(float(thresholds[op_index]), 4),
+        "far": round(float(far[op_index]), 6),
+        "frr": round(float(frr[op_index]), 6),
+        "target_far": args.target_far or None,
+        "eer": round(float((far[eer_index] + frr[eer_index]) / 2), 6),
+        "eer_threshold": round(float(thresholds[eer_index]), 4),
+        "rank1_accuracy": None if rank1 is None else round(rank1, 4),
+        "embeddings": int(len(embeddings)),
+        "identities": int(len(set(labels))),
+        "genuine": histogram_stats(genuine),
+        "impostor": histogram_stats(impostor),
+        "engine": FACE_EMBEDDING_ENGINE,
+        "detector": FACE_DETECTOR_BACKEND,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "sweep": sweep,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "="*60)
+    print("📊 HASIL EVALUASI THRESHOLD")
+    print("="*60)
+    print(f"Embedding       : {report['embeddings']} ({report['identities']} NIM)")
+    print(f"Pasangan        : {genuine.sum()} genuine, {impostor.sum()} impostor ({elapsed:.2f} s)")
+    print(f"EER             : {report['eer']:.4%} pada threshold {report['eer_threshold']}")
+    print(f"Operating point : threshold {report['threshold']} -> FAR {report['far']:.4%}, FRR {report['frr']:.4%}")
+    if rank1 is not None:
+        print(f"Rank-1 accuracy : {rank1:.2%}")
+    print(f"✅ Report disimpan di {args.output}")
+    print("="*60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
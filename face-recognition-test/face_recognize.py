@@ -9,17 +9,25 @@ import cv2
 import numpy as np
 import pickle
 import os
+import sys
 from keras_facenet import FaceNet
-from mtcnn import MTCNN
+
+# Face detector dipakai bersama dengan backend API (Backend_api-main/app/services/face_detectors.py).
+# Pilih backend lewat environment variable FACE_DETECTOR_BACKEND: mtcnn (default), mediapipe, haar, dnn
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Backend_api-main"))
+from app.services.face_detectors import create_face_detector
+from app.config import FACE_DETECTOR_BACKEND
 from scipy.spatial.distance import cosine
 
 # Inisialisasi
 print("🔄 Loading models...")
 embedder = FaceNet()
-# MTCNN dengan parameter optimasi untuk performance
-detector = MTCNN(
+# MTCNN dengan parameter optimasi untuk performance (hanya berlaku untuk backend mtcnn)
+MTCNN_OPTIONS = {"steps_threshold": [0.6, 0.7, 0.7]}  # Threshold lebih tinggi = lebih cepat
+detector = create_face_detector(
+    FACE_DETECTOR_BACKEND,
     min_face_size=40,  # Skip wajah terlalu kecil (lebih cepat)
-    steps_threshold=[0.6, 0.7, 0.7]  # Threshold lebih tinggi = lebih cepat
+    **(MTCNN_OPTIONS if FACE_DETECTOR_BACKEND == "mtcnn" else {})
 )
 print("✅ Models loaded successfully!")
 
@@ -280,7 +288,7 @@ def recognize_from_camera(embeddings_db):
         
         # Deteksi wajah (setiap 5 frame untuk performa optimal)
         if frame_count % 5 == 0:
-            faces = detector.detect_faces(rgb_frame)
+            faces = detector.detect_faces(frame)
             
         # Process detected faces (menggunakan hasil cache jika tidak ada deteksi baru)
         if faces:
@@ -460,7 +468,7 @@ def recognize_from_image(embeddings_db):
         
         # Detect faces
         print("🔄 Detecting faces...")
-        faces = detector.detect_faces(rgb_img)
+        faces = detector.detect_faces(img)
         
         if len(faces) == 0:
             print("❌ Tidak ada wajah yang terdeteksi di gambar!")
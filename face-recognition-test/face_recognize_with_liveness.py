@@ -21,8 +21,14 @@ import numpy as np
 import os
 from datetime import datetime
 from scipy.spatial.distance import cosine
+import sys
 from keras_facenet import FaceNet
-from mtcnn import MTCNN
+
+# Face detector dipakai bersama dengan backend API (Backend_api-main/app/services/face_detectors.py).
+# Pilih backend lewat environment variable FACE_DETECTOR_BACKEND: mtcnn (default), mediapipe, haar, dnn
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Backend_api-main"))
+from app.services.face_detectors import create_face_detector
+from app.config import FACE_DETECTOR_BACKEND
 
 # Import liveness detector
 from liveness_detection import LivenessDetector, generate_liveness_token
@@ -54,9 +60,9 @@ class FaceRecognitionSystem:
         self.embedder = FaceNet()
         print("✅ FaceNet model loaded")
         
-        print("🔄 Loading MTCNN detector...")
-        self.detector = MTCNN()
-        print("✅ MTCNN detector loaded")
+        print(f"🔄 Loading {FACE_DETECTOR_BACKEND} face detector...")
+        self.detector = create_face_detector(FACE_DETECTOR_BACKEND)
+        print(f"✅ {FACE_DETECTOR_BACKEND} face detector loaded")
         
         self.known_faces = {}
         self.load_embeddings()
@@ -85,8 +91,7 @@ class FaceRecognitionSystem:
     
     def detect_face(self, frame):
         """Detect face in frame"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        detections = self.detector.detect_faces(rgb_frame)
+        detections = self.detector.detect_faces(frame)
         
         if not detections:
             return None, None, 0.0
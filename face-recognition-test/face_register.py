@@ -2,23 +2,31 @@
 Face Registration Script
 ========================
 Script untuk meregistrasi wajah baru ke dalam sistem.
-Menggunakan FaceNet untuk ekstraksi embedding dan MTCNN untuk deteksi wajah.
+Menggunakan FaceNet untuk ekstraksi embedding dan face detector yang dipilih (default MTCNN).
 """
 
 import cv2
 import numpy as np
 import pickle
 import os
+import sys
 from keras_facenet import FaceNet
-from mtcnn import MTCNN
+
+# Face detector dipakai bersama dengan backend API (Backend_api-main/app/services/face_detectors.py).
+# Pilih backend lewat environment variable FACE_DETECTOR_BACKEND: mtcnn (default), mediapipe, haar, dnn
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Backend_api-main"))
+from app.services.face_detectors import create_face_detector
+from app.config import FACE_DETECTOR_BACKEND
 
 # Inisialisasi
 print("🔄 Loading models...")
 embedder = FaceNet()
-# MTCNN dengan parameter optimasi untuk performance
-detector = MTCNN(
+# MTCNN dengan parameter optimasi untuk performance (hanya berlaku untuk backend mtcnn)
+MTCNN_OPTIONS = {"steps_threshold": [0.6, 0.7, 0.7]}  # Threshold lebih tinggi = lebih cepat
+detector = create_face_detector(
+    FACE_DETECTOR_BACKEND,
     min_face_size=40,  # Skip wajah terlalu kecil (lebih cepat)
-    steps_threshold=[0.6, 0.7, 0.7]  # Threshold lebih tinggi = lebih cepat
+    **(MTCNN_OPTIONS if FACE_DETECTOR_BACKEND == "mtcnn" else {})
 )
 print("✅ Models loaded successfully!")
 
@@ -62,8 +70,9 @@ def register_face_from_camera():
         # Deteksi wajah hanya setiap 5 frame (optimasi performance)
         frame_skip += 1
         if frame_skip % 5 == 0:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            faces = detector.detect_faces(rgb_frame)
+            # Salinan sebelum digambari kotak/teks: deteksi dan crop dari frame yang sama
+            detected_frame = frame.copy()
+            faces = detector.detect_faces(detected_frame)
         
         # Draw bounding box dan confidence
         for face in faces:
@@ -121,7 +130,7 @@ def register_face_from_camera():
             x, y, w, h = face['box']
             
             # Crop face
-            face_crop = rgb_frame[y:y+h, x:x+w]
+            face_crop = cv2.cvtColor(detected_frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB)  # FaceNet butuh RGB
             
             # Input username
             print("\n" + "-"*60)
@@ -192,7 +201,7 @@ def register_face_from_image():
         
         # Detect faces
         print("🔄 Detecting faces...")
-        faces = detector.detect_faces(rgb_img)
+        faces = detector.detect_faces(img)
         
         if len(faces) == 0:
             print("❌ Tidak ada wajah yang terdeteksi di gambar!")